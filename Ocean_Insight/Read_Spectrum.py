@@ -1,9 +1,16 @@
 
-import os, csv, time
+import os, time, sqlite3
 import numpy as np
 from multiprocessing import Process, Manager
 from oceandirect.OceanDirectAPI import OceanDirectAPI, OceanDirectError, Spectrometer
+from calibration_cache import Calibration, CalibrationCache
+from spectral_processing import nonlinearity_correct
+from wavelength_grid import WavelengthGrid
+from spectrum_store import SpectrumStoreWriter
+from spectral_catalog import SpectralCatalog
 odapi = OceanDirectAPI()
+calibration_cache = CalibrationCache() # wavelength/nonlinearity coefficients per (serial, firmware), read once per process
+catalog = SpectralCatalog() # every capture written below is indexed here; set to None to disable
 
 # Functions useful for reading spectra from the Ocean Insight HR4Pro spectrometer
 
@@ -31,86 +38,280 @@ def read_all_serial_numbers() -> list[str]:
 
 
 def correct_nonlinearity(raw_intensity, nonlinearity_coeffs):
-    """Corrects for nonlinearity using the coefficients provided by the spectrometer."""
-    raw_intensity = np.array(raw_intensity, dtype=float)
-    corrected_intensity = raw_intensity.copy()
-    # corrected_intensity = np.array(corrected_intensity)
-
-    for i, coeff in enumerate(nonlinearity_coeffs):
-        corrected_intensity += coeff * raw_intensity**(i + 1)
-        
-    return corrected_intensity
+    """Corrects for nonlinearity using the coefficients provided by the spectrometer.
+    Accepts one spectrum or a (n_frames, n_pixels) stack; see spectral_processing.nonlinearity_correct
+    for in-place and float32 options. Always returns a new float array."""
+    return nonlinearity_correct(raw_intensity, nonlinearity_coeffs)
 
 
-def writeSpectraToCSV(wavelengths: list, spectra: list, output_file_name: str) -> None:
+def writeSpectraToCSV(wavelengths: list, spectra: list, output_file_name: str, precision: int = None,
+                      chunkValues: int = 1 << 20) -> None:
     """
     Writes the wavelengths and spectra to a CSV file.
     
     Parameters:
-    wavelengths (list): List of wavelengths.
-    spectra (list): List of spectra, where each spectrum is a list of intensity values.
+    wavelengths (list or WavelengthGrid): List of wavelengths.
+    spectra (list): List of spectra, where each spectrum is a list of intensity values,
+        or a (n_spectra, n_pixels) array.
     output_file_name (str): The name of the output CSV file.
+    precision (int): Optional number of significant digits ('%.<precision>g') to shrink the file.
+        By default every value is written exactly as csv.writer did (shortest round-trip repr,
+        of the float32 value itself for float32 input).
+    chunkValues (int): Approximate number of values formatted and written per block.
+
+    The layout is unchanged: a 'Wavelength,Spectrum_1,...' header, then one row per pixel with
+    the wavelength followed by one column per spectrum, '\r\n' line endings. Instead of one
+    writerow call per pixel, each block of rows is formatted by a single string operation.
     """
-    # Create the CSV file
     output_file = os.path.join(os.getcwd(), output_file_name)
+    wavelengths = np.asarray(wavelengths)
+    num_rows = len(wavelengths)
+    columns = [wavelengths] + [np.asarray(spectrum)[:num_rows] for spectrum in spectra]
+    if any(len(column) < num_rows for column in columns):
+        raise ValueError("Every spectrum needs at least as many values as there are wavelengths.")
+    if precision is None:
+        # str() of a float32 is its own shortest repr ('961.4613'), which widening to float64 would lose
+        columns = [column.astype(str) if column.dtype.kind == 'f' and column.dtype.itemsize < 8 else column
+                   for column in columns]
+    if all(column.dtype.kind == 'f' for column in columns):
+        table = np.column_stack([column.astype(np.float64, copy=False) for column in columns])
+    else:
+        table = np.column_stack([column.astype(object) for column in columns]) # keep ints as ints, like csv.writer
+
+    field = '%r' if precision is None else '%%.%dg' % precision
+    num_columns = len(columns)
+    row_format = ','.join(['%s' if column.dtype.kind == 'U' else field for column in columns]) + '\r\n'
+    chunk_rows = max(1, chunkValues // num_columns)
+
     with open(output_file, 'w', newline='') as csvfile:
-        csv_writer = csv.writer(csvfile)
-        
         # Write the header
         header = ['Wavelength'] + [f'Spectrum_{i+1}' for i in range(len(spectra))]
-        csv_writer.writerow(header)
+        csvfile.write(','.join(header) + '\r\n')
         
-        # Write the data rows
-        for i in range(len(wavelengths)):
-            row = [wavelengths[i]] + [spectrum[i] for spectrum in spectra]
-            csv_writer.writerow(row)
+        # Write the data rows, one formatting pass per block
+        for start in range(0, num_rows, chunk_rows):
+            block = table[start:start + chunk_rows]
+            csvfile.write((row_format * len(block)) % tuple(block.ravel().tolist()))
 
 
 def correct_spectrum(raw_spectrum, wavelength_coeffs, nonlinearity_coeffs):
-    """Corrects the spectrum for nonlinearity and converts pixel values to wavelengths."""
-    c = wavelength_coeffs
+    """Corrects the spectrum for nonlinearity and converts pixel values to wavelengths.
+    The wavelengths are the cached, read-only grid of the calibration (see WavelengthGrid),
+    so they are computed once rather than for every frame."""
     num_data_points = len(raw_spectrum) # 3648
 
-    pixels = np.arange(num_data_points)
-    wavelengths = c[0] + c[1] * pixels + c[2] * pixels**2 + c[3] * pixels**3 # polynomial equation to convert pixel values to wavelengths
+    wavelengths = WavelengthGrid.for_calibration(wavelength_coeffs, num_data_points).wavelengths # polynomial in the pixel index, any number of coefficients
 
     correct_spectrum = correct_nonlinearity(raw_spectrum, nonlinearity_coeffs)
 
     return wavelengths, correct_spectrum
 
 
-def read_spectra(serialNumber: str, integrationTimeUs: int, spectraToRead: int, csv_file_name: str):
-    """The main function to take spectral data. 
-    Will use the calibration parameters to match wavelengths and correct nonlinearity, 
-    then takes a certain number of exposures with a given exposure time in microseconds. 
-    Specify the file name for the csv file where the output data will be saved."""
+def iter_spectra(serialNumber: str, integrationTimeUs: int, spectraToRead: int = None,
+                 cadenceUs: int = None, triggerMode: int = None, acquisitionDelayUs: int = None):
+    """Lazily takes spectral data one frame at a time.
+    Opens the device, looks up the calibration in calibration_cache, then yields (timestamp, wavelengths, spectrum)
+    for every exposure, where timestamp is the host time in seconds when the frame was read and
+    spectrum is the nonlinearity corrected intensity. Runs forever if spectraToRead is None.
+    Only the current frame is held in memory, so pair it with a sink from spectrum_sinks
+    to persist long runs as they happen. The device is closed when the generator finishes
+    or is closed early.
+
+    Pacing: by default frames are read back to back, so the rate is set by the integration
+    time (get_formatted_spectrum blocks until the exposure is done). triggerMode and
+    acquisitionDelayUs are passed to set_trigger_mode / set_acquisition_delay to let the
+    hardware time the exposures (and restored afterwards, see acquire_spectra). cadenceUs requests evenly spaced frames: each read starts on
+    a monotonic deadline cadenceUs after the previous one, and if a frame overruns its slot
+    the schedule restarts from now rather than bursting to catch up."""
+    device, calibration = open_spectrometer(serialNumber)
+    if device is None:
+        return  # Exit the function if the serial numbers don't match
+    try:
+        yield from acquire_spectra(device, calibration.wavelength_coeffs, calibration.nonlinearity_coeffs,
+                                   integrationTimeUs, spectraToRead, cadenceUs, triggerMode, acquisitionDelayUs)
+    finally:
+        device.close_device()
+
+
+def open_spectrometer(serialNumber: str) -> tuple[Spectrometer, Calibration]:
+    """Discovers and opens the first device and looks up its calibration in calibration_cache.
+    Returns (device, calibration) for the caller to close, or (None, None) if the serial number
+    does not match (the device is closed again)."""
     read_all_serial_numbers()
     odapi.find_usb_devices()
     devId = odapi.get_device_ids()[0]
     device = odapi.open_device(devId)
-    devSerialNumber = device.get_serial_number()
-    if devSerialNumber != serialNumber:
-        print("Error: Serial number does not match.")
-        return  # Exit the function if the serial numbers don't match
-    
-    spectrometer_advanced = Spectrometer.Advanced(device)
-    wavelength_coeffs = spectrometer_advanced.get_wavelength_coeffs()
-    nonlinearity_coeffs = spectrometer_advanced.get_nonlinearity_coeffs()
-    
-    all_spectra = [[] for _ in range(spectraToRead)]
+    try:
+        devSerialNumber = device.get_serial_number()
+        if devSerialNumber != serialNumber:
+            print("Error: Serial number does not match.")
+            device.close_device()
+            return None, None
+        return device, calibration_cache.get(device, devSerialNumber)
+    except BaseException:
+        device.close_device()
+        raise
+
+
+def read_setting(getter):
+    """getter(), or None if the device cannot report that setting."""
+    try:
+        return getter()
+    except OceanDirectError:
+        return None
+
+
+def acquire_spectra(device: Spectrometer, wavelength_coeffs, nonlinearity_coeffs, integrationTimeUs: int,
+                    spectraToRead: int = None, cadenceUs: int = None, triggerMode: int = None,
+                    acquisitionDelayUs: int = None):
+    """The acquisition loop behind iter_spectra, for a device that is already open and whose
+    calibration is already known (e.g. from a SpectrometerSession). Yields the same
+    (timestamp, wavelengths, spectrum) frames and leaves the device open. A trigger mode or
+    acquisition delay given here is put back to its previous value when the generator finishes
+    or is closed, if the device can report that value; the integration time is left as set."""
+    raw_buffer = np.empty(device.get_formatted_spectrum_length(), dtype=np.float64) # reused for every frame, the DLL writes straight into it
     device.set_integration_time(integrationTimeUs)
-    for i in range(spectraToRead):
-        raw_spectrum = device.get_formatted_spectrum()
-        wavelengths, spectrum = correct_spectrum(raw_spectrum, wavelength_coeffs, nonlinearity_coeffs)
-        all_spectra[i] = spectrum
-        time.sleep(0.1)
+    restore = []
+    try:
+        if triggerMode is not None:
+            previous = read_setting(device.get_trigger_mode)
+            device.set_trigger_mode(triggerMode)
+            if previous is not None:
+                restore.append((device.set_trigger_mode, previous))
+        if acquisitionDelayUs is not None:
+            previous = read_setting(device.get_acquisition_delay)
+            device.set_acquisition_delay(acquisitionDelayUs)
+            if previous is not None:
+                restore.append((device.set_acquisition_delay, previous))
+
+        i = 0
+        deadline = None
+        while spectraToRead is None or i < spectraToRead:
+            if cadenceUs is not None:
+                now = time.monotonic()
+                if deadline is None or deadline <= now:
+                    deadline = now # first frame, or the last one overran its slot
+                else:
+                    time.sleep(deadline - now)
+                deadline += cadenceUs / 1e6
+            raw_spectrum = device.get_formatted_spectrum(out=raw_buffer)
+            timestamp = time.time()
+            wavelengths, spectrum = correct_spectrum(raw_spectrum, wavelength_coeffs, nonlinearity_coeffs)
+            yield timestamp, wavelengths, spectrum
+            i += 1
+    finally:
+        for setter, previous in reversed(restore):
+            try:
+                setter(previous)
+            except OceanDirectError as err:
+                print("Warning: could not restore %s: %s" % (setter.__name__, err))
+
+
+def catalog_capture(path: str, store: bool = False, **fields) -> None:
+    """Records a finished capture in the catalog. A catalog problem never fails the capture itself."""
+    if catalog is None:
+        return
+    try:
+        if store:
+            catalog.add_store(path, **fields)
+        else:
+            catalog.add_csv(path, **fields)
+    except (sqlite3.Error, OSError) as err:
+        print("Warning: could not add %s to the catalog: %s" % (path, err))
+
+
+def collect_spectra(frames, csv_file_name: str, catalogFields: dict = None):
+    """Gathers the frames of iter_spectra / acquire_spectra into one list and writes them
+    with writeSpectraToCSV. The file is then added to the catalog with catalogFields
+    (serial number, integration time, ...). Returns (wavelengths, all_spectra), or None if no frame arrived."""
+    wavelengths = None
+    all_spectra = []
+    for timestamp, wavelengths, spectrum in frames:
+        all_spectra.append(spectrum)
+    if wavelengths is None:
+        return  # no frames, e.g. the serial number did not match
 
-    device.close_device()
     writeSpectraToCSV(wavelengths, all_spectra, csv_file_name)
+    catalog_capture(os.path.join(os.getcwd(), csv_file_name), **(catalogFields or {}))
 
     return wavelengths, all_spectra
 
 
+def detector_temperature(device: Spectrometer) -> float:
+    """The detector (thermistor) temperature in C of an open device, or None if the device cannot report it."""
+    try:
+        return device.Advanced.get_tec_temperature_degrees_C()
+    except OceanDirectError:
+        return None
+
+
+def capture_fields(serialNumber: str, integrationTimeUs: int, kind: str = None, aoi: float = None,
+                   temperature: float = None, detectorTemperature: float = None) -> dict:
+    """Catalog fields of a capture. kind is e.g. "dark", "gain", "aoi", "temperature" or "base", aoi the
+    angle of incidence in degrees, temperature the filter temperature in C and detectorTemperature the
+    spectrometer's own temperature (see detector_temperature), which DarkLibrary matches darks on.
+    Fields left as None are filled from a legacy file name if there is one (see spectral_catalog.parse_legacy_name)."""
+    return {"serial_number": serialNumber, "integration_time_us": integrationTimeUs, "kind": kind,
+            "aoi_deg": aoi, "filter_temperature_c": temperature, "detector_temperature_c": detectorTemperature}
+
+
+def read_spectra(serialNumber: str, integrationTimeUs: int, spectraToRead: int, csv_file_name: str,
+                 cadenceUs: int = None, triggerMode: int = None, acquisitionDelayUs: int = None,
+                 kind: str = None, aoi: float = None, temperature: float = None):
+    """The main function to take spectral data. 
+    Will use the calibration parameters to match wavelengths and correct nonlinearity, 
+    then takes a certain number of exposures with a given exposure time in microseconds. 
+    Specify the file name for the csv file where the output data will be saved.
+    Exposures run at the detector's native cadence unless cadenceUs is given, see iter_spectra.
+    kind, aoi and temperature are recorded in the catalog with the file, together with the detector
+    temperature read from the device (see capture_fields).
+    Every call rediscovers and reopens the device; use SpectrometerSession.read_spectra
+    for sweeps that take many captures in a row."""
+    device, calibration = open_spectrometer(serialNumber)
+    if device is None:
+        return  # the serial number did not match
+    try:
+        fields = capture_fields(serialNumber, integrationTimeUs, kind, aoi, temperature, detector_temperature(device))
+        frames = acquire_spectra(device, calibration.wavelength_coeffs, calibration.nonlinearity_coeffs,
+                                 integrationTimeUs, spectraToRead, cadenceUs, triggerMode, acquisitionDelayUs)
+        return collect_spectra(frames, csv_file_name, fields)
+    finally:
+        device.close_device()
+
+
+def store_spectra(serialNumber: str, integrationTimeUs: int, spectraToRead: int, store_path: str,
+                  temperature: float = None, cadenceUs: int = None, triggerMode: int = None,
+                  acquisitionDelayUs: int = None, kind: str = None, aoi: float = None) -> int:
+    """Takes spectral data like read_spectra but appends each frame to a binary spectrum store
+    (see spectrum_store) as it arrives, together with the timestamps and the acquisition metadata.
+    Memory use is constant and the data can be read back lazily with SpectrumStore(store_path).
+    kind, aoi, temperature (filter temperature in C) and the detector temperature read from the device
+    are kept in the store metadata and the catalog.
+    Returns the number of frames written."""
+    device, calibration = open_spectrometer(serialNumber)
+    if device is None:
+        return 0
+    count = 0
+    try:
+        fields = capture_fields(serialNumber, integrationTimeUs, kind, aoi, temperature, detector_temperature(device))
+        metadata = {**fields, "firmware": calibration.firmware, "wavelength_coeffs": calibration.wavelength_coeffs,
+                    "nonlinearity_coeffs": calibration.nonlinearity_coeffs}
+        writer = SpectrumStoreWriter(store_path, metadata=metadata)
+        try:
+            for timestamp, wavelengths, spectrum in acquire_spectra(device, calibration.wavelength_coeffs,
+                                                                    calibration.nonlinearity_coeffs, integrationTimeUs,
+                                                                    spectraToRead, cadenceUs, triggerMode, acquisitionDelayUs):
+                writer.write(timestamp, wavelengths, spectrum)
+                count += 1
+        finally:
+            writer.close()
+    finally:
+        device.close_device()
+    if count > 0:
+        catalog_capture(store_path, store=True, **fields)
+    return count
+
+
 # def main():
 #     serialNumberList = read_all_serial_numbers()
 
@@ -0,0 +1,125 @@
+
+import os
+import numpy as np
+from collections import namedtuple
+from scipy.optimize import curve_fit
+from spectral_library import SpectralLibrary
+from spectral_catalog import parse_legacy_name
+from peak_fitting import PeakFits, fit_peaks
+
+# Angle of incidence sweeps: filter throughput vs AOI and the thin film angle_shift model
+#
+# A sweep is a directory of Filter_Throughput_<angle>.csv files plus a Base_Throughput.csv
+# taken without the filter (Spectral_Files/AOI_Spectra layout), all dark subtracted with one
+# dark file. The whole sweep is loaded as one (n_angles, n_pixels) stack, normalized in one
+# broadcast and its peaks fitted in one batch (peak_fitting.fit_peaks).
+
+N_AIR = 1.000288     # index of refraction of air
+N_EFF = 1.98         # effective index of the Borofloat filter (vendor value)
+LAMBDA_0 = 596.3363  # nm, peak wavelength of the HIRAX filter at normal incidence
+
+AngleModelFit = namedtuple("AngleModelFit", ["lambda_0", "n_eff", "lambda_0_uncertainty", "n_eff_uncertainty",
+                                             "covariance", "residuals"])
+AOIAnalysis = namedtuple("AOIAnalysis", ["angles", "peaks", "model"])
+
+
+def angle_shift(angle, lambda_0: float = LAMBDA_0, n_eff: float = N_EFF, n_o: float = N_AIR):
+    """Peak wavelength at angle of incidence angle (degrees): lambda_0 * sqrt(1 - (n_o / n_eff * sin(angle))^2)."""
+    angle = np.radians(angle)
+    return lambda_0 * np.sqrt(1 - (n_o / n_eff * np.sin(angle))**2)
+
+
+def fit_angle_shift(angles, peak_wavelengths, uncertainties=None, p0=(LAMBDA_0, N_EFF), n_o: float = N_AIR) -> AngleModelFit:
+    """
+    Global least-squares fit of lambda_0 and n_eff of angle_shift() to the peak wavelengths of a
+    sweep, weighted by the peak uncertainties when they are given and finite.
+    """
+    angles = np.asarray(angles, dtype=np.float64)
+    peak_wavelengths = np.asarray(peak_wavelengths, dtype=np.float64)
+    keep = np.isfinite(peak_wavelengths)
+    sigma = None
+    if uncertainties is not None:
+        uncertainties = np.asarray(uncertainties, dtype=np.float64)
+        keep &= np.isfinite(uncertainties) & (uncertainties > 0)
+        sigma = uncertainties[keep]
+    if keep.sum() < 3:
+        raise ValueError("At least 3 usable angles are needed to fit lambda_0 and n_eff, got %d." % keep.sum())
+
+    sin2 = (n_o * np.sin(np.radians(angles[keep])))**2
+
+    def model(sin2, lambda_0, n_eff):
+        return lambda_0 * np.sqrt(1 - sin2 / n_eff**2)
+
+    def jacobian(sin2, lambda_0, n_eff):
+        root = np.sqrt(1 - sin2 / n_eff**2)
+        return np.column_stack([root, lambda_0 * sin2 / (n_eff**3 * root)])
+
+    params, covariance = curve_fit(model, sin2, peak_wavelengths[keep], p0=p0, sigma=sigma, jac=jacobian)
+    residuals = np.full(len(angles), np.nan)
+    residuals[keep] = peak_wavelengths[keep] - model(sin2, *params)
+    uncertainty = np.sqrt(np.diag(covariance))
+    return AngleModelFit(params[0], params[1], uncertainty[0], uncertainty[1], covariance, residuals)
+
+
+class AOISweep:
+    """
+    One filter's AOI sweep, dark subtracted and normalized by the base throughput.
+
+    Usage:
+        sweep = AOISweep.from_directory('AOI_Spectra', maxAngle=25)
+        result = sweep.analyze()
+        result.peaks.centroid, result.model.n_eff, result.model.lambda_0
+    """
+
+    def __init__(self, angles, wavelengths, spectra, baseline, dark=0.0):
+        order = np.argsort(angles)
+        self.angles = np.asarray(angles, dtype=np.float64)[order]
+        self.wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        self.spectra = np.asarray(spectra, dtype=np.float64)[order]
+        self.baseline = np.asarray(baseline, dtype=np.float64)
+        self.dark = np.asarray(dark, dtype=np.float64)
+
+    @staticmethod
+    def from_directory(directory: str = 'AOI_Spectra', darkFile: str = 'Darks/Dark_30000.csv', baseFile: str = None,
+                       minAngle: float = None, maxAngle: float = None, library: SpectralLibrary = None) -> "AOISweep":
+        """
+        Loads every Filter_Throughput_<angle>.csv of directory (relative to the library root or
+        absolute). baseFile defaults to the directory's Base_Throughput.csv; darkFile may be None
+        for data that is already dark subtracted.
+        """
+        library = library if library is not None else SpectralLibrary()
+        directory = library.resolve(directory)
+        angles, paths = [], []
+        for path in library.glob(os.path.join(directory, 'Filter_Throughput_*.csv')):
+            fields = parse_legacy_name(path)
+            if fields.get("kind") != "aoi":
+                continue
+            angle = fields["aoi_deg"]
+            if (minAngle is None or angle >= minAngle) and (maxAngle is None or angle <= maxAngle):
+                angles.append(angle)
+                paths.append(path)
+        if not paths:
+            raise ValueError("No Filter_Throughput_<angle>.csv files in %s." % directory)
+
+        extra = [baseFile if baseFile is not None else os.path.join(directory, 'Base_Throughput.csv')]
+        if darkFile is not None:
+            extra.append(darkFile)
+        wavelengths, stack = library.median_stack(paths + extra)
+        dark = stack[-1] if darkFile is not None else 0.0
+        return AOISweep(angles, wavelengths, stack[:len(paths)], stack[len(paths)], dark)
+
+    @property
+    def normalized(self) -> np.ndarray:
+        """(n_angles, n_pixels) throughput: (spectra - dark) / (baseline - dark)."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (self.spectra - self.dark) / (self.baseline - self.dark)
+
+    def fit_peaks(self, halfWidth: int = 20, trim: int = 20) -> PeakFits:
+        return fit_peaks(self.wavelengths, np.nan_to_num(self.normalized, nan=0.0, posinf=0.0, neginf=0.0),
+                         halfWidth, trim)
+
+    def analyze(self, halfWidth: int = 20, trim: int = 20, weighted: bool = True) -> AOIAnalysis:
+        """Fits every peak, then lambda_0 and n_eff across angles (weighted by the centroid uncertainties)."""
+        peaks = self.fit_peaks(halfWidth, trim)
+        model = fit_angle_shift(self.angles, peaks.centroid, peaks.centroid_uncertainty if weighted else None)
+        return AOIAnalysis(self.angles, peaks, model)
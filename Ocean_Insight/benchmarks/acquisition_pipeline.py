@@ -0,0 +1,230 @@
+
+import os, sys, json, time, timeit, platform, argparse, tempfile, tracemalloc
+import numpy as np
+from ctypes import c_double
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OCEANDIRECT_BACKEND", "simulator") # Read_Spectrum opens the API at import
+from oceandirect.OceanDirectAPI import Spectrometer
+from oceandirect.od_simulator import SimulatedOceanDirect
+from oceandirect.od_buffers import to_list
+from Read_Spectrum import acquire_spectra, correct_spectrum, writeSpectraToCSV
+from spectral_processing import nonlinearity_correct
+from dark_library import DarkLibrary
+from frame_combiners import median_frames, sigma_clipped_mean, RunningMeanVariance
+from spectrum_sinks import CSVFrameSink
+from spectrum_store import SpectrumStoreWriter
+from buffered_acquisition import MAX_SPECTRA_PER_READ
+
+# End-to-end throughput of the acquisition pipeline, stage by stage, on a simulated spectrometer.
+#
+# Usage: python benchmarks/acquisition_pipeline.py [--pixels 1024 3648] [--batch 1 15 100]
+#                                                  [--output results.json] [--baseline old.json]
+#
+# Every stage processes one batch of frames per call and is timed like nonlinearity_lut.py
+# (best of several repeats). For each (pixel count, batch size) it reports the latency of one
+# batch, frames/s, the peak memory allocated by the stage (tracemalloc) and the peak RSS of the
+# process so far. The device is od_simulator without realtime pacing, so the acquisition stages
+# measure the python side of OceanDirectAPI (marshalling, buffers) rather than exposure time,
+# and its frames are noiseless so little of that time is spent making them.
+#
+# Results are written as JSON. With --baseline, stages slower than the baseline by more than
+# --tolerance are listed and the exit status is 1, to catch regressions between releases.
+
+PIXELS = (1024, 2048, 3648)
+BATCHES = (1, 15, 100)
+INTEGRATION_TIME_US = 10000
+NONLINEARITY_COEFFS = [0.98, 1.2e-6, -3.0e-11, 4.0e-16, -2.0e-21, 1.0e-26, -5.0e-32, 1.0e-37]
+
+
+def best_time(statement, repeat: int = 5, minTime: float = 0.1) -> float:
+    """Best of repeat runs of statement(), in seconds."""
+    number = max(1, int(minTime / max(1e-6, timeit.timeit(statement, number=1))))
+    return min(timeit.repeat(statement, number=number, repeat=repeat)) / number
+
+
+def peak_allocation(statement) -> int:
+    """Peak bytes allocated while running statement() once."""
+    tracemalloc.start()
+    try:
+        statement()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process in bytes (None where it is not available)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def simulated_device(pixels: int) -> Spectrometer:
+    library = SimulatedOceanDirect(pixelCount=pixels, realtime=False, noise=0.0,
+                                   nonlinearityCoeffs=NONLINEARITY_COEFFS)
+    library.odapi_probe_devices()
+    device = Spectrometer(1, library)
+    device.open_device()
+    device.set_integration_time(INTEGRATION_TIME_US)
+    return device
+
+
+def stages(device: Spectrometer, batch: int, directory: str) -> dict:
+    """name -> callable processing one batch of frames."""
+    pixels = device.get_formatted_spectrum_length()
+    wavelength_coeffs = device.Advanced.get_wavelength_coeffs()
+    wavelengths = np.polynomial.polynomial.polyval(np.arange(pixels), wavelength_coeffs)
+    frame = np.empty(pixels)
+    spectra = np.empty((max(batch, MAX_SPECTRA_PER_READ), pixels))
+    timestamps = np.empty(len(spectra), dtype=np.int64)
+    ctypes_frame = (c_double * pixels)()
+    raw = np.stack([device.get_formatted_spectrum(as_numpy=True) for _ in range(batch)])
+    raw += np.random.default_rng(0).normal(0.0, 16.0, raw.shape) # read noise, so the combiners see real scatter
+    corrected = np.empty_like(raw)
+    darks = DarkLibrary()
+    darks.add_master(raw.min(axis=0), INTEGRATION_TIME_US)
+    combiner = RunningMeanVariance()
+    path = lambda name: os.path.join(directory, "%s_%d_%d" % (name, pixels, batch))
+
+    def acquire_list():
+        for _ in range(batch):
+            device.get_formatted_spectrum()
+
+    def acquire_numpy():
+        for _ in range(batch):
+            device.get_formatted_spectrum(out=frame)
+
+    def acquire_buffered():
+        read = 0
+        while read < batch:
+            read += len(device.Advanced.get_raw_spectrum_with_metadata_array(
+                min(batch - read, MAX_SPECTRA_PER_READ), spectra, timestamps)[1])
+
+    def ctypes_to_list():
+        for _ in range(batch):
+            to_list(ctypes_frame)
+
+    def ctypes_to_numpy():
+        for _ in range(batch):
+            np.frombuffer(ctypes_frame, dtype=np.float64).copy()
+
+    def correct_frames():
+        for spectrum in raw:
+            correct_spectrum(spectrum, wavelength_coeffs, NONLINEARITY_COEFFS)
+
+    def write_csv_sink():
+        with CSVFrameSink(path("sink") + ".csv", flush_every=batch) as sink:
+            for spectrum in corrected:
+                sink.write(0.0, wavelengths, spectrum)
+
+    def write_store():
+        with SpectrumStoreWriter(path("store"), wavelengths) as store:
+            store.append_frames(corrected, np.zeros(batch))
+
+    def read_spectra():
+        frames = list(acquire_spectra(device, wavelength_coeffs, NONLINEARITY_COEFFS, INTEGRATION_TIME_US, batch))
+        writeSpectraToCSV(frames[0][1], [spectrum for _, _, spectrum in frames], path("read_spectra") + ".csv")
+
+    return {
+        "acquire_list":          acquire_list,
+        "acquire_numpy":         acquire_numpy,
+        "acquire_buffered":      acquire_buffered,
+        "ctypes_to_list":        ctypes_to_list,
+        "ctypes_to_numpy":       ctypes_to_numpy,
+        "nonlinearity":          lambda: nonlinearity_correct(raw, NONLINEARITY_COEFFS, out=corrected),
+        "correct_spectrum":      correct_frames,
+        "dark_subtraction":      lambda: darks.subtract(raw, INTEGRATION_TIME_US, out=corrected),
+        "combine_median":        lambda: median_frames(raw),
+        "combine_sigma_clipped": lambda: sigma_clipped_mean(raw),
+        "combine_streaming":     lambda: combiner.update(raw),
+        "write_csv":             lambda: writeSpectraToCSV(wavelengths, corrected, path("csv") + ".csv"),
+        "write_csv_sink":        write_csv_sink,
+        "write_store":           write_store,
+        "read_spectra_to_csv":   read_spectra,
+    }
+
+
+def run(pixelCounts=PIXELS, batchSizes=BATCHES, only=None, repeat: int = 5) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for pixels in pixelCounts:
+            device = simulated_device(pixels)
+            for batch in batchSizes:
+                for name, statement in stages(device, batch, directory).items():
+                    if only and name not in only:
+                        continue
+                    seconds = best_time(statement, repeat)
+                    results.append({
+                        "stage": name,
+                        "pixels": pixels,
+                        "batch": batch,
+                        "seconds_per_batch": seconds,
+                        "seconds_per_frame": seconds / batch,
+                        "frames_per_second": batch / seconds,
+                        "peak_alloc_bytes": peak_allocation(statement),
+                        "peak_rss_bytes": peak_rss(),
+                    })
+            device.close_device()
+    return results
+
+
+def regressions(results: list[dict], baseline: list[dict], tolerance: float) -> list[tuple]:
+    """(result, baseline seconds) of every stage more than tolerance slower than in baseline."""
+    previous = {(r["stage"], r["pixels"], r["batch"]): r["seconds_per_batch"] for r in baseline}
+    slower = []
+    for result in results:
+        before = previous.get((result["stage"], result["pixels"], result["batch"]))
+        if before is not None and result["seconds_per_batch"] > before * (1 + tolerance):
+            slower.append((result, before))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Acquisition pipeline throughput on a simulated spectrometer.")
+    parser.add_argument("--pixels", type=int, nargs="+", default=PIXELS)
+    parser.add_argument("--batch", type=int, nargs="+", default=BATCHES)
+    parser.add_argument("--stage", nargs="+", help="only run these stages")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="acquisition_pipeline.json")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    results = run(args.pixels, args.batch, args.stage, args.repeat)
+    print("%-22s %6s %5s %12s %12s %12s %10s" % ("stage", "pixels", "batch", "batch (ms)", "frame (us)", "frames/s", "alloc (MB)"))
+    for r in results:
+        print("%-22s %6d %5d %12.3f %12.1f %12.0f %10.2f" % (r["stage"], r["pixels"], r["batch"], r["seconds_per_batch"] * 1e3,
+              r["seconds_per_frame"] * 1e6, r["frames_per_second"], r["peak_alloc_bytes"] / 2**20))
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "integration_time_us": INTEGRATION_TIME_US,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    print("Results written to %s" % args.output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(results, json.load(f)["results"], args.tolerance)
+        for result, before in slower:
+            print("REGRESSION %s pixels=%d batch=%d: %.3f ms, was %.3f ms" % (result["stage"], result["pixels"],
+                  result["batch"], result["seconds_per_batch"] * 1e3, before * 1e3))
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+
+import os, sys, timeit
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from spectral_processing import NonlinearityLUT, nonlinearity_correct
+
+# Compares the Horner polynomial kernel with the lookup table for nonlinearity correction.
+#
+# Usage: python benchmarks/nonlinearity_lut.py
+#
+# The LUT costs one gather per pixel regardless of the number of coefficients, plus a range
+# (and, for float input, integrality) check. The polynomial costs two passes per coefficient.
+# On integer frames (uint16 counts) the LUT wins at every size; on float64 frames the integrality
+# check costs about as much as a four coefficient polynomial, so the LUT only pays off there for
+# higher order calibrations. Keep frames as integer counts for as long as possible to benefit.
+
+PIXELS = 3648
+MAX_COUNT = 65535
+COEFF_SETS = {
+    "2 coeffs": [1.2e-2, -3.0e-7],
+    "4 coeffs": [1.2e-2, -3.0e-7, 4.0e-12, -2.0e-17],
+    "8 coeffs": [1.2e-2, -3.0e-7, 4.0e-12, -2.0e-17, 1.0e-22, -5.0e-28, 2.0e-33, -1.0e-38],
+}
+
+
+def best_time(statement, repeat: int = 5) -> float:
+    """Best of repeat runs of statement(), in seconds."""
+    number = max(1, int(0.2 / max(1e-6, timeit.timeit(statement, number=1))))
+    return min(timeit.repeat(statement, number=number, repeat=repeat)) / number
+
+
+def run(frame_counts=(1, 10, 100, 1000)) -> list[dict]:
+    rng = np.random.default_rng(0)
+    results = []
+    for name, coeffs in COEFF_SETS.items():
+        lut = NonlinearityLUT(coeffs, MAX_COUNT)
+        for frames in frame_counts:
+            counts = rng.integers(0, MAX_COUNT + 1, size=(frames, PIXELS))
+            as_uint16 = counts.astype(np.uint16)
+            as_float = counts.astype(np.float64)
+            out = np.empty(counts.shape)
+            row = {
+                "coeffs": name,
+                "frames": frames,
+                "polynomial": best_time(lambda: nonlinearity_correct(as_float, coeffs, out=out)),
+                "lut_uint16": best_time(lambda: lut.correct(as_uint16, out=out)),
+                "lut_float64": best_time(lambda: lut.correct(as_float, out=out)),
+            }
+            results.append(row)
+    return results
+
+
+def main():
+    build = best_time(lambda: NonlinearityLUT(COEFF_SETS["8 coeffs"], MAX_COUNT), repeat=3)
+    print("LUT build time (8 coeffs, %d counts): %.2f ms" % (MAX_COUNT + 1, build * 1e3))
+    print("%-9s %7s %14s %14s %14s   %s" % ("coeffs", "frames", "polynomial", "lut uint16", "lut float64", "fastest"))
+    for row in run():
+        timings = {k: row[k] for k in ("polynomial", "lut_uint16", "lut_float64")}
+        print("%-9s %7d %11.1f us %11.1f us %11.1f us   %s" % (row["coeffs"], row["frames"],
+              row["polynomial"] * 1e6, row["lut_uint16"] * 1e6, row["lut_float64"] * 1e6, min(timings, key=timings.get)))
+
+
+if __name__ == '__main__':
+    main()
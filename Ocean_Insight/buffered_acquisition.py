@@ -0,0 +1,293 @@
+
+import threading, time
+import numpy as np
+from oceandirect.OceanDirectAPI import OceanDirectError, Spectrometer
+
+# Background draining of the FX/HDX hardware data buffer into an in-process ring buffer
+
+MAX_SPECTRA_PER_READ = 15 # get_raw_spectrum_with_metadata returns at most 15 spectra per call on FX/HDX
+
+
+class FrameRing:
+    """
+    Bounded ring of spectra and their hardware timestamps, preallocated as one
+    (capacity, pixels) float64 block. When the ring is full the oldest frames are
+    overwritten and counted as dropped, so a slow consumer never stalls the reader.
+    """
+
+    def __init__(self, capacity: int, pixel_count: int):
+        if capacity < 1:
+            raise ValueError("ring capacity must be at least 1")
+        self.capacity = capacity
+        self.pixel_count = pixel_count
+        self.spectra = np.empty((capacity, pixel_count), dtype=np.float64)
+        self.timestamps = np.empty(capacity, dtype=np.int64)
+        self.head = 0 # total number of frames ever written
+        self.tail = 0 # total number of frames ever consumed or dropped
+        self.dropped_frames = 0
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.head - self.tail
+
+    def push(self, spectra: np.ndarray, timestamps: np.ndarray) -> None:
+        """Copy a (n, pixels) batch into the ring, overwriting the oldest frames if needed."""
+        n = len(timestamps)
+        if n == 0:
+            return
+        with self.lock:
+            if n > self.capacity: # only the newest frames of an oversized batch fit
+                self.dropped_frames += n - self.capacity
+                spectra, timestamps = spectra[-self.capacity:], timestamps[-self.capacity:]
+                n = self.capacity
+
+            overflow = self.head + n - self.tail - self.capacity
+            if overflow > 0:
+                self.dropped_frames += overflow
+                self.tail += overflow
+
+            start = self.head % self.capacity
+            first = min(n, self.capacity - start)
+            self.spectra[start:start + first] = spectra[:first]
+            self.timestamps[start:start + first] = timestamps[:first]
+            if first < n:
+                self.spectra[:n - first] = spectra[first:]
+                self.timestamps[:n - first] = timestamps[first:]
+            self.head += n
+            self.not_empty.notify_all()
+
+    def pop(self, max_frames: int, timeout: float = None, stop_event: threading.Event = None):
+        """
+        Remove up to max_frames frames, waiting up to timeout seconds for at least one.
+        Returns copies as (spectra, timestamps); both are empty if nothing arrived in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            while self.head == self.tail:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                # wake up periodically so a stop request is noticed even without a notify
+                self.not_empty.wait(0.1 if remaining is None else min(remaining, 0.1))
+
+            n = min(max_frames, self.head - self.tail)
+            index = (self.tail + np.arange(n)) % self.capacity
+            spectra = self.spectra[index]
+            timestamps = self.timestamps[index]
+            self.tail += n
+        return spectra, timestamps
+
+    def wake(self) -> None:
+        with self.lock:
+            self.not_empty.notify_all()
+
+
+class BufferedAcquisition:
+    """
+    Continuously drains the device data buffer of an FX/HDX style spectrometer from a
+    dedicated reader thread.
+
+    The reader pulls batches of up to 15 spectra with get_raw_spectrum_with_metadata_array
+    into preallocated blocks and publishes them, together with the hardware timestamps, into
+    a bounded FrameRing. Empty reads back off exponentially between minBackoff and maxBackoff
+    seconds instead of spinning; any non-empty read resets the backoff. When a read comes back
+    full the device backlog is checked with get_data_buffer_number_of_elements and a backlog at
+    the configured capacity is counted as a device buffer overflow.
+
+    Frames are consumed either by iterating (yields (timestamp, spectrum) pairs), by read()
+    for whole batches, or by callbacks registered with add_callback(), which are called on the
+    reader thread with each raw batch.
+
+    Usage:
+        with BufferedAcquisition(device, integrationTimeUs=10000, backToBackScans=10) as acq:
+            for timestamp, spectrum in acq.frames(500):
+                ...
+    """
+
+    def __init__(self, device: Spectrometer, integrationTimeUs: int = None, backToBackScans: int = 1,
+                 deviceCapacity: int = 5000, ringCapacity: int = 4096, batchSize: int = MAX_SPECTRA_PER_READ,
+                 minBackoff: float = 0.0005, maxBackoff: float = 0.05, maxConsecutiveErrors: int = 10):
+        if not 1 <= batchSize <= MAX_SPECTRA_PER_READ:
+            raise ValueError("batchSize must be between 1 and %d" % MAX_SPECTRA_PER_READ)
+        self.device = device
+        self.integration_time = integrationTimeUs
+        self.backtoback_scans = backToBackScans
+        self.device_capacity = deviceCapacity
+        self.batch_size = batchSize
+        self.min_backoff = minBackoff
+        self.max_backoff = maxBackoff
+        self.max_consecutive_errors = maxConsecutiveErrors
+
+        self.pixel_count = device.get_formatted_spectrum_length()
+        self.ring = FrameRing(ringCapacity, self.pixel_count)
+        self._batch_spectra = np.empty((batchSize, self.pixel_count), dtype=np.float64)
+        self._batch_timestamps = np.empty(batchSize, dtype=np.int64)
+
+        self.frames_read = 0
+        self.batches_read = 0
+        self.empty_reads = 0
+        self.overflow_events = 0
+        self.read_errors = 0
+        self.last_error = None
+        self.failure = None
+
+        self._callbacks = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def dropped_frames(self) -> int:
+        """Frames overwritten in the ring before a consumer read them."""
+        return self.ring.dropped_frames
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self) -> dict:
+        """Snapshot of the reader counters."""
+        return {
+            "frames_read": self.frames_read,
+            "batches_read": self.batches_read,
+            "empty_reads": self.empty_reads,
+            "dropped_frames": self.dropped_frames,
+            "overflow_events": self.overflow_events,
+            "read_errors": self.read_errors,
+            "queued_frames": len(self.ring),
+        }
+
+    def add_callback(self, callback) -> None:
+        """
+        Register callback(spectra, timestamps), called on the reader thread for every
+        non-empty batch. The arrays are reused for the next read, so copy anything kept.
+        Callbacks must be quick; time spent here delays draining the device.
+        """
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback) -> None:
+        self._callbacks.remove(callback)
+
+    def configure_device(self) -> None:
+        """Enable the device data buffer and back-to-back scans."""
+        advanced = self.device.Advanced
+        if self.integration_time is not None:
+            self.device.set_integration_time(self.integration_time)
+        advanced.clear_data_buffer()
+        advanced.set_data_buffer_enable(True)
+        advanced.set_data_buffer_capacity(self.device_capacity)
+        advanced.set_number_of_backtoback_scans(self.backtoback_scans)
+
+    def start(self) -> "BufferedAcquisition":
+        """Configure the device and start the reader thread."""
+        if self.running:
+            return self
+        self.configure_device()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._reader_loop, name="BufferedAcquisition", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, clearBuffer: bool = True) -> None:
+        """Stop the reader thread. Frames already in the ring can still be read afterwards."""
+        self._stop.set()
+        self.ring.wake()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if clearBuffer:
+            try:
+                self.device.Advanced.clear_data_buffer()
+            except OceanDirectError as err:
+                self.last_error = err
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _reader_loop(self) -> None:
+        advanced = self.device.Advanced
+        backoff = self.min_backoff
+        consecutive_errors = 0
+
+        try:
+            while not self._stop.is_set():
+                try:
+                    spectra, timestamps = advanced.get_raw_spectrum_with_metadata_array(
+                        self.batch_size, self._batch_spectra, self._batch_timestamps)
+                    consecutive_errors = 0
+                except OceanDirectError as err:
+                    self.read_errors += 1
+                    self.last_error = err
+                    consecutive_errors += 1
+                    if consecutive_errors >= self.max_consecutive_errors:
+                        self.failure = err
+                        break
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+                    continue
+
+                n = len(timestamps)
+                if n == 0:
+                    self.empty_reads += 1
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+                    continue
+
+                backoff = self.min_backoff
+                self.frames_read += n
+                self.batches_read += 1
+                self.ring.push(spectra, timestamps)
+                for callback in self._callbacks:
+                    callback(spectra, timestamps)
+
+                # a full batch means the device may be backed up; check whether it has hit capacity
+                if n == self.batch_size:
+                    try:
+                        if advanced.get_data_buffer_number_of_elements() >= self.device_capacity:
+                            self.overflow_events += 1
+                    except OceanDirectError as err:
+                        self.last_error = err
+        except BaseException as err:
+            # anything else (a callback, the ring) ends the reader too; read() re-raises it
+            self.failure = err
+        finally:
+            self._stop.set()
+            self.ring.wake()
+
+    def read(self, maxFrames: int = MAX_SPECTRA_PER_READ, timeout: float = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return up to maxFrames queued frames as a (n, pixels) array and their timestamps.
+        Blocks until at least one frame is available, the timeout expires or the reader stops.
+        Raises the error that stopped the reader (a device error or an exception from a callback)
+        once the ring has been drained.
+        """
+        spectra, timestamps = self.ring.pop(maxFrames, timeout, self._stop)
+        if len(timestamps) == 0 and self.failure is not None:
+            raise self.failure
+        return spectra, timestamps
+
+    def frames(self, count: int = None, timeout: float = None):
+        """
+        Yield (timestamp, spectrum) pairs as they arrive. Stops after count frames, when no
+        frame arrives within timeout seconds, or once the reader has stopped and the ring is empty.
+        """
+        delivered = 0
+        while count is None or delivered < count:
+            wanted = MAX_SPECTRA_PER_READ if count is None else min(MAX_SPECTRA_PER_READ, count - delivered)
+            spectra, timestamps = self.read(wanted, timeout)
+            if len(timestamps) == 0:
+                if self._stop.is_set() or timeout is not None:
+                    return
+                continue
+            for i in range(len(timestamps)):
+                yield int(timestamps[i]), spectra[i]
+            delivered += len(timestamps)
+
+    def __iter__(self):
+        return self.frames()
@@ -0,0 +1,112 @@
+
+import os, json, threading
+from collections import namedtuple
+from oceandirect.OceanDirectAPI import OceanDirectError, Spectrometer
+from wavelength_grid import WavelengthGrid
+
+# Cache of the per-device calibration so captures do not re-read the EEPROM coefficients
+
+Calibration = namedtuple("Calibration", ["serial_number", "firmware", "wavelength_coeffs", "nonlinearity_coeffs", "wavelengths"])
+Calibration.__doc__ = """Calibration of one spectrometer. wavelengths is the shared WavelengthGrid
+evaluated from all of the wavelength coefficients."""
+
+
+class CalibrationCache:
+    """
+    In-memory, optionally disk-backed, cache of wavelength and nonlinearity coefficients keyed
+    by (serial number, firmware revision). A firmware update changes the key, so stale
+    coefficients are never reused across firmware versions. Pass a JSON file path to keep the
+    cache across processes; it is rewritten whenever an entry is added or invalidated.
+
+    Usage:
+        cache = CalibrationCache('calibration_cache.json')
+        calibration = cache.get(device)
+        wavelengths, spectrum = correct_spectrum(raw, calibration.wavelength_coeffs, calibration.nonlinearity_coeffs)
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.entries = {}  # (serial number, firmware) -> Calibration
+        self.firmware = {} # serial number -> firmware revision read during this process
+        self.lock = threading.RLock()
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self.entries
+
+    def firmware_revision(self, device: Spectrometer, serialNumber: str) -> str:
+        """Firmware revision of the device, read once per serial number. Empty if the device cannot report it."""
+        if serialNumber not in self.firmware:
+            try:
+                self.firmware[serialNumber] = device.Advanced.get_revision_firmware()
+            except OceanDirectError:
+                self.firmware[serialNumber] = ""
+        return self.firmware[serialNumber]
+
+    def get(self, device: Spectrometer, serialNumber: str = None) -> Calibration:
+        """Returns the calibration of an open device, reading the coefficients from it only on a cache miss."""
+        if serialNumber is None:
+            serialNumber = device.serial_number if device.serial_number is not None else device.get_serial_number()
+        with self.lock:
+            key = (serialNumber, self.firmware_revision(device, serialNumber))
+            calibration = self.entries.get(key)
+            if calibration is None:
+                pixel_count = device.pixel_count_formatted or device.get_formatted_spectrum_length()
+                calibration = self.put(serialNumber, key[1], device.Advanced.get_wavelength_coeffs(),
+                                       device.Advanced.get_nonlinearity_coeffs(), pixel_count)
+            return calibration
+
+    def put(self, serialNumber: str, firmware: str, wavelength_coeffs, nonlinearity_coeffs, pixel_count: int) -> Calibration:
+        """Adds or replaces an entry and returns it."""
+        calibration = Calibration(serialNumber, firmware, list(wavelength_coeffs), list(nonlinearity_coeffs),
+                                  WavelengthGrid.for_calibration(wavelength_coeffs, pixel_count))
+        with self.lock:
+            self.entries[(serialNumber, firmware)] = calibration
+            self.save()
+        return calibration
+
+    def invalidate(self, serialNumber: str = None, firmware: str = None) -> int:
+        """
+        Drops cached entries so the next get() re-reads the device. With no arguments everything is
+        dropped; otherwise only entries matching the given serial number and/or firmware revision.
+        Returns the number of entries removed.
+        """
+        with self.lock:
+            stale = [key for key in self.entries
+                     if (serialNumber is None or key[0] == serialNumber) and (firmware is None or key[1] == firmware)]
+            for key in stale:
+                del self.entries[key]
+            if serialNumber is None:
+                self.firmware.clear()
+            else:
+                self.firmware.pop(serialNumber, None)
+            if stale:
+                self.save()
+        return len(stale)
+
+    def save(self) -> None:
+        """Writes the cache to its JSON file, if it has one."""
+        if self.path is None:
+            return
+        with self.lock:
+            records = [{"serial_number": c.serial_number, "firmware": c.firmware,
+                        "wavelength_coeffs": c.wavelength_coeffs, "nonlinearity_coeffs": c.nonlinearity_coeffs,
+                        "pixel_count": len(c.wavelengths)} for c in self.entries.values()]
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(records, f, indent=1)
+            os.replace(temp_path, self.path) # never leave a half written cache behind
+
+    def load(self) -> None:
+        """Reads the entries stored in the JSON file, replacing the in-memory ones with the same key."""
+        with open(self.path) as f:
+            records = json.load(f)
+        with self.lock:
+            for r in records:
+                self.entries[(r["serial_number"], r["firmware"])] = Calibration(
+                    r["serial_number"], r["firmware"], r["wavelength_coeffs"], r["nonlinearity_coeffs"],
+                    WavelengthGrid.for_calibration(r["wavelength_coeffs"], r["pixel_count"]))
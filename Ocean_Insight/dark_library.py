@@ -0,0 +1,149 @@
+
+import threading
+import numpy as np
+from spectral_library import SpectralLibrary
+from spectral_catalog import SpectralCatalog, parse_legacy_name
+
+# Master dark frames per (serial number, integration time, detector temperature)
+
+
+class DarkLibrary:
+    """
+    Builds and caches median master darks keyed by (serial number, integration time in us,
+    detector temperature). Darks can come from dark CSVs (e.g. Spectral_Files/Darks/Dark_<us>.csv,
+    found through the catalog), from frames captured live, or from a ready-made master. Masters
+    from files are computed on first use and kept in memory.
+
+    When there is no master for the requested integration time, the master is interpolated
+    linearly in integration time between the nearest measured exposures (or extrapolated from the
+    two nearest ones), which matches the bias + dark current * t behaviour of the detector.
+
+    temperature is always the detector temperature recorded with the capture
+    (Read_Spectrum.detector_temperature), never the filter temperature of a run. serial number and
+    temperature may be None for legacy files that do not record them; such masters are used when
+    no master for the requested serial number/temperature exists.
+
+    Usage:
+        darks = DarkLibrary.from_catalog()
+        corrected = darks.subtract(spectra, 30000)   # spectra may be one frame or (n_frames, n_pixels)
+    """
+
+    def __init__(self, library: SpectralLibrary = None, temperatureTolerance: float = 1.0):
+        self.library = library if library is not None else SpectralLibrary()
+        self.temperature_tolerance = temperatureTolerance
+        self.sources = {}      # key -> dark file path, loaded on first use
+        self.masters = {}      # key -> master dark (read-only)
+        self.interpolated = {} # key -> master interpolated from measured keys
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def from_catalog(catalog: SpectralCatalog = None, library: SpectralLibrary = None, **kwargs) -> "DarkLibrary":
+        """Registers every dark in the catalog (see SpectralCatalog.backfill)."""
+        catalog = catalog if catalog is not None else SpectralCatalog()
+        darks = DarkLibrary(library, **kwargs)
+        for capture in catalog.query(kind="dark"):
+            darks.add_file(catalog.absolute_path(capture), capture.integration_time_us, capture.serial_number,
+                           capture.detector_temperature_c)
+        return darks
+
+    def keys(self) -> list:
+        return sorted(set(self.sources) | set(self.masters), key=lambda k: (str(k[0]), k[1], str(k[2])))
+
+    def add_file(self, path: str, integration_time_us: int = None, serial_number: str = None, temperature: float = None) -> None:
+        """Registers a dark CSV. The integration time defaults to the one in a Dark_<us>.csv name."""
+        if integration_time_us is None:
+            integration_time_us = parse_legacy_name(path).get("integration_time_us")
+            if integration_time_us is None:
+                raise ValueError("No integration time given for %s and none in its name." % path)
+        key = (serial_number, int(integration_time_us), temperature)
+        with self.lock:
+            self.sources[key] = path
+            self.masters.pop(key, None)
+            self.interpolated.clear()
+
+    def add_frames(self, frames, integration_time_us: int, serial_number: str = None, temperature: float = None) -> np.ndarray:
+        """Builds a master from captured dark frames ((n_frames, n_pixels) array or a list of spectra)."""
+        return self.add_master(np.median(np.asarray(frames, dtype=np.float64), axis=0), integration_time_us,
+                               serial_number, temperature)
+
+    def record(self, frames, integration_time_us: int, serial_number: str = None, temperature: float = None) -> np.ndarray:
+        """Builds a master from a live frame iterator such as iter_spectra(...) with the shutter closed.
+        temperature is the detector temperature at capture (Read_Spectrum.detector_temperature(device))."""
+        return self.add_frames([spectrum for timestamp, wavelengths, spectrum in frames], integration_time_us,
+                               serial_number, temperature)
+
+    def add_master(self, master, integration_time_us: int, serial_number: str = None, temperature: float = None) -> np.ndarray:
+        master = np.array(master, dtype=np.float64)
+        master.setflags(write=False)
+        key = (serial_number, int(integration_time_us), temperature)
+        with self.lock:
+            self.masters[key] = master
+            self.sources.pop(key, None)
+            self.interpolated.clear()
+        return master
+
+    def _measured(self, key) -> np.ndarray:
+        master = self.masters.get(key)
+        if master is None:
+            master = self.library.load(self.sources[key]).median()
+            master.setflags(write=False)
+            self.masters[key] = master
+        return master
+
+    def _candidates(self, serial_number, temperature) -> dict:
+        """integration time -> key of the measured masters that fit the serial number and temperature."""
+        keys = set(self.sources) | set(self.masters)
+        for serial in ([serial_number, None] if serial_number is not None else [None]):
+            same_serial = [k for k in keys if k[0] == serial]
+            if temperature is not None:
+                close = [k for k in same_serial
+                         if k[2] is not None and abs(k[2] - temperature) <= self.temperature_tolerance]
+                if close:
+                    # nearest temperature wins for each integration time
+                    close.sort(key=lambda k: abs(k[2] - temperature), reverse=True)
+                    return {k[1]: k for k in close}
+            same_serial = [k for k in same_serial if k[2] is None or temperature is None]
+            same_serial.sort(key=lambda k: k[2] is None) # masters without a temperature win ties
+            if same_serial:
+                return {k[1]: k for k in same_serial}
+        return {}
+
+    def master(self, integration_time_us: int, serial_number: str = None, temperature: float = None) -> np.ndarray:
+        """Master dark for these conditions, measured or interpolated. Raises KeyError if there are no darks."""
+        key = (serial_number, int(integration_time_us), temperature)
+        with self.lock:
+            if key in self.masters:
+                return self.masters[key]
+            if key in self.interpolated:
+                return self.interpolated[key]
+            candidates = self._candidates(serial_number, temperature)
+            if not candidates:
+                raise KeyError("No dark frames for serial %s at %s C." % (serial_number, temperature))
+            if integration_time_us in candidates:
+                return self._measured(candidates[integration_time_us])
+
+            times = sorted(candidates)
+            if len(times) == 1:
+                master = self._measured(candidates[times[0]])
+            else:
+                # bracketing exposures, or the two nearest ones when outside the measured range
+                index = int(np.clip(np.searchsorted(times, integration_time_us), 1, len(times) - 1))
+                t0, t1 = times[index - 1], times[index]
+                d0, d1 = self._measured(candidates[t0]), self._measured(candidates[t1])
+                weight = (integration_time_us - t0) / (t1 - t0)
+                master = d0 + weight * (d1 - d0)
+                master.setflags(write=False)
+            self.interpolated[key] = master
+            return master
+
+    def subtract(self, spectra, integration_time_us: int, serial_number: str = None, temperature: float = None,
+                 out: np.ndarray = None) -> np.ndarray:
+        """Subtracts the master dark from one spectrum or a (n_frames, n_pixels) stack in one vectorized pass."""
+        return np.subtract(spectra, self.master(integration_time_us, serial_number, temperature), out=out)
+
+    def subtracting(self, frames, integration_time_us: int, serial_number: str = None, temperature: float = None):
+        """Wraps a live frame iterator (e.g. iter_spectra) and yields dark subtracted frames.
+        temperature is the detector temperature (Read_Spectrum.detector_temperature(device))."""
+        master = self.master(integration_time_us, serial_number, temperature)
+        for timestamp, wavelengths, spectrum in frames:
+            yield timestamp, wavelengths, spectrum - master
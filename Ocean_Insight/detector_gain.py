@@ -0,0 +1,155 @@
+
+import os
+import numpy as np
+from collections import namedtuple
+from spectral_library import SpectralLibrary
+from spectral_catalog import parse_legacy_name
+from spectral_processing import nonlinearity_correct
+from dark_library import DarkLibrary
+
+# Detector linearity and gain from exposure time sweeps (Spectral_Files/Gain_Spectra layout)
+#
+# A sweep is a directory of Spectral_Intensity_<us>.csv files of a steady source, each holding
+# a few frames, plus Dark_<us>.csv files. The whole sweep is loaded as one
+# (n_exposures, n_frames, n_pixels) array and every pixel is analysed at once:
+#     linearity:       dark subtracted median counts vs exposure time, a straight line per pixel
+#     photon transfer: temporal variance vs mean per pixel, variance = mean / gain + read_noise**2
+#                      (gain in e-/ADU, read noise in ADU)
+
+LinearityFit = namedtuple("LinearityFit", ["slope", "intercept", "residuals", "fractional_residuals",
+                                           "rms_fractional_residual", "used"])
+LinearityFit.__doc__ = """Per-pixel straight line fit of counts vs exposure time: slope (counts/s) and intercept
+(counts) are (n_pixels,), residuals and fractional_residuals (residual / fitted counts) are
+(n_exposures, n_pixels) with NaN for excluded points, used is the mask of points in each fit."""
+
+PhotonTransfer = namedtuple("PhotonTransfer", ["gain", "read_noise_adu", "read_noise_e", "pixel_gain",
+                                               "pixel_read_noise_adu", "mean", "variance"])
+PhotonTransfer.__doc__ = """Photon transfer results: gain (e-/ADU) and read noise from one fit over every pixel
+and exposure, pixel_gain / pixel_read_noise_adu from a fit per pixel across exposures, and the
+(n_exposures, n_pixels) mean and variance they were fitted to."""
+
+
+def _line_fits(x, y, mask):
+    """Least-squares lines through the masked points of every column of y ((n, n_columns)), all at
+    once. x is (n, n_columns) or broadcastable to it."""
+    w = mask.astype(np.float64)
+    x = np.where(mask, x, 0.0)
+    y = np.where(mask, y, 0.0)
+    s, sx, sy = w.sum(axis=0), (w * x).sum(axis=0), (w * y).sum(axis=0)
+    sxx, sxy = (w * x * x).sum(axis=0), (w * x * y).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (s * sxy - sx * sy) / (s * sxx - sx**2)
+        intercept = (sy - slope * sx) / s
+    return slope, intercept
+
+
+class ExposureSweep:
+    """
+    Frames of a steady source at several exposure times with the matching master darks.
+
+    Usage:
+        sweep = ExposureSweep.from_directory()
+        linearity = sweep.linearity()            # linearity.slope[pixel], linearity.fractional_residuals
+        ptc = sweep.photon_transfer()            # ptc.gain (e-/ADU), ptc.read_noise_e
+    """
+
+    def __init__(self, exposure_times_us, wavelengths, frames, darks=0.0):
+        order = np.argsort(exposure_times_us)
+        self.exposure_times_us = np.asarray(exposure_times_us, dtype=np.int64)[order]
+        self.wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        self.frames = np.asarray(frames, dtype=np.float64)[order] # (n_exposures, n_frames, n_pixels)
+        darks = np.asarray(darks, dtype=np.float64)
+        self.darks = darks[order] if darks.ndim == 2 else darks
+
+    @staticmethod
+    def from_directory(directory: str = 'Gain_Spectra', darkDirectory: str = 'Darks', exposureTimes=None,
+                       nonlinearityCoeffs=None, library: SpectralLibrary = None) -> "ExposureSweep":
+        """
+        Loads every Spectral_Intensity_<us>.csv of directory (or only those in exposureTimes, in us).
+        Master darks come from the Dark_<us>.csv files of darkDirectory through a DarkLibrary, so
+        exposures without their own dark get one interpolated in exposure time; darkDirectory may
+        be None for dark subtracted data. With nonlinearityCoeffs the frames are corrected first,
+        which is how a set of get_nonlinearity_coeffs() values is checked against the sweep.
+        """
+        library = library if library is not None else SpectralLibrary()
+        wanted = None if exposureTimes is None else {int(t) for t in exposureTimes}
+        times, paths = [], []
+        for path in library.glob(os.path.join(library.resolve(directory), 'Spectral_Intensity_*.csv')):
+            fields = parse_legacy_name(path)
+            if fields.get("kind") == "gain" and (wanted is None or fields["integration_time_us"] in wanted):
+                times.append(fields["integration_time_us"])
+                paths.append(path)
+        if not paths:
+            raise ValueError("No Spectral_Intensity_<us>.csv files in %s." % directory)
+
+        files = library.load_many(paths)
+        n_frames = min(len(f) for f in files)
+        wavelengths = np.asarray(files[0].wavelengths)
+        for f in files[1:]:
+            if not np.array_equal(f.wavelengths, wavelengths):
+                raise ValueError("%s was taken on a different wavelength grid than %s." % (f.path, files[0].path))
+        frames = np.stack([f.spectra[:n_frames] for f in files])
+        if nonlinearityCoeffs is not None:
+            nonlinearity_correct(frames.reshape(-1, frames.shape[-1]), nonlinearityCoeffs,
+                                 out=frames.reshape(-1, frames.shape[-1]))
+
+        darks = 0.0
+        if darkDirectory is not None:
+            dark_library = DarkLibrary(library)
+            for path in library.glob(os.path.join(library.resolve(darkDirectory), 'Dark_*.csv')):
+                dark_library.add_file(path)
+            darks = np.stack([dark_library.master(t) for t in times])
+        return ExposureSweep(times, wavelengths, frames, darks)
+
+    @property
+    def exposure_times(self) -> np.ndarray:
+        """Exposure times in seconds."""
+        return self.exposure_times_us * 1e-6
+
+    @property
+    def signal(self) -> np.ndarray:
+        """(n_exposures, n_pixels) dark subtracted median counts."""
+        return np.median(self.frames, axis=1) - self.darks
+
+    def linearity(self, saturationCounts: float = None, minCounts: float = None) -> LinearityFit:
+        """
+        Fits counts = slope * t + intercept for every pixel. Points whose raw median reaches
+        saturationCounts, or whose dark subtracted signal is below minCounts, are left out of
+        that pixel's fit.
+        """
+        signal = self.signal
+        used = np.isfinite(signal)
+        if saturationCounts is not None:
+            used &= np.median(self.frames, axis=1) < saturationCounts
+        if minCounts is not None:
+            used &= signal >= minCounts
+        slope, intercept = _line_fits(self.exposure_times[:, np.newaxis], signal, used)
+        fitted = slope * self.exposure_times[:, np.newaxis] + intercept
+        residuals = np.where(used, signal - fitted, np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fractional = residuals / fitted
+            rms = np.sqrt(np.nansum(fractional**2, axis=0) / used.sum(axis=0))
+        return LinearityFit(slope, intercept, residuals, fractional, rms, used)
+
+    def photon_transfer(self, saturationCounts: float = None, minCounts: float = 0.0) -> PhotonTransfer:
+        """
+        Photon transfer analysis from the frame-to-frame variance of every pixel at every
+        exposure (the median dark is subtracted from the mean; the variance needs at least two
+        frames per exposure). Points at or above saturationCounts, or below minCounts, are excluded.
+        """
+        if self.frames.shape[1] < 2:
+            raise ValueError("Photon transfer needs at least 2 frames per exposure.")
+        mean = self.frames.mean(axis=1) - self.darks
+        variance = self.frames.var(axis=1, ddof=1)
+        used = np.isfinite(mean) & np.isfinite(variance) & (mean >= minCounts)
+        if saturationCounts is not None:
+            used &= self.frames.max(axis=1) < saturationCounts
+
+        slope, intercept = _line_fits(mean.reshape(-1, 1), variance.reshape(-1, 1), used.reshape(-1, 1))
+        gain = 1 / slope[0]
+        read_noise_adu = np.sqrt(max(intercept[0], 0.0))
+        pixel_slope, pixel_intercept = _line_fits(mean, variance, used)
+        with np.errstate(divide="ignore"):
+            pixel_gain = 1 / pixel_slope
+        return PhotonTransfer(gain, read_noise_adu, gain * read_noise_adu, pixel_gain,
+                              np.sqrt(np.clip(pixel_intercept, 0, None)), mean, variance)
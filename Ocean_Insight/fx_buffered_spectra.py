@@ -5,7 +5,9 @@ Created on Fri Aug  2 11:20:30 2022
 @author: Ocean Insight Inc.
 """
 
+import numpy as np
 from oceandirect.OceanDirectAPI import OceanDirectAPI, OceanDirectError, FeatureID
+from buffered_acquisition import BufferedAcquisition
 
 serialNumber = ""
 
@@ -87,6 +89,10 @@ def readFXBufferedSpectra(device, integrationTime):
         device.Advanced.set_data_buffer_capacity(5000)
         device.Advanced.set_number_of_backtoback_scans(spectraToReadPerTrigger)
 
+        #preallocated output blocks reused by every read. 15 = maximum number of spectra returned per call
+        buffer_block     = np.empty((15, device.get_formatted_spectrum_length()), dtype=np.float64)
+        timestamp_block  = np.empty(15, dtype=np.int64)
+
         #The loop represent 5 triggers.
         #NOTE: 
         #SW trigger happens when you issue a get spectra command. So the for-loop here is just a 
@@ -97,15 +103,13 @@ def readFXBufferedSpectra(device, integrationTime):
 
             #read 10 buffered spectra from FX unit
             while count < spectraToReadPerTrigger:
-                buffer_spectra = []
-                timestamp = []
-
                 try:
                     #NOTE:
                     #When buffering is enabled, this command is non-blocking and may return 0 spectra if buffer is empty.
                     #When buffering is disabled, this command will block.
                     #15 = maximum number of spectra returned per call
-                    total = device.Advanced.get_raw_spectrum_with_metadata(buffer_spectra, timestamp, 15)
+                    buffer_spectra, timestamp = device.Advanced.get_raw_spectrum_with_metadata_array(15, buffer_block, timestamp_block)
+                    total = len(timestamp)
 
                     if total == 0:
                         #NOTE: probably add some delay here or key press.
@@ -129,6 +133,23 @@ def readFXBufferedSpectra(device, integrationTime):
     print("")
 
 
+def readFXBufferedSpectraInBackground(device, integrationTime, spectraToRead = 50):
+    #Same as readFXBufferedSpectra() but the data buffer is drained by a reader thread, so
+    #there is no busy loop here and nothing is printed while the buffer is empty.
+    try:
+        with BufferedAcquisition(device, integrationTime, backToBackScans = 10) as acquisition:
+            count = 0
+            for timestamp, spectrum in acquisition.frames(spectraToRead, timeout = 5.0):
+                print("%d] %d ==> %d, %d, %d, %d, %d" % (count, timestamp, spectrum[500], spectrum[600],
+                                                         spectrum[700], spectrum[800], spectrum[900]) )
+                count += 1
+        print("readFXBufferedSpectraInBackground(device): %s" % acquisition.stats())
+    except OceanDirectError as err:
+        [errorCode, errorMsg] = err.get_error_details()
+        print("readFXBufferedSpectraInBackground(device): exception / %d = %s" % (errorCode, errorMsg))
+    print("")
+
+
 #----------------------------------------------------------------------------------------
 # Main program starts here :-P
 #
@@ -163,6 +184,7 @@ if __name__ == '__main__':
             revision(device)
             readFXBufferedSpectra(device, 10)
             readFXBufferedSpectra(device, 20)
+            readFXBufferedSpectraInBackground(device, 20)
 
  
             print("\n[END] Closing device [%s]!" % serialNumber)
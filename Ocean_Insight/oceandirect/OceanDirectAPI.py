@@ -5,11 +5,14 @@ Created on Wed Jan  9 16:23:44 2019
 """
 import traceback
 import json
+import numpy as np
 from typing import List
-from ctypes import cdll, c_int, c_ushort, c_uint, c_long, create_string_buffer, c_ulong, c_ubyte, c_double, c_float, c_longlong, POINTER, byref
+from ctypes import cdll, c_int, c_ushort, c_uint, c_long, create_string_buffer, c_ulong, c_ubyte, c_double, c_float, c_longlong, POINTER, byref, cast
 from enum import Enum,auto
-from oceandirect.sdk_properties import oceandirect_dll
+from oceandirect.sdk_properties import oceandirect_dll, oceandirect_backend, oceandirect_instrument
 from oceandirect.od_logger import od_logger
+from oceandirect.od_buffers import SpectrumBufferPool, to_list
+from oceandirect.od_bindings import bind_library
 
 logger = od_logger()
 
@@ -30,7 +33,17 @@ class OceanDirectAPI:
     
     class __OceanDirectSingleton:
         def __init__(self):
-            self.oceandirect = cdll.LoadLibrary(oceandirect_dll)
+            if oceandirect_backend == "simulator":
+                from oceandirect.od_simulator import SimulatedOceanDirect
+                self.oceandirect = SimulatedOceanDirect.from_environment()
+                self.missing_symbols = []
+            else:
+                self.oceandirect = cdll.LoadLibrary(oceandirect_dll)
+                #declare argtypes/restype for every odapi symbol once, the wrappers call the prebound pointers.
+                self.missing_symbols = bind_library(self.oceandirect)
+            if oceandirect_instrument:
+                from oceandirect.od_instrumentation import InstrumentedLibrary
+                self.oceandirect = InstrumentedLibrary(self.oceandirect)
             self.oceandirect.odapi_initialize()
             self.open_devices = dict()
             self.num_devices  = 0
@@ -103,7 +116,6 @@ class OceanDirectAPI:
         minor = c_uint(0)
         point = c_uint(0)
 
-        self.oceandirect.odapi_get_api_version_numbers.argtypes = [POINTER(c_uint), POINTER(c_uint), POINTER(c_uint)]
         self.oceandirect.odapi_get_api_version_numbers(byref(major), byref(minor), byref(point) )
 
         return (major.value, minor.value, point.value)
@@ -167,8 +179,8 @@ class OceanDirectAPI:
         @see open_device()
         """
 
-        if device_id in self.open_devices:
-            device = self.open_devices[device_id]
+        device = self.open_devices.pop(device_id, None)
+        if device is not None:
             device.close_device()
 
     def list_all_devices(self) -> None:
@@ -471,6 +483,7 @@ class Spectrometer():
         self.scans_to_avg = 1
         self.boxcar_hw = False
         self.__nlflag = c_ubyte(1)
+        self.buffer_pool = SpectrumBufferPool(0)
 
     def get_serial_number(self) -> str:
         """!
@@ -555,6 +568,7 @@ class Spectrometer():
             if err_cp[0] != 0:
                 error_msg = self.decode_error(err_cp[0], "get_formatted_spectrum_length")
                 raise OceanDirectError(err_cp[0], error_msg)
+            self.buffer_pool = SpectrumBufferPool(self.pixel_count_formatted, self.buffer_pool.depth)
             if self.serial_number is None:
                 self.serial_number = self.get_serial_number()
             self.get_wavelengths()
@@ -572,6 +586,15 @@ class Spectrometer():
                 raise OceanDirectError(err_cp[0], error_msg)
         self.status = 'closed'
 
+    def set_buffer_pool_depth(self, depth: int) -> None:
+        """!
+        Set how many spectrum buffers the device keeps for reuse. Raise this when several frames are
+        held in flight at once (e.g. pipelined processing) so that each one still comes from the pool.
+        @param[in] depth The number of reusable spectrum buffers.
+        """
+
+        self.buffer_pool.set_depth(depth)
+
     def use_nonlinearity(self, nonlinearity_flag: bool) -> None:
         """!
         Determine if nonlinearity correction should be used in calculations. Typically should be set to true.
@@ -646,7 +669,6 @@ class Spectrometer():
         @return The maximum intensity.
         """
 
-        self.oceandirect.odapi_get_maximum_intensity.restype = c_double
         err_cp        = (c_long * 1)(0)
         max_intensity = self.oceandirect.odapi_get_maximum_intensity(self.device_id, err_cp)
 
@@ -655,23 +677,50 @@ class Spectrometer():
             raise OceanDirectError(err_cp[0], error_msg)
         return max_intensity
 
-    def get_formatted_spectrum(self) -> list[float]:
+    def get_formatted_spectrum(self, out: np.ndarray = None, as_numpy: bool = False) -> list[float]:
         """!
-        Return a formatted spectrum.
-        @return The formatted spectrum.
+        Return a formatted spectrum. By default the spectrum is copied into a python list. If a numpy
+        array is requested then the device writes straight into the array memory and no per-pixel
+        python objects are created.
+        @param[in] out      Optional preallocated, writeable and C-contiguous float64 numpy array with at
+                            least get_formatted_spectrum_length() elements. It is reused on every call.
+        @param[in] as_numpy True to return a numpy array. This is implied when "out" is given.
+        @return The formatted spectrum. A view of "out" (trimmed to the pixels copied) when numpy
+                output is used, otherwise a python list.
         """
 
-        spd_c = (c_double * self.pixel_count_formatted)(0)
-        err_cp = (c_long * 1)(0)
-        copiedCount = self.oceandirect.odapi_get_formatted_spectrum(self.device_id, err_cp, spd_c, self.pixel_count_formatted)
+        if out is None and not as_numpy:
+            spd_c  = self.buffer_pool.acquire()
+            err_cp = self.buffer_pool.error_code()
+            try:
+                copiedCount = self.oceandirect.odapi_get_formatted_spectrum(self.device_id, err_cp, spd_c, self.pixel_count_formatted)
+                if err_cp[0] != 0:
+                    error_msg = self.decode_error(err_cp[0],"get_formatted_spectrum")
+                    raise OceanDirectError(err_cp[0], error_msg)
+
+                if copiedCount == 0:
+                    return list()
+                else:
+                    return to_list(spd_c)
+            finally:
+                self.buffer_pool.release(spd_c)
+
+        if out is None:
+            out = np.empty(self.pixel_count_formatted, dtype=np.float64)
+        elif (out.dtype != np.float64 or not out.flags.c_contiguous or not out.flags.writeable
+              or out.size < self.pixel_count_formatted):
+            #15 is an error code defined in OceanDirectAPIConstants.c
+            error_msg = self.decode_error(15, "get_formatted_spectrum")
+            raise OceanDirectError(15, error_msg)
+
+        err_cp = self.buffer_pool.error_code()
+        copiedCount = self.oceandirect.odapi_get_formatted_spectrum(self.device_id, err_cp, out.ctypes.data_as(POINTER(c_double)),
+                                                                    self.pixel_count_formatted)
         if err_cp[0] != 0:
             error_msg = self.decode_error(err_cp[0],"get_formatted_spectrum")
             raise OceanDirectError(err_cp[0], error_msg)
 
-        if copiedCount == 0:
-            return list()
-        else:
-            return list(spd_c)
+        return out.reshape(-1)[:copiedCount]
 
     def get_formatted_spectrum_length(self) -> int:
         """!
@@ -697,7 +746,7 @@ class Spectrometer():
                 error_msg = self.decode_error(err_cp[0],"get_wavelengths")
                 raise OceanDirectError(err_cp[0], error_msg)
             else:
-                self.wavelengths = list(wl_c)
+                self.wavelengths = to_list(wl_c)
         return self.wavelengths
     
     def get_minimum_integration_time(self) -> int:
@@ -1043,17 +1092,16 @@ class Spectrometer():
             error_msg = self.decode_error(10,"set_stored_dark_spectrum")
             raise OceanDirectError(10, error_msg)
 
-        err_cp             = (c_long * 1)(0)
-        double_array_count = len(darkSpectrum)
-        double_array       = (c_double * double_array_count)(0)
-        for x in range(double_array_count):
-            double_array[x] = darkSpectrum[x]
-
-        self.oceandirect.odapi_set_stored_dark_spectrum(self.device_id, err_cp, double_array, double_array_count)
+        err_cp             = self.buffer_pool.error_code()
+        double_array, double_array_count = self.buffer_pool.marshal(darkSpectrum)
+        try:
+            self.oceandirect.odapi_set_stored_dark_spectrum(self.device_id, err_cp, double_array, double_array_count)
 
-        if err_cp[0] != 0:
-           error_msg = self.decode_error(err_cp[0],"set_stored_dark_spectrum")
-           raise OceanDirectError(err_cp[0], error_msg)
+            if err_cp[0] != 0:
+               error_msg = self.decode_error(err_cp[0],"set_stored_dark_spectrum")
+               raise OceanDirectError(err_cp[0], error_msg)
+        finally:
+            self.buffer_pool.release(double_array)
 
     def get_stored_dark_spectrum(self) -> list[float]:
         """!
@@ -1062,13 +1110,16 @@ class Spectrometer():
         @return The dark spectrum.
         """
 
-        double_array = (c_double * self.pixel_count_formatted)()
-        err_cp       = (c_long * 1)(0)
-        self.oceandirect.odapi_get_stored_dark_spectrum(self.device_id, err_cp, double_array, self.pixel_count_formatted)
-        if err_cp[0] != 0:
-            error_msg = self.decode_error(err_cp[0],"get_stored_dark_spectrum")
-            raise OceanDirectError(err_cp[0], error_msg)
-        return list(double_array)
+        double_array = self.buffer_pool.acquire()
+        err_cp       = self.buffer_pool.error_code()
+        try:
+            self.oceandirect.odapi_get_stored_dark_spectrum(self.device_id, err_cp, double_array, self.pixel_count_formatted)
+            if err_cp[0] != 0:
+                error_msg = self.decode_error(err_cp[0],"get_stored_dark_spectrum")
+                raise OceanDirectError(err_cp[0], error_msg)
+            return to_list(double_array)
+        finally:
+            self.buffer_pool.release(double_array)
 
     def get_dark_corrected_spectrum1(self, darkSpectrum: list[float]) -> list[float]:
         """!
@@ -1082,19 +1133,18 @@ class Spectrometer():
             error_msg = self.decode_error(10,"get_dark_corrected_spectrum1")
             raise OceanDirectError(10, error_msg)
 
-        corrected_spectrum_array  = (c_double * self.pixel_count_formatted)()
-        dark_spectrum_array_count = len(darkSpectrum)
-        dark_spectrum_array       = (c_double * dark_spectrum_array_count)()
-        err_cp                    = (c_long * 1)(0)
-        for x in range(dark_spectrum_array_count):
-            dark_spectrum_array[x] = darkSpectrum[x]
-
-        self.oceandirect.odapi_get_dark_corrected_spectrum1(self.device_id, err_cp, dark_spectrum_array, dark_spectrum_array_count,
-                                                            corrected_spectrum_array, self.pixel_count_formatted)
-        if err_cp[0] != 0:
-            error_msg = self.decode_error(err_cp[0],"get_dark_corrected_spectrum1")
-            raise OceanDirectError(err_cp[0], error_msg)
-        return list(corrected_spectrum_array)
+        corrected_spectrum_array  = self.buffer_pool.acquire()
+        dark_spectrum_array, dark_spectrum_array_count = self.buffer_pool.marshal(darkSpectrum)
+        err_cp                    = self.buffer_pool.error_code()
+        try:
+            self.oceandirect.odapi_get_dark_corrected_spectrum1(self.device_id, err_cp, dark_spectrum_array, dark_spectrum_array_count,
+                                                                corrected_spectrum_array, self.pixel_count_formatted)
+            if err_cp[0] != 0:
+                error_msg = self.decode_error(err_cp[0],"get_dark_corrected_spectrum1")
+                raise OceanDirectError(err_cp[0], error_msg)
+            return to_list(corrected_spectrum_array)
+        finally:
+            self.buffer_pool.release(corrected_spectrum_array, dark_spectrum_array)
 
     def dark_correct_spectrum1(self, illuminatedSpectrum: list[float]) -> list[float]:
         """!
@@ -1109,19 +1159,18 @@ class Spectrometer():
             error_msg = self.decode_error(10,"dark_correct_spectrum1")
             raise OceanDirectError(10, error_msg)
 
-        corrected_spectrum_array         = (c_double * self.pixel_count_formatted)()
-        illuminated_spectrum_array_count = len(illuminatedSpectrum)
-        illuminated_spectrum_array       = (c_double * illuminated_spectrum_array_count)()
-        err_cp                           = (c_long * 1)(0)
-        for x in range(illuminated_spectrum_array_count):
-            illuminated_spectrum_array[x] = illuminatedSpectrum[x]
-
-        self.oceandirect.odapi_dark_correct_spectrum1(self.device_id, err_cp, illuminated_spectrum_array, illuminated_spectrum_array_count,
-                                                      corrected_spectrum_array, self.pixel_count_formatted)
-        if err_cp[0] != 0:
-            error_msg = self.decode_error(err_cp[0],"dark_correct_spectrum1")
-            raise OceanDirectError(err_cp[0], error_msg)
-        return list(corrected_spectrum_array)
+        corrected_spectrum_array         = self.buffer_pool.acquire()
+        illuminated_spectrum_array, illuminated_spectrum_array_count = self.buffer_pool.marshal(illuminatedSpectrum)
+        err_cp                           = self.buffer_pool.error_code()
+        try:
+            self.oceandirect.odapi_dark_correct_spectrum1(self.device_id, err_cp, illuminated_spectrum_array, illuminated_spectrum_array_count,
+                                                          corrected_spectrum_array, self.pixel_count_formatted)
+            if err_cp[0] != 0:
+                error_msg = self.decode_error(err_cp[0],"dark_correct_spectrum1")
+                raise OceanDirectError(err_cp[0], error_msg)
+            return to_list(corrected_spectrum_array)
+        finally:
+            self.buffer_pool.release(corrected_spectrum_array, illuminated_spectrum_array)
 
     def get_dark_corrected_spectrum2(self) -> list[float]:
         """!
@@ -1130,13 +1179,16 @@ class Spectrometer():
         @return The dark corrected spectrum.
         """
 
-        corrected_spectrum_array = (c_double * self.pixel_count_formatted)()
-        err_cp                   = (c_long * 1)(0)
-        self.oceandirect.odapi_get_dark_corrected_spectrum2(self.device_id, err_cp, corrected_spectrum_array, self.pixel_count_formatted)
-        if err_cp[0] != 0:
-            error_msg = self.decode_error(err_cp[0],"get_dark_corrected_spectrum2")
-            raise OceanDirectError(err_cp[0], error_msg)
-        return list(corrected_spectrum_array)
+        corrected_spectrum_array = self.buffer_pool.acquire()
+        err_cp                   = self.buffer_pool.error_code()
+        try:
+            self.oceandirect.odapi_get_dark_corrected_spectrum2(self.device_id, err_cp, corrected_spectrum_array, self.pixel_count_formatted)
+            if err_cp[0] != 0:
+                error_msg = self.decode_error(err_cp[0],"get_dark_corrected_spectrum2")
+                raise OceanDirectError(err_cp[0], error_msg)
+            return to_list(corrected_spectrum_array)
+        finally:
+            self.buffer_pool.release(corrected_spectrum_array)
 
     def dark_correct_spectrum2(self, darkSpectrum: list[float], illuminatedSpectrum: list[float]) -> list[float]:
         """!
@@ -1151,25 +1203,20 @@ class Spectrometer():
             error_msg = self.decode_error(10,"dark_correct_spectrum2")
             raise OceanDirectError(10, error_msg)
 
-        corrected_spectrum_array         = (c_double * self.pixel_count_formatted)()
-        dark_spectrum_array_count        = len(darkSpectrum)
-        dark_spectrum_array              = (c_double * dark_spectrum_array_count)()
-        illuminated_spectrum_array_count = len(illuminatedSpectrum)
-        illuminated_spectrum_array       = (c_double * illuminated_spectrum_array_count)()
-        err_cp                           = (c_long * 1)(0)
-        for x in range(dark_spectrum_array_count):
-            dark_spectrum_array[x] = darkSpectrum[x]
-
-        for x in range(illuminated_spectrum_array_count):
-            illuminated_spectrum_array[x] = illuminatedSpectrum[x]
-
-        self.oceandirect.odapi_dark_correct_spectrum2(self.device_id, err_cp, dark_spectrum_array, dark_spectrum_array_count,
-                                                      illuminated_spectrum_array, illuminated_spectrum_array_count,
-                                                      corrected_spectrum_array, self.pixel_count_formatted)
-        if err_cp[0] != 0:
-            error_msg = self.decode_error(err_cp[0],"dark_correct_spectrum2")
-            raise OceanDirectError(err_cp[0], error_msg)
-        return list(corrected_spectrum_array) 
+        corrected_spectrum_array         = self.buffer_pool.acquire()
+        dark_spectrum_array, dark_spectrum_array_count = self.buffer_pool.marshal(darkSpectrum)
+        illuminated_spectrum_array, illuminated_spectrum_array_count = self.buffer_pool.marshal(illuminatedSpectrum)
+        err_cp                           = self.buffer_pool.error_code()
+        try:
+            self.oceandirect.odapi_dark_correct_spectrum2(self.device_id, err_cp, dark_spectrum_array, dark_spectrum_array_count,
+                                                          illuminated_spectrum_array, illuminated_spectrum_array_count,
+                                                          corrected_spectrum_array, self.pixel_count_formatted)
+            if err_cp[0] != 0:
+                error_msg = self.decode_error(err_cp[0],"dark_correct_spectrum2")
+                raise OceanDirectError(err_cp[0], error_msg)
+            return to_list(corrected_spectrum_array)
+        finally:
+            self.buffer_pool.release(corrected_spectrum_array, dark_spectrum_array, illuminated_spectrum_array)
 
     def get_nonlinearity_corrected_spectrum1(self, darkSpectrum: list[float]) -> list[float]:
         """!
@@ -1184,19 +1231,18 @@ class Spectrometer():
             error_msg = self.decode_error(10,"get_nonlinearity_corrected_spectrum1")
             raise OceanDirectError(10, error_msg)
     
-        corrected_spectrum_array  = (c_double * self.pixel_count_formatted)()
-        dark_spectrum_array_count = len(darkSpectrum)
-        dark_spectrum_array       = (c_double * dark_spectrum_array_count)()
-        err_cp                    = (c_long * 1)(0)
-        for x in range(dark_spectrum_array_count):
-            dark_spectrum_array[x] = darkSpectrum[x]
-
-        self.oceandirect.odapi_get_nonlinearity_corrected_spectrum1(self.device_id, err_cp, dark_spectrum_array, dark_spectrum_array_count,
-                                                                    corrected_spectrum_array, self.pixel_count_formatted)
-        if err_cp[0] != 0:
-            error_msg = self.decode_error(err_cp[0],"get_nonlinearity_corrected_spectrum1")
-            raise OceanDirectError(err_cp[0], error_msg)
-        return list(corrected_spectrum_array)
+        corrected_spectrum_array  = self.buffer_pool.acquire()
+        dark_spectrum_array, dark_spectrum_array_count = self.buffer_pool.marshal(darkSpectrum)
+        err_cp                    = self.buffer_pool.error_code()
+        try:
+            self.oceandirect.odapi_get_nonlinearity_corrected_spectrum1(self.device_id, err_cp, dark_spectrum_array, dark_spectrum_array_count,
+                                                                        corrected_spectrum_array, self.pixel_count_formatted)
+            if err_cp[0] != 0:
+                error_msg = self.decode_error(err_cp[0],"get_nonlinearity_corrected_spectrum1")
+                raise OceanDirectError(err_cp[0], error_msg)
+            return to_list(corrected_spectrum_array)
+        finally:
+            self.buffer_pool.release(corrected_spectrum_array, dark_spectrum_array)
 
     def nonlinearity_correct_spectrum1(self, illuminatedSpectrum: list[float]) -> list[float]:
         """!
@@ -1211,19 +1257,18 @@ class Spectrometer():
             error_msg = self.decode_error(10,"nonlinearity_correct_spectrum1")
             raise OceanDirectError(10, error_msg)
     
-        corrected_spectrum_array         = (c_double * self.pixel_count_formatted)()
-        illuminated_spectrum_array_count = len(illuminatedSpectrum)
-        illuminated_spectrum_array       = (c_double * illuminated_spectrum_array_count)()
-        err_cp                           = (c_long * 1)(0)
-        for x in range(illuminated_spectrum_array_count):
-            illuminated_spectrum_array[x] = illuminatedSpectrum[x]
-
-        self.oceandirect.odapi_nonlinearity_correct_spectrum1(self.device_id, err_cp, illuminated_spectrum_array, illuminated_spectrum_array_count,
-                                                              corrected_spectrum_array, self.pixel_count_formatted)
-        if err_cp[0] != 0:
-            error_msg = self.decode_error(err_cp[0],"nonlinearity_correct_spectrum1")
-            raise OceanDirectError(err_cp[0], error_msg)
-        return list(corrected_spectrum_array)
+        corrected_spectrum_array         = self.buffer_pool.acquire()
+        illuminated_spectrum_array, illuminated_spectrum_array_count = self.buffer_pool.marshal(illuminatedSpectrum)
+        err_cp                           = self.buffer_pool.error_code()
+        try:
+            self.oceandirect.odapi_nonlinearity_correct_spectrum1(self.device_id, err_cp, illuminated_spectrum_array, illuminated_spectrum_array_count,
+                                                                  corrected_spectrum_array, self.pixel_count_formatted)
+            if err_cp[0] != 0:
+                error_msg = self.decode_error(err_cp[0],"nonlinearity_correct_spectrum1")
+                raise OceanDirectError(err_cp[0], error_msg)
+            return to_list(corrected_spectrum_array)
+        finally:
+            self.buffer_pool.release(corrected_spectrum_array, illuminated_spectrum_array)
 
     def get_nonlinearity_corrected_spectrum2(self) -> list[float]:
         """!
@@ -1233,14 +1278,16 @@ class Spectrometer():
         @return The nonlinearity corrected spectrum.
         """
 
-        corrected_spectrum_array = (c_double * self.pixel_count_formatted)()
-        err_cp                   = (c_long * 1)(0)
-
-        self.oceandirect.odapi_get_nonlinearity_corrected_spectrum2(self.device_id, err_cp, corrected_spectrum_array, self.pixel_count_formatted)
-        if err_cp[0] != 0:
-            error_msg = self.decode_error(err_cp[0],"get_nonlinearity_corrected_spectrum2")
-            raise OceanDirectError(err_cp[0], error_msg)
-        return list(corrected_spectrum_array)
+        corrected_spectrum_array = self.buffer_pool.acquire()
+        err_cp                   = self.buffer_pool.error_code()
+        try:
+            self.oceandirect.odapi_get_nonlinearity_corrected_spectrum2(self.device_id, err_cp, corrected_spectrum_array, self.pixel_count_formatted)
+            if err_cp[0] != 0:
+                error_msg = self.decode_error(err_cp[0],"get_nonlinearity_corrected_spectrum2")
+                raise OceanDirectError(err_cp[0], error_msg)
+            return to_list(corrected_spectrum_array)
+        finally:
+            self.buffer_pool.release(corrected_spectrum_array)
 
     def nonlinearity_correct_spectrum2(self, darkSpectrum: list[float], illuminatedSpectrum: list[float]) -> list[float]:
         """!
@@ -1254,26 +1301,20 @@ class Spectrometer():
             error_msg = self.decode_error(10,"nonlinearity_correct_spectrum2")
             raise OceanDirectError(10, error_msg)
 
-        corrected_spectrum_array         = (c_double * self.pixel_count_formatted)()
-        dark_spectrum_array_count        = len(darkSpectrum)
-        dark_spectrum_array              = (c_double * dark_spectrum_array_count)()
-        illuminated_spectrum_array_count = len(illuminatedSpectrum)
-        illuminated_spectrum_array       = (c_double * illuminated_spectrum_array_count)()
-        err_cp                           = (c_long * 1)(0)
-
-        for x in range(dark_spectrum_array_count):
-            dark_spectrum_array[x] = darkSpectrum[x]
-
-        for x in range(illuminated_spectrum_array_count):
-            illuminated_spectrum_array[x] = illuminatedSpectrum[x]
-
-        self.oceandirect.odapi_nonlinearity_correct_spectrum2(self.device_id, err_cp, dark_spectrum_array, dark_spectrum_array_count,
-                                                              illuminated_spectrum_array, illuminated_spectrum_array_count,
-                                                              corrected_spectrum_array, self.pixel_count_formatted)
-        if err_cp[0] != 0:
-            error_msg = self.decode_error(err_cp[0],"nonlinearity_correct_spectrum2")
-            raise OceanDirectError(err_cp[0], error_msg)
-        return list(corrected_spectrum_array)
+        corrected_spectrum_array         = self.buffer_pool.acquire()
+        dark_spectrum_array, dark_spectrum_array_count = self.buffer_pool.marshal(darkSpectrum)
+        illuminated_spectrum_array, illuminated_spectrum_array_count = self.buffer_pool.marshal(illuminatedSpectrum)
+        err_cp                           = self.buffer_pool.error_code()
+        try:
+            self.oceandirect.odapi_nonlinearity_correct_spectrum2(self.device_id, err_cp, dark_spectrum_array, dark_spectrum_array_count,
+                                                                  illuminated_spectrum_array, illuminated_spectrum_array_count,
+                                                                  corrected_spectrum_array, self.pixel_count_formatted)
+            if err_cp[0] != 0:
+                error_msg = self.decode_error(err_cp[0],"nonlinearity_correct_spectrum2")
+                raise OceanDirectError(err_cp[0], error_msg)
+            return to_list(corrected_spectrum_array)
+        finally:
+            self.buffer_pool.release(corrected_spectrum_array, dark_spectrum_array, illuminated_spectrum_array)
 
     def boxcar_correct_spectrum(self, illuminatedSpectrum: list[float], boxcarWidth: int) -> list[float]:
         """!
@@ -1287,22 +1328,21 @@ class Spectrometer():
             error_msg = self.decode_error(10,"boxcar_correct_spectrum")
             raise OceanDirectError(10, error_msg)
 
-        illuminated_spectrum_array_count = len(illuminatedSpectrum)
-        illuminated_spectrum_array       = (c_double * illuminated_spectrum_array_count)()
-        err_cp                           = (c_long * 1)(0)
-
-        for x in range(illuminated_spectrum_array_count):
-            illuminated_spectrum_array[x] = illuminatedSpectrum[x]
+        illuminated_spectrum_array, illuminated_spectrum_array_count = self.buffer_pool.marshal(illuminatedSpectrum, copy=True)
+        err_cp                           = self.buffer_pool.error_code()
 
-        self.oceandirect.odapi_boxcar_correct_spectrum(self.device_id, err_cp, 
-                                                       illuminated_spectrum_array, illuminated_spectrum_array_count,
-                                                       boxcarWidth)
+        try:
+            self.oceandirect.odapi_boxcar_correct_spectrum(self.device_id, err_cp, 
+                                                           illuminated_spectrum_array, illuminated_spectrum_array_count,
+                                                           boxcarWidth)
 
-        if err_cp[0] != 0:
-            error_msg = self.decode_error(err_cp[0],"boxcar_correct_spectrum")
-            raise OceanDirectError(err_cp[0], error_msg)
+            if err_cp[0] != 0:
+                error_msg = self.decode_error(err_cp[0],"boxcar_correct_spectrum")
+                raise OceanDirectError(err_cp[0], error_msg)
 
-        return list(illuminated_spectrum_array)
+            return to_list(illuminated_spectrum_array)
+        finally:
+            self.buffer_pool.release(illuminated_spectrum_array)
 
     def set_electric_dark_correction_usage(self, isEnabled: bool) -> None:
         """!
@@ -1374,6 +1414,8 @@ class Spectrometer():
         def __init__(self, device: 'Spectrometer'):
             self.device = device
             self._temperature_count = None
+            self._row_pointers_key = None
+            self._row_pointers = None
 
         def set_enable_lamp(self, enable: bool) -> None:
             """!
@@ -1492,8 +1534,6 @@ class Spectrometer():
             @return The nonlinearity coefficients.
             """
 
-            self.device.oceandirect.odapi_adv_get_nonlinearity_coeffs1.restype = c_double
-
             err_cp = (c_long * 1)(0)
             nl_coefficient = self.device.oceandirect.odapi_adv_get_nonlinearity_coeffs1(self.device.device_id, err_cp, c_int(index))
 
@@ -1511,7 +1551,6 @@ class Spectrometer():
             @return The temperature in degrees celsius.
             """
 
-            self.device.oceandirect.odapi_adv_tec_get_temperature_degrees_C.restype = c_double
             err_cp = (c_long * 1)(0)
             temp   = self.device.oceandirect.odapi_adv_tec_get_temperature_degrees_C(self.device.device_id, err_cp)
 
@@ -1571,7 +1610,6 @@ class Spectrometer():
             @return The temperature value in celsius.
             """
 
-            self.device.oceandirect.odapi_adv_tec_get_temperature_setpoint_degrees_C.restype = c_float
             err_cp = (c_long * 1)(0)
             temp   = self.device.oceandirect.odapi_adv_tec_get_temperature_setpoint_degrees_C(self.device.device_id, err_cp)
 
@@ -2401,37 +2439,69 @@ class Spectrometer():
             spectra from the data buffer. This function requires that both back to back scans and data buffer
             be enabled. See "set_data_buffer_enable()" and "set_number_of_backtoback_scans()". For newer devices
             such as Ocean SR2, you can call this function right away. See device manual if this command is supported.
+            @see get_raw_spectrum_with_metadata_array() for a version that returns numpy arrays without building lists.
             @param[in] list_raw_spectra The spectra output buffer.
             @param[in] list_timestamp   The timestamp output buffer of each spectra.
             @param[in] buffer_size      The buffer array size (maximum is 15).
             @return The number of spectra read. It can be zero.
             """
 
-            buffer = (POINTER(c_double) * buffer_size)()
-            for x in range(buffer_size):
-                buffer[x] = (c_double * self.device.pixel_count_formatted)()
+            spectra, timestamps = self.get_raw_spectrum_with_metadata_array(buffer_size)
 
-            timestamp    = (c_longlong * buffer_size)(0)
-            err_cp       = (c_long * 1)(0)
-            spectraCount = self.device.oceandirect.odapi_get_raw_spectrum_with_metadata(self.device.device_id, err_cp, buffer, buffer_size,
-                                                                                        self.device.pixel_count_formatted, timestamp, buffer_size)
+            list_raw_spectra.extend(spectra.tolist())
+            list_timestamp.extend(timestamps.tolist())
+
+            return len(timestamps)
+
+        def get_raw_spectrum_with_metadata_array(self, buffer_size: int, spectra_out: np.ndarray = None,
+                                                 timestamps_out: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
+            """!
+            Same as get_raw_spectrum_with_metadata() but the device writes into one contiguous
+            (buffer_size, pixels) float64 block and an int64 timestamp array, so no per-pixel python
+            objects are created. Pass the same output arrays on every call to drain the data buffer
+            without allocating.
+            @param[in] buffer_size    The maximum number of spectra to read (maximum is 15 for FX/HDX).
+            @param[in] spectra_out    Optional writeable, C-contiguous float64 array with at least buffer_size
+                                      rows and get_formatted_spectrum_length() columns.
+            @param[in] timestamps_out Optional writeable, C-contiguous int64 array with at least buffer_size elements.
+            @return A tuple of (spectra, timestamps) views trimmed to the number of spectra read. It can be empty.
+            """
+
+            pixel_count = self.device.pixel_count_formatted
+
+            if spectra_out is None:
+                spectra_out = np.empty((buffer_size, pixel_count), dtype=np.float64)
+            if timestamps_out is None:
+                timestamps_out = np.empty(buffer_size, dtype=np.int64)
+
+            if (spectra_out.dtype != np.float64 or spectra_out.ndim != 2 or not spectra_out.flags.c_contiguous
+                or not spectra_out.flags.writeable or spectra_out.shape[0] < buffer_size or spectra_out.shape[1] != pixel_count
+                or timestamps_out.dtype != np.int64 or not timestamps_out.flags.c_contiguous
+                or not timestamps_out.flags.writeable or timestamps_out.size < buffer_size):
+                #15 is an error code defined in OceanDirectAPIConstants.c
+                error_msg = self.device.decode_error(15, "get_raw_spectrum_with_metadata_array")
+                raise OceanDirectError(15, error_msg)
+
+            #the dll wants one pointer per spectrum. Point each one at a row of the block and keep the
+            #table around for as long as the same block is passed in.
+            key = (spectra_out.ctypes.data, spectra_out.strides[0], buffer_size)
+            if self._row_pointers_key != key:
+                row_pointers = (POINTER(c_double) * buffer_size)()
+                for x in range(buffer_size):
+                    row_pointers[x] = cast(key[0] + x * key[1], POINTER(c_double))
+                self._row_pointers     = row_pointers
+                self._row_pointers_key = key
+
+            err_cp       = self.device.buffer_pool.error_code()
+            spectraCount = self.device.oceandirect.odapi_get_raw_spectrum_with_metadata(self.device.device_id, err_cp, self._row_pointers, buffer_size,
+                                                                                        pixel_count, timestamps_out.ctypes.data_as(POINTER(c_longlong)),
+                                                                                        buffer_size)
 
             if err_cp[0] != 0:
                 error_msg = self.device.decode_error(err_cp[0], "get_raw_spectrum_with_metadata")
                 raise OceanDirectError(err_cp[0], error_msg)
 
-            for x in range(spectraCount):
-                spectra = [None] * self.device.pixel_count_formatted
-
-                #Convert c-types into python. There might be a better way to do this.
-                for y in range(self.device.pixel_count_formatted):
-                    spectra[y] = buffer[x][y]
-                
-                list_raw_spectra.append(spectra)
-                #list_raw_spectra.append(buffer[x])
-                list_timestamp.append(timestamp[x])
-
-            return spectraCount
+            return spectra_out[:spectraCount], timestamps_out.reshape(-1)[:spectraCount]
 
         def get_usb_endpoint_primary_out(self) -> int:
             """!
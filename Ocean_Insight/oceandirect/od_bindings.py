@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+Prototype table for every odapi_* symbol used by OceanDirectAPI.py. The table is applied once when
+the library is loaded so that each wrapper calls a function pointer whose argument and return
+types are already declared, instead of letting ctypes guess the conversion on every call.
+"""
+
+from ctypes import c_int, c_uint, c_long, c_ulong, c_ushort, c_ubyte, c_double, c_float, c_longlong, c_char_p, POINTER
+
+# Common argument types.
+DEVICE_ID  = c_long
+ERROR_CODE = POINTER(c_long)
+DOUBLES    = POINTER(c_double)
+INTS       = POINTER(c_int)
+BYTES      = POINTER(c_ubyte)
+
+# symbol name: (restype, argtypes)
+ODAPI_PROTOTYPES = {
+    # library and device discovery
+    "odapi_initialize":                                   (None,       []),
+    "odapi_shutdown":                                     (None,       []),
+    "odapi_get_api_version_numbers":                      (None,       [POINTER(c_uint), POINTER(c_uint), POINTER(c_uint)]),
+    "odapi_get_error_string_length":                      (c_int,      [c_int]),
+    "odapi_get_error_string":                             (c_int,      [c_int, c_char_p, c_int]),
+    "odapi_probe_devices":                                (c_int,      []),
+    "odapi_detect_network_devices":                       (c_int,      []),
+    "odapi_get_number_of_device_ids":                     (c_int,      []),
+    "odapi_get_device_ids":                               (c_int,      [POINTER(c_long), ERROR_CODE]),
+    "odapi_get_network_device_ids":                       (c_int,      [POINTER(c_long), ERROR_CODE]),
+    "odapi_add_network_devices":                          (c_int,      [c_char_p, c_char_p, ERROR_CODE]),
+    "odapi_add_RS232_device_location":                    (c_int,      [c_char_p, c_char_p, c_uint]),
+    "odapi_open_device":                                  (None,       [DEVICE_ID, ERROR_CODE]),
+    "odapi_close_device":                                 (None,       [DEVICE_ID, ERROR_CODE]),
+
+    # device information
+    "odapi_get_serial_number":                            (c_int,      [DEVICE_ID, ERROR_CODE, c_char_p, c_int]),
+    "odapi_get_device_type":                              (c_int,      [DEVICE_ID, ERROR_CODE, c_char_p, c_int]),
+    "odapi_get_device_name":                              (c_int,      [DEVICE_ID, ERROR_CODE, c_char_p, c_int]),
+    "odapi_is_feature_enabled":                           (c_int,      [DEVICE_ID, ERROR_CODE, c_int]),
+
+    # acquisition
+    "odapi_get_formatted_spectrum_length":                (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_get_formatted_spectrum":                       (c_int,      [DEVICE_ID, ERROR_CODE, DOUBLES, c_int]),
+    "odapi_get_wavelengths":                              (c_int,      [DEVICE_ID, ERROR_CODE, DOUBLES, c_int]),
+    "odapi_get_wavelength_coeffs":                        (c_int,      [DEVICE_ID, ERROR_CODE, DOUBLES, c_int]),
+    "odapi_get_maximum_intensity":                        (c_double,   [DEVICE_ID, ERROR_CODE]),
+    "odapi_set_scans_to_average":                         (None,       [DEVICE_ID, ERROR_CODE, c_uint]),
+    "odapi_get_scans_to_average":                         (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_set_boxcar_width":                             (None,       [DEVICE_ID, ERROR_CODE, c_ushort]),
+    "odapi_get_boxcar_width":                             (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_set_integration_time_micros":                  (None,       [DEVICE_ID, ERROR_CODE, c_ulong]),
+    "odapi_get_integration_time_micros":                  (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_get_integration_time_increment_micros":        (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_get_minimum_integration_time_micros":          (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_get_maximum_integration_time_micros":          (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_get_minimum_averaging_integration_time_micros": (c_ulong,   [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_set_trigger_mode":                         (None,       [DEVICE_ID, ERROR_CODE, c_int]),
+    "odapi_adv_get_trigger_mode":                         (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_set_acquisition_delay_microseconds":           (None,       [DEVICE_ID, ERROR_CODE, c_ulong]),
+    "odapi_get_acquisition_delay_microseconds":           (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_get_acquisition_delay_increment_microseconds": (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_get_acquisition_delay_maximum_microseconds":   (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_get_acquisition_delay_minimum_microseconds":   (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_get_index_at_wavelength":                      (c_int,      [DEVICE_ID, ERROR_CODE, DOUBLES, c_double]),
+    "odapi_get_indices_at_wavelengths":                   (c_int,      [DEVICE_ID, ERROR_CODE, INTS, c_int, DOUBLES, c_int]),
+    "odapi_get_indices_at_wavelength_range":              (c_int,      [DEVICE_ID, ERROR_CODE, INTS, c_int, DOUBLES, c_int, c_double, c_double]),
+    "odapi_get_electric_dark_pixel_count":                (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_get_electric_dark_pixel_indices":              (c_int,      [DEVICE_ID, ERROR_CODE, INTS, c_int]),
+
+    # spectrum corrections
+    "odapi_set_stored_dark_spectrum":                     (None,       [DEVICE_ID, ERROR_CODE, DOUBLES, c_int]),
+    "odapi_get_stored_dark_spectrum":                     (c_int,      [DEVICE_ID, ERROR_CODE, DOUBLES, c_int]),
+    "odapi_get_dark_corrected_spectrum1":                 (c_int,      [DEVICE_ID, ERROR_CODE, DOUBLES, c_int, DOUBLES, c_int]),
+    "odapi_get_dark_corrected_spectrum2":                 (c_int,      [DEVICE_ID, ERROR_CODE, DOUBLES, c_int]),
+    "odapi_dark_correct_spectrum1":                       (c_int,      [DEVICE_ID, ERROR_CODE, DOUBLES, c_int, DOUBLES, c_int]),
+    "odapi_dark_correct_spectrum2":                       (c_int,      [DEVICE_ID, ERROR_CODE, DOUBLES, c_int, DOUBLES, c_int, DOUBLES, c_int]),
+    "odapi_get_nonlinearity_corrected_spectrum1":         (c_int,      [DEVICE_ID, ERROR_CODE, DOUBLES, c_int, DOUBLES, c_int]),
+    "odapi_get_nonlinearity_corrected_spectrum2":         (c_int,      [DEVICE_ID, ERROR_CODE, DOUBLES, c_int]),
+    "odapi_nonlinearity_correct_spectrum1":               (c_int,      [DEVICE_ID, ERROR_CODE, DOUBLES, c_int, DOUBLES, c_int]),
+    "odapi_nonlinearity_correct_spectrum2":               (c_int,      [DEVICE_ID, ERROR_CODE, DOUBLES, c_int, DOUBLES, c_int, DOUBLES, c_int]),
+    "odapi_boxcar_correct_spectrum":                      (c_int,      [DEVICE_ID, ERROR_CODE, DOUBLES, c_uint, c_uint]),
+    "odapi_apply_electric_dark_correction_usage":         (None,       [DEVICE_ID, ERROR_CODE, c_ubyte]),
+    "odapi_get_electric_dark_correction_usage":           (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_apply_nonlinearity_correct_usage":             (None,       [DEVICE_ID, ERROR_CODE, c_ubyte]),
+    "odapi_get_nonlinearity_correct_usage":               (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_nonlinearity_coeffs":                  (c_int,      [DEVICE_ID, ERROR_CODE, DOUBLES, c_int]),
+    "odapi_adv_get_nonlinearity_coeffs_count1":           (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_nonlinearity_coeffs1":                 (c_double,   [DEVICE_ID, ERROR_CODE, c_int]),
+
+    # lamp, shutter and thermo-electric cooler
+    "odapi_adv_set_lamp_enable":                          (None,       [DEVICE_ID, ERROR_CODE, c_ubyte]),
+    "odapi_adv_get_lamp_enable":                          (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_set_shutter_open":                         (None,       [DEVICE_ID, ERROR_CODE, c_ubyte]),
+    "odapi_adv_get_shutter_state":                        (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_tec_get_temperature_degrees_C":            (c_double,   [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_tec_set_temperature_setpoint_degrees_C":   (None,       [DEVICE_ID, ERROR_CODE, c_double]),
+    "odapi_adv_tec_get_temperature_setpoint_degrees_C":   (c_float,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_tec_set_enable":                           (None,       [DEVICE_ID, ERROR_CODE, c_ubyte]),
+    "odapi_adv_tec_get_enable":                           (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_tec_get_stable":                           (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_tec_get_fan_enable":                       (c_int,      [DEVICE_ID, ERROR_CODE]),
+
+    # light sources and strobes
+    "odapi_adv_get_light_source_count":                   (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_light_source_has_enable":                  (c_int,      [DEVICE_ID, ERROR_CODE, c_int]),
+    "odapi_adv_light_source_is_enabled":                  (c_int,      [DEVICE_ID, ERROR_CODE, c_int]),
+    "odapi_adv_light_source_set_enable":                  (None,       [DEVICE_ID, ERROR_CODE, c_int, c_ubyte]),
+    "odapi_adv_set_single_strobe_enable":                 (None,       [DEVICE_ID, ERROR_CODE, c_ubyte]),
+    "odapi_adv_set_single_strobe_delay":                  (None,       [DEVICE_ID, ERROR_CODE, c_ulong]),
+    "odapi_adv_set_single_strobe_width":                  (None,       [DEVICE_ID, ERROR_CODE, c_ulong]),
+    "odapi_adv_get_single_strobe_enable":                 (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_single_strobe_delay":                  (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_single_strobe_width":                  (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_single_strobe_delay_minimum":          (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_single_strobe_delay_maximum":          (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_single_strobe_delay_increment":        (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_single_strobe_width_minimum":          (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_single_strobe_width_maximum":          (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_single_strobe_width_increment":        (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_single_strobe_cycle_maximum":          (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_set_continuous_strobe_period_micros":      (None,       [DEVICE_ID, ERROR_CODE, c_ulong]),
+    "odapi_adv_set_continuous_strobe_enable":             (None,       [DEVICE_ID, ERROR_CODE, c_ubyte]),
+    "odapi_adv_get_continuous_strobe_period_micros":      (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_continuous_strobe_enable":             (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_continuous_strobe_period_minimum_micros":   (c_ulong, [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_continuous_strobe_period_maximum_micros":   (c_ulong, [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_continuous_strobe_period_increment_micros": (c_ulong, [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_continuous_strobe_width_micros":       (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_set_continuous_strobe_width_micros":       (None,       [DEVICE_ID, ERROR_CODE, c_ulong]),
+
+    # data buffer and back-to-back scans
+    "odapi_adv_clear_data_buffer":                        (None,       [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_data_buffer_number_of_elements":       (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_data_buffer_capacity":                 (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_data_buffer_capacity_maximum":         (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_data_buffer_capacity_minimum":         (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_set_data_buffer_capacity":                 (None,       [DEVICE_ID, ERROR_CODE, c_ulong]),
+    "odapi_adv_set_data_buffer_enable":                   (None,       [DEVICE_ID, ERROR_CODE, c_ubyte]),
+    "odapi_adv_get_data_buffer_enable":                   (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_abort_acquisition":                        (None,       [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_acquire_spectra_to_buffer":                (None,       [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_device_idle_state":                    (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_number_of_backtoback_scans":           (c_ulong,    [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_set_number_of_backtoback_scans":           (None,       [DEVICE_ID, ERROR_CODE, c_ulong]),
+    "odapi_get_raw_spectrum_with_metadata":               (c_int,      [DEVICE_ID, ERROR_CODE, POINTER(DOUBLES), c_int, c_int,
+                                                                        POINTER(c_longlong), c_int]),
+
+    # usb endpoints and revisions
+    "odapi_get_device_usb_endpoint_primary_out":          (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_get_device_usb_endpoint_primary_in":           (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_get_device_usb_endpoint_secondary_out":        (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_get_device_usb_endpoint_secondary_in":         (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_revision_firmware":                    (c_int,      [DEVICE_ID, ERROR_CODE, c_char_p, c_int]),
+    "odapi_adv_get_revision_fpga":                        (c_int,      [DEVICE_ID, ERROR_CODE, c_char_p, c_int]),
+
+    # ipv4
+    "odapi_adv_ipv4_is_dhcp_enabled":                     (c_int,      [DEVICE_ID, ERROR_CODE, c_ubyte]),
+    "odapi_adv_ipv4_set_dhcp_enable":                     (None,       [DEVICE_ID, ERROR_CODE, c_ubyte, c_ubyte]),
+    "odapi_adv_ipv4_get_number_of_ip_addresses":          (c_int,      [DEVICE_ID, ERROR_CODE, c_ubyte]),
+    "odapi_adv_ipv4_read_ip_address":                     (None,       [DEVICE_ID, ERROR_CODE, c_ubyte, c_ubyte, BYTES, c_uint, POINTER(c_uint)]),
+    "odapi_adv_ipv4_add_static_ip_address":               (None,       [DEVICE_ID, ERROR_CODE, c_ubyte, BYTES, c_uint, c_uint]),
+    "odapi_adv_ipv4_delete_static_ip_address":            (None,       [DEVICE_ID, ERROR_CODE, c_ubyte, c_ubyte]),
+    "odapi_adv_ipv4_set_default_gateway_ip_address":      (None,       [DEVICE_ID, ERROR_CODE, c_ubyte, BYTES, c_uint]),
+    "odapi_adv_ipv4_get_default_gateway_ip_address":      (None,       [DEVICE_ID, ERROR_CODE, c_ubyte, BYTES, c_uint]),
+
+    # gpio and led
+    "odapi_adv_get_gpio_pin_count":                       (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_gpio_set_output_enable1":                  (None,       [DEVICE_ID, ERROR_CODE, c_int, c_ubyte]),
+    "odapi_adv_gpio_get_output_enable1":                  (c_int,      [DEVICE_ID, ERROR_CODE, c_int]),
+    "odapi_adv_gpio_set_output_enable2":                  (None,       [DEVICE_ID, ERROR_CODE, c_int]),
+    "odapi_adv_gpio_get_output_enable2":                  (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_gpio_set_value1":                          (None,       [DEVICE_ID, ERROR_CODE, c_int, c_ubyte]),
+    "odapi_adv_gpio_get_value1":                          (c_int,      [DEVICE_ID, ERROR_CODE, c_int]),
+    "odapi_adv_gpio_set_value2":                          (None,       [DEVICE_ID, ERROR_CODE, c_int]),
+    "odapi_adv_gpio_get_value2":                          (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_gpio_set_output_alternate1":               (None,       [DEVICE_ID, ERROR_CODE, c_int, c_ubyte]),
+    "odapi_adv_gpio_set_output_alternate2":               (None,       [DEVICE_ID, ERROR_CODE, c_int]),
+    "odapi_adv_gpio_get_output_alternate1":               (c_int,      [DEVICE_ID, ERROR_CODE, c_int]),
+    "odapi_adv_gpio_get_output_alternate2":               (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_set_led_enable":                           (None,       [DEVICE_ID, ERROR_CODE, c_ubyte]),
+    "odapi_adv_get_led_enable":                           (c_int,      [DEVICE_ID, ERROR_CODE]),
+
+    # device identity strings
+    "odapi_adv_get_device_original_vid":                  (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_device_original_pid":                  (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_device_vid":                           (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_device_pid":                           (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_device_original_manufacturer_string":  (c_int,      [DEVICE_ID, ERROR_CODE, c_char_p, c_int]),
+    "odapi_adv_get_device_original_model_string":         (c_int,      [DEVICE_ID, ERROR_CODE, c_char_p, c_int]),
+    "odapi_adv_get_device_manufacturer_string":           (c_int,      [DEVICE_ID, ERROR_CODE, c_char_p, c_int]),
+    "odapi_adv_get_device_model_string":                  (c_int,      [DEVICE_ID, ERROR_CODE, c_char_p, c_int]),
+    "odapi_adv_set_device_manufacturer_string":           (None,       [DEVICE_ID, ERROR_CODE, c_char_p, c_int]),
+    "odapi_adv_set_device_model_string":                  (None,       [DEVICE_ID, ERROR_CODE, c_char_p, c_int]),
+    "odapi_adv_get_device_alias":                         (c_int,      [DEVICE_ID, ERROR_CODE, c_char_p, c_int]),
+    "odapi_adv_set_device_alias":                         (None,       [DEVICE_ID, ERROR_CODE, c_char_p, c_int]),
+    "odapi_adv_reset_device":                             (None,       [DEVICE_ID, ERROR_CODE]),
+    "odapi_get_user_string":                              (c_int,      [DEVICE_ID, ERROR_CODE, c_char_p, c_int]),
+    "odapi_set_user_string":                              (None,       [DEVICE_ID, ERROR_CODE, c_char_p, c_int]),
+    "odapi_get_user_string_count1":                       (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_get_user_string1":                             (c_int,      [DEVICE_ID, ERROR_CODE, c_int, c_char_p, c_int]),
+    "odapi_set_user_string1":                             (None,       [DEVICE_ID, ERROR_CODE, c_int, c_char_p, c_int]),
+
+    # auto-nulling, serial port and pixel ranges
+    "odapi_adv_get_autonull_maximum_adc_count":           (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_autonull_baseline_level":              (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_autonull_saturation_level":            (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_get_baud_rate":                            (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_set_baud_rate":                            (None,       [DEVICE_ID, ERROR_CODE, c_int]),
+    "odapi_adv_save_settings_to_flash":                   (None,       [DEVICE_ID, ERROR_CODE]),
+    "odapi_get_active_pixel_range":                       (c_int,      [DEVICE_ID, ERROR_CODE, INTS, c_int]),
+    "odapi_get_optical_dark_pixel_range":                 (c_int,      [DEVICE_ID, ERROR_CODE, INTS, c_int]),
+    "odapi_get_transition_pixel_range":                   (c_int,      [DEVICE_ID, ERROR_CODE, INTS, c_int]),
+    "odapi_get_bad_pixel_indices":                        (c_int,      [DEVICE_ID, ERROR_CODE, INTS, c_int]),
+
+    # network configuration
+    "odapi_adv_network_conf_get_interface_count":         (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_network_conf_get_interface_type":          (c_int,      [DEVICE_ID, ERROR_CODE, c_uint]),
+    "odapi_adv_network_conf_get_interface_status":        (c_int,      [DEVICE_ID, ERROR_CODE, c_uint]),
+    "odapi_adv_network_conf_set_interface_status":        (None,       [DEVICE_ID, ERROR_CODE, c_uint, c_ubyte]),
+    "odapi_adv_network_conf_save_interface_setting":      (None,       [DEVICE_ID, ERROR_CODE, c_uint]),
+    "odapi_adv_network_conf_get_multicast_group_enabled": (c_int,      [DEVICE_ID, ERROR_CODE, c_uint]),
+    "odapi_adv_network_conf_set_multicast_group_enabled": (None,       [DEVICE_ID, ERROR_CODE, c_uint, c_ubyte]),
+    "odapi_adv_ethernet_get_gigabit_enable_status":       (c_int,      [DEVICE_ID, ERROR_CODE, c_uint]),
+    "odapi_adv_ethernet_set_gigabit_enable_status":       (None,       [DEVICE_ID, ERROR_CODE, c_uint, c_ubyte]),
+    "odapi_adv_ethernet_get_mac_address":                 (c_int,      [DEVICE_ID, ERROR_CODE, c_uint, BYTES, c_uint]),
+    "odapi_adv_ethernet_set_mac_address":                 (None,       [DEVICE_ID, ERROR_CODE, c_uint, BYTES, c_uint]),
+    "odapi_adv_get_ip_address_assigned_mode":             (c_int,      [DEVICE_ID, ERROR_CODE]),
+    "odapi_adv_set_ip_address_assigned_mode":             (None,       [DEVICE_ID, ERROR_CODE, c_ubyte]),
+    "odapi_adv_get_network_configuration":                (None,       [DEVICE_ID, ERROR_CODE, BYTES, BYTES, c_uint, BYTES, c_uint,
+                                                                        BYTES, c_uint, BYTES, c_uint]),
+    "odapi_adv_set_manual_network_configuration":         (None,       [DEVICE_ID, ERROR_CODE, BYTES, c_uint, BYTES, c_uint,
+                                                                        BYTES, c_uint, BYTES, c_uint]),
+    "odapi_adv_get_manual_network_configuration":         (None,       [DEVICE_ID, ERROR_CODE, BYTES, c_uint, BYTES, c_uint,
+                                                                        BYTES, c_uint, BYTES, c_uint]),
+}
+
+
+def bind_library(library) -> list[str]:
+    """!
+    Resolve every symbol in ODAPI_PROTOTYPES on the loaded library and declare its argument and
+    return types. ctypes caches the resolved function pointer on the library object, so later calls
+    such as library.odapi_get_formatted_spectrum(...) use the prebound pointer directly.
+    @param[in] library The library returned by cdll.LoadLibrary().
+    @return The names of the symbols that the library does not export (older SDK builds).
+    """
+
+    missing = []
+    for name, (restype, argtypes) in ODAPI_PROTOTYPES.items():
+        try:
+            function = getattr(library, name)
+        except AttributeError:
+            missing.append(name)
+            continue
+        function.restype  = restype
+        function.argtypes = argtypes
+    return missing
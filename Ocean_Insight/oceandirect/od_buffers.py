@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Reusable ctypes buffers for the spectrum acquisition and correction calls of a Spectrometer.
+"""
+
+import threading
+import numpy as np
+from collections import deque
+from ctypes import c_double, c_long, memset, sizeof, POINTER
+
+
+def to_list(buffer, count: int = None) -> list[float]:
+    """!
+    Convert a ctypes double array into a python list in one bulk pass instead of indexing
+    the ctypes array element by element.
+    @param[in] buffer The ctypes double array.
+    @param[in] count  The number of leading elements to convert. Defaults to the whole array.
+    @return The values as a list of floats.
+    """
+
+    if count is None:
+        count = len(buffer)
+    return np.frombuffer(buffer, dtype=np.float64, count=count).tolist()
+
+
+class SpectrumBufferPool:
+    """!
+    A per-device pool of (c_double * pixel_count) arrays and error code holders. The pool is sized
+    once when the device is opened so that repeated acquisitions and corrections recycle the same
+    memory instead of allocating new ctypes arrays on every call.
+
+    The depth is the number of idle buffers kept around. Callers that pipeline their processing can
+    hold up to "depth" buffers at once (one per frame in flight) without forcing a new allocation.
+    A buffer supports the python buffer protocol, so numpy.frombuffer(buffer) gives a zero-copy
+    float64 view that can be handed to Spectrometer.get_formatted_spectrum(out=...).
+    """
+
+    def __init__(self, pixel_count: int, depth: int = 4):
+        self.pixel_count  = pixel_count
+        self.depth        = 0
+        self.buffer_type  = c_double * pixel_count
+        self._free        = deque()
+        self._lock        = threading.Lock()
+        self._local       = threading.local()
+        self.set_depth(depth)
+
+    def set_depth(self, depth: int) -> None:
+        """!
+        Change the number of idle buffers retained by the pool.
+        @param[in] depth The number of buffers that can be in flight without a new allocation.
+        """
+
+        if depth < 1:
+            raise ValueError("buffer pool depth must be at least 1")
+
+        with self._lock:
+            self.depth = depth
+            while len(self._free) > depth:
+                self._free.pop()
+            while len(self._free) < depth:
+                self._free.append(self.buffer_type())
+
+    def acquire(self, count: int = None):
+        """!
+        Take a zero filled buffer out of the pool. Requests for a length other than the pool's pixel
+        count are served with a freshly allocated array that will not be recycled.
+        @param[in] count The number of doubles needed. Defaults to the pixel count.
+        @return A ctypes double array.
+        """
+
+        if count is not None and count != self.pixel_count:
+            return (c_double * count)()
+
+        with self._lock:
+            buffer = self._free.popleft() if self._free else None
+        if buffer is None:
+            return self.buffer_type()
+
+        memset(buffer, 0, sizeof(buffer))
+        return buffer
+
+    def release(self, *buffers) -> None:
+        """!
+        Return buffers obtained from acquire() to the pool. Buffers that do not belong to the pool
+        (other lengths, or buffers left over from before a resize) are dropped.
+        @param[in] buffers The buffers to recycle.
+        """
+
+        with self._lock:
+            for buffer in buffers:
+                if type(buffer) is self.buffer_type and len(self._free) < self.depth:
+                    self._free.append(buffer)
+
+    def marshal(self, values, copy: bool = False):
+        """!
+        Prepare a spectrum (list, tuple, array.array, numpy array or any buffer) for an odapi call
+        that takes a double array. C-contiguous float64 input is passed to the DLL without copying.
+        Anything else is converted with a single bulk copy into a pooled buffer.
+        @param[in] values The spectrum values.
+        @param[in] copy   True if the DLL writes into the array (e.g. boxcar correction), so the
+                          caller's memory must not be handed over.
+        @return A tuple of the argument to pass to the DLL and its element count. Hand the argument
+                back to release() once the call is done.
+        """
+
+        if not copy and not isinstance(values, (list, tuple)):
+            array = np.asarray(values)
+            if array.dtype == np.float64 and array.ndim == 1 and array.flags.c_contiguous:
+                return array.ctypes.data_as(POINTER(c_double)), array.size
+
+        count  = len(values)
+        buffer = self.acquire(count)
+        np.frombuffer(buffer, dtype=np.float64)[:] = values
+        return buffer, count
+
+    def error_code(self):
+        """!
+        Return this thread's error code holder reset to zero. The holder is reused by every call made
+        from the same thread, so it must be checked before the next odapi call.
+        @return A (c_long * 1) array.
+        """
+
+        err_cp = getattr(self._local, "err_cp", None)
+        if err_cp is None:
+            err_cp = (c_long * 1)(0)
+            self._local.err_cp = err_cp
+        else:
+            err_cp[0] = 0
+        return err_cp
+
+    def idle_count(self) -> int:
+        """!
+        Return the number of buffers currently waiting in the pool.
+        """
+
+        with self._lock:
+            return len(self._free)
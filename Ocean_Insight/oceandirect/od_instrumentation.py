@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in per-call instrumentation of the odapi_* functions. InstrumentedLibrary wraps the object
+returned by cdll.LoadLibrary (or od_simulator) and records, per function and per device, the
+number of calls, a latency histogram, the error codes returned and the bytes copied out of the
+library, so slow captures can be traced to the library call or to the python code around it.
+
+Enable it for every device with OCEANDIRECT_INSTRUMENT=1 (see sdk_properties.py), or for one
+Spectrometer with instrument(device). Uninstrumented calls go straight to the library; an
+instrumented library with its recorder disabled costs one attribute check per call.
+
+    from oceandirect.od_instrumentation import recorder
+    ...capture...
+    recorder.snapshot()        # nested dict
+    recorder.to_prometheus()   # Prometheus text exposition format
+"""
+
+import threading
+from bisect import bisect_left
+from ctypes import Array, c_long
+from time import perf_counter
+
+# Upper bounds (seconds) of the latency histogram buckets, plus an implicit +Inf bucket.
+LATENCY_BUCKETS = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0, 5.0)
+
+# Functions whose first argument is not a device id.
+LIBRARY_FUNCTIONS = frozenset([
+    "odapi_initialize", "odapi_shutdown", "odapi_get_api_version_numbers", "odapi_get_error_string_length",
+    "odapi_get_error_string", "odapi_probe_devices", "odapi_detect_network_devices", "odapi_add_network_devices",
+    "odapi_add_RS232_device_location", "odapi_get_number_of_device_ids", "odapi_get_device_ids",
+])
+
+# Bytes copied out per element of the count these functions return.
+TRANSFER_SIZES = {
+    "odapi_get_formatted_spectrum":             8,
+    "odapi_get_wavelengths":                    8,
+    "odapi_get_wavelength_coeffs":              8,
+    "odapi_get_dark_corrected_spectrum1":       8,
+    "odapi_get_dark_corrected_spectrum2":       8,
+    "odapi_get_nonlinearity_corrected_spectrum1": 8,
+    "odapi_get_nonlinearity_corrected_spectrum2": 8,
+    "odapi_get_stored_dark_spectrum":           8,
+    "odapi_adv_get_nonlinearity_coeffs":        8,
+    "odapi_get_serial_number":                  1,
+    "odapi_adv_get_revision_firmware":          1,
+    "odapi_adv_get_revision_fpga":              1,
+}
+
+
+def _transferred(name: str, args: tuple, result) -> int:
+    if name == "odapi_get_raw_spectrum_with_metadata":
+        #(device, err, rows, buffer_size, pixel_count, timestamps, buffer_size) -> spectra read
+        pixel_count = getattr(args[4], "value", args[4])
+        return int(result or 0) * (int(pixel_count) * 8 + 8)
+    size = TRANSFER_SIZES.get(name)
+    if size is None or not isinstance(result, int):
+        return 0
+    return max(result, 0) * size
+
+
+def _error_holder_index(args: tuple) -> int:
+    """! Position of the (c_long * 1) error code argument, or -1. The last one is taken since
+    odapi_get_device_ids(ids, err) can be given a one element id array first. """
+    for index in range(len(args) - 1, -1, -1):
+        arg = args[index]
+        if isinstance(arg, Array) and arg._type_ is c_long and len(arg) == 1:
+            return index
+    return -1
+
+
+class CallStats:
+    """!
+    Counters of one odapi function on one device.
+    """
+
+    __slots__ = ("calls", "total_seconds", "min_seconds", "max_seconds", "buckets", "errors", "bytes")
+
+    def __init__(self):
+        self.calls         = 0
+        self.total_seconds = 0.0
+        self.min_seconds   = float("inf")
+        self.max_seconds   = 0.0
+        self.buckets       = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.errors        = {}
+        self.bytes         = 0
+
+    def add(self, seconds: float, error_code: int, transferred: int) -> None:
+        self.calls += 1
+        self.total_seconds += seconds
+        if seconds < self.min_seconds:
+            self.min_seconds = seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        if error_code:
+            self.errors[error_code] = self.errors.get(error_code, 0) + 1
+        self.bytes += transferred
+
+    def as_dict(self) -> dict:
+        cumulative, running = {}, 0
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), self.buckets):
+            running += count
+            cumulative["+Inf" if bound == float("inf") else repr(bound)] = running
+        return {
+            "calls":         self.calls,
+            "total_seconds": self.total_seconds,
+            "mean_seconds":  self.total_seconds / self.calls if self.calls else 0.0,
+            "min_seconds":   self.min_seconds if self.calls else 0.0,
+            "max_seconds":   self.max_seconds,
+            "histogram":     cumulative,
+            "errors":        dict(self.errors),
+            "bytes":         self.bytes,
+        }
+
+
+class CallRecorder:
+    """!
+    Thread safe store of CallStats keyed by (device id, function name). The device id is None for
+    library level functions (probing, error strings, ...). Set enabled to False to pause recording.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stats   = {}
+        self.lock    = threading.Lock()
+
+    def record(self, device_id, name: str, seconds: float, error_code: int, transferred: int) -> None:
+        key = (device_id, name)
+        with self.lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = CallStats()
+            stats.add(seconds, error_code, transferred)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.stats.clear()
+
+    def snapshot(self) -> dict:
+        """!
+        Copy of the counters.
+        @return {device id (or "library"): {function name: CallStats.as_dict()}}.
+        """
+
+        with self.lock:
+            items = [(key, stats.as_dict()) for key, stats in self.stats.items()]
+        snapshot = {}
+        for (device_id, name), stats in sorted(items, key=lambda item: (str(item[0][0]), item[0][1])):
+            snapshot.setdefault("library" if device_id is None else device_id, {})[name] = stats
+        return snapshot
+
+    def to_prometheus(self, prefix: str = "oceandirect") -> str:
+        """!
+        The counters in the Prometheus text exposition format: a call latency histogram, an error
+        counter per error code and a transferred bytes counter, labelled by device and function.
+        @param[in] prefix The metric name prefix.
+        @return The exposition text.
+        """
+
+        lines = [
+            "# HELP %s_call_duration_seconds Latency of odapi calls." % prefix,
+            "# TYPE %s_call_duration_seconds histogram" % prefix,
+        ]
+        errors, transferred = [], []
+        for device_id, functions in self.snapshot().items():
+            for name, stats in functions.items():
+                labels = 'device="%s",function="%s"' % (device_id, name)
+                for bound, count in stats["histogram"].items():
+                    lines.append('%s_call_duration_seconds_bucket{%s,le="%s"} %d' % (prefix, labels, bound, count))
+                lines.append("%s_call_duration_seconds_sum{%s} %r" % (prefix, labels, stats["total_seconds"]))
+                lines.append("%s_call_duration_seconds_count{%s} %d" % (prefix, labels, stats["calls"]))
+                for code, count in sorted(stats["errors"].items()):
+                    errors.append('%s_call_errors_total{%s,code="%d"} %d' % (prefix, labels, code, count))
+                if stats["bytes"]:
+                    transferred.append("%s_transferred_bytes_total{%s} %d" % (prefix, labels, stats["bytes"]))
+        lines += ["# HELP %s_call_errors_total odapi calls that returned a non-zero error code." % prefix,
+                  "# TYPE %s_call_errors_total counter" % prefix] + errors
+        lines += ["# HELP %s_transferred_bytes_total Bytes copied out of the library." % prefix,
+                  "# TYPE %s_transferred_bytes_total counter" % prefix] + transferred
+        return "\n".join(lines) + "\n"
+
+
+recorder = CallRecorder()
+_default_recorder = recorder
+
+
+class InstrumentedLibrary:
+    """!
+    Proxy of the odapi library object: every odapi_* attribute is a wrapper that times the call
+    and reads its error code holder afterwards. Other attributes are passed through.
+    @param[in] library  The library object (cdll.LoadLibrary result or SimulatedOceanDirect).
+    @param[in] recorder The CallRecorder to fill. Defaults to the module level recorder.
+    """
+
+    def __init__(self, library, recorder: CallRecorder = None):
+        self._library  = library
+        self._recorder = recorder if recorder is not None else _default_recorder
+
+    def __getattr__(self, name: str):
+        function = getattr(self._library, name)
+        if not name.startswith("odapi_"):
+            return function
+        wrapper = self._wrap(name, function)
+        #cache on the instance so later lookups skip __getattr__
+        setattr(self, name, wrapper)
+        return wrapper
+
+    def _wrap(self, name: str, function):
+        recorder      = self._recorder
+        device_scoped = name not in LIBRARY_FUNCTIONS
+        error_index   = [None] # found on the first call, the argument layout of a function is fixed
+
+        def call(*args):
+            if not recorder.enabled:
+                return function(*args)
+            start = perf_counter()
+            result = function(*args)
+            seconds = perf_counter() - start
+            if error_index[0] is None:
+                error_index[0] = _error_holder_index(args)
+            error_code = args[error_index[0]][0] if error_index[0] >= 0 else 0
+            device_id = getattr(args[0], "value", args[0]) if device_scoped and args else None
+            recorder.record(device_id, name, seconds, error_code, _transferred(name, args, result) if not error_code else 0)
+            return result
+
+        call.__name__ = name
+        return call
+
+
+def instrument(device, recorder: CallRecorder = None) -> CallRecorder:
+    """!
+    Instrument the odapi calls made by one Spectrometer (and its Advanced methods).
+    @param[in] device   The Spectrometer object.
+    @param[in] recorder The CallRecorder to fill. Defaults to the module level recorder.
+    @return The recorder in use.
+    """
+
+    if not isinstance(device.oceandirect, InstrumentedLibrary):
+        device.oceandirect = InstrumentedLibrary(device.oceandirect, recorder)
+    return device.oceandirect._recorder
+
+
+def uninstrument(device) -> None:
+    """!
+    Restore direct library calls for a Spectrometer instrumented by instrument().
+    """
+
+    if isinstance(device.oceandirect, InstrumentedLibrary):
+        device.oceandirect = device.oceandirect._library
@@ -0,0 +1,510 @@
+# -*- coding: utf-8 -*-
+"""
+Pure python stand-in for the OceanDirect shared library. SimulatedOceanDirect exposes the odapi_*
+functions that OceanDirectAPI.py calls, with the same arguments (ctypes arrays, pointers and error
+code holders), so Spectrometer and Spectrometer.Advanced run unchanged without a spectrometer or
+liboceandirect.so. Select it with OCEANDIRECT_BACKEND=simulator (see sdk_properties.py).
+
+A simulated spectrometer either generates spectra (a smooth lamp spectrum scaled by integration
+time, plus dark level, shot noise and read noise) or replays recorded frames from a
+writeSpectraToCSV file or a spectrum store directory. With realtime enabled every frame takes
+its integration time (or 1/frame rate) of wall clock time; without it frames are produced as
+fast as they are asked for, which is what throughput benchmarks want.
+
+Environment variables read by from_environment():
+    OCEANDIRECT_SIM_DEVICES     number of simulated devices (1)
+    OCEANDIRECT_SIM_PIXELS      pixels per spectrum (3648)
+    OCEANDIRECT_SIM_REPLAY      recorded CSV file or spectrum store directory to replay
+    OCEANDIRECT_SIM_NOISE       noise scale, 0 for noiseless spectra (1)
+    OCEANDIRECT_SIM_FRAME_RATE  frames per second, instead of one frame per integration time
+    OCEANDIRECT_SIM_REALTIME    0 to produce frames without waiting (1)
+    OCEANDIRECT_SIM_SEED        random seed
+"""
+
+import os
+import json
+import time
+import threading
+import numpy as np
+from ctypes import memmove
+
+# Error codes of the simulator. Codes above 10000 are not used by the real library.
+ERROR_INVALID_ARGUMENT = 15
+ERROR_NO_DEVICE        = 10001
+ERROR_NOT_SUPPORTED    = 10002
+
+ERROR_MESSAGES = {
+    0:                      "Success",
+    ERROR_INVALID_ARGUMENT: "Invalid argument",
+    ERROR_NO_DEVICE:        "No simulated device with this id",
+    ERROR_NOT_SUPPORTED:    "Not supported by the simulated device",
+}
+
+# Cubic fit of the wavelength grid of the Spectral_Files captures.
+DEFAULT_WAVELENGTH_COEFFS = [578.880679, 0.0602709588, -1.59567192e-06, -3.58074608e-12]
+DEFAULT_NONLINEARITY_COEFFS = [0.0] * 8
+
+# Frames returned by one odapi_get_raw_spectrum_with_metadata call when not in realtime mode.
+BATCH_FRAMES = 15
+
+
+def _value(arg):
+    """! The python value of a ctypes scalar or a plain number. """
+    return arg.value if hasattr(arg, "value") else arg
+
+
+def _set_error(err_cp, code: int) -> None:
+    if err_cp is not None:
+        err_cp[0] = code
+
+
+def _write_array(destination, values: np.ndarray, limit: int) -> int:
+    """! Copy up to limit values into a ctypes array or pointer. Returns the number copied. """
+    count = max(0, min(len(values), int(_value(limit))))
+    values = np.ascontiguousarray(values[:count])
+    if count:
+        memmove(destination, values.ctypes.data, values.nbytes)
+    return count
+
+
+def _write_string(destination, text: str, limit: int) -> int:
+    data = text.encode()[:max(0, int(_value(limit)) - 1)] + b"\000"
+    memmove(destination, data, len(data))
+    return len(data) - 1
+
+
+def load_recording(path: str) -> tuple[np.ndarray, np.ndarray]:
+    """!
+    Read the frames to replay.
+    @param[in] path A writeSpectraToCSV file or a spectrum store directory.
+    @return (wavelengths, (n_frames, n_pixels) frames).
+    """
+
+    if os.path.isdir(path):
+        with open(os.path.join(path, "metadata.json")) as f:
+            metadata = json.load(f)
+        wavelengths = np.load(os.path.join(path, "wavelengths.npy"))
+        frames = np.fromfile(os.path.join(path, "intensity.bin"), dtype=np.dtype(metadata["dtype"]))
+        frames = frames[:len(frames) // len(wavelengths) * len(wavelengths)].reshape(-1, len(wavelengths))
+        return wavelengths, frames.astype(np.float64)
+    table = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+    return table[:, 0].copy(), np.ascontiguousarray(table[:, 1:].T)
+
+
+class SimulatedSpectrometer:
+    """!
+    State and frame source of one simulated device. Keyword arguments configure it:
+    @param[in] serialNumber       The serial number reported by the device.
+    @param[in] pixelCount         Pixels per spectrum (ignored when replaying).
+    @param[in] replay             Path of frames to replay (see load_recording), or None to generate spectra.
+    @param[in] noise              Scale of the simulated noise, 0 for noiseless spectra.
+    @param[in] frameRate          Frames per second. By default one frame per integration time plus acquisition delay.
+    @param[in] realtime           True to take the wall clock time of each frame, False to return frames immediately.
+    @param[in] peakFlux           Counts per second at the peak of the generated lamp spectrum.
+    @param[in] darkLevel          Dark counts added to every pixel.
+    @param[in] readNoise          Read noise in counts.
+    @param[in] gain               Electrons per count, for the shot noise.
+    @param[in] maximumIntensity   Saturation level in counts.
+    @param[in] wavelengthCoeffs   Wavelength calibration polynomial (constant term first).
+    @param[in] nonlinearityCoeffs Nonlinearity coefficients reported by the device.
+    @param[in] seed               Random seed.
+    """
+
+    def __init__(self, serialNumber: str = "SIM00000", pixelCount: int = 3648, replay: str = None, noise: float = 1.0,
+                 frameRate: float = None, realtime: bool = True, peakFlux: float = 3.0e5, darkLevel: float = 10.0,
+                 readNoise: float = 16.0, gain: float = 3.0, maximumIntensity: float = 65535.0,
+                 wavelengthCoeffs: list = None, nonlinearityCoeffs: list = None, seed: int = None):
+        self.serial_number       = serialNumber
+        self.noise               = noise
+        self.frame_rate          = frameRate
+        self.realtime            = realtime
+        self.peak_flux           = peakFlux
+        self.dark_level          = darkLevel
+        self.read_noise          = readNoise
+        self.gain                = gain
+        self.maximum_intensity   = maximumIntensity
+        self.nonlinearity_coeffs = list(nonlinearityCoeffs if nonlinearityCoeffs is not None else DEFAULT_NONLINEARITY_COEFFS)
+        self.rng                 = np.random.default_rng(seed)
+        self.lock                = threading.Lock()
+
+        if replay is not None:
+            self.wavelengths, self.recording = load_recording(replay)
+            pixels = np.arange(len(self.wavelengths))
+            self.wavelength_coeffs = list(np.polynomial.polynomial.polyfit(pixels, self.wavelengths, 3))
+        else:
+            self.recording = None
+            self.wavelength_coeffs = list(wavelengthCoeffs if wavelengthCoeffs is not None else DEFAULT_WAVELENGTH_COEFFS)
+            self.wavelengths = np.polynomial.polynomial.polyval(np.arange(pixelCount), self.wavelength_coeffs)
+        self.pixel_count = len(self.wavelengths)
+        #counts per second of a broad lamp spectrum, like the Gain_Spectra captures
+        self.flux = self.peak_flux * np.exp(-0.5 * ((self.wavelengths - 623.5) / 90.0) ** 2)
+
+        self.is_open               = False
+        self.integration_time_us   = 30000
+        self.minimum_integration_us = 10
+        self.maximum_integration_us = 10000000
+        self.acquisition_delay_us  = 0
+        self.scans_to_average      = 1
+        self.boxcar_width          = 0
+        self.trigger_mode          = 0
+        self.electric_dark_usage   = 0
+        self.nonlinearity_usage    = 0
+        self.buffer_enabled        = 0
+        self.buffer_capacity       = 50000
+        self.backtoback_scans      = 1
+        self.frame_index           = 0
+        self.clock_us              = 0
+        self.started               = time.monotonic()
+
+    def reset_clock(self) -> None:
+        """! Restart the device clock; frames are due one period after this. """
+        self.clock_us = int((time.monotonic() - self.started) * 1e6)
+
+    def frame_period_us(self) -> float:
+        if self.frame_rate:
+            period = 1e6 / self.frame_rate
+        else:
+            period = self.integration_time_us + self.acquisition_delay_us
+        return max(period, 1.0) * max(self.scans_to_average, 1)
+
+    def pending_frames(self) -> int:
+        """! Frames completed since the last read, as the data buffer would hold them. """
+        if not self.realtime:
+            return min(self.buffer_capacity, BATCH_FRAMES)
+        elapsed = (time.monotonic() - self.started) * 1e6 - self.clock_us
+        return int(min(max(elapsed // self.frame_period_us(), 0), self.buffer_capacity))
+
+    def acquire(self, count: int, wait: bool) -> tuple[np.ndarray, np.ndarray]:
+        """!
+        Produce the next frames and their device timestamps (microseconds).
+        @param[in] count The most frames to return.
+        @param[in] wait  True to block until at least one frame is complete (realtime mode).
+        """
+
+        period = self.frame_period_us()
+        if self.realtime:
+            now_us = (time.monotonic() - self.started) * 1e6
+            behind = (now_us - self.clock_us) // period
+            if behind > self.buffer_capacity:
+                #frames the buffer could not hold are lost
+                skipped = int(behind - self.buffer_capacity)
+                self.clock_us += skipped * period
+                self.frame_index += skipped
+            if wait and now_us < self.clock_us + period:
+                time.sleep((self.clock_us + period - now_us) * 1e-6)
+                now_us = (time.monotonic() - self.started) * 1e6
+            count = int(min(count, max((now_us - self.clock_us) // period, 0)))
+        timestamps = self.clock_us + period * np.arange(1, count + 1)
+        self.clock_us = float(timestamps[-1]) if count else self.clock_us
+        frames = self.render(np.arange(self.frame_index, self.frame_index + count))
+        self.frame_index += count
+        return frames, timestamps.astype(np.int64)
+
+    def render(self, indices: np.ndarray) -> np.ndarray:
+        """! The spectra of the given frame numbers, (len(indices), pixel_count). """
+        scans = max(self.scans_to_average, 1)
+        if self.recording is not None:
+            frames = self.recording[indices % len(self.recording)]
+            if self.noise:
+                frames = frames + self.rng.standard_normal(frames.shape) * (self.noise * self.read_noise / np.sqrt(scans))
+            return frames
+
+        signal = self.flux * (self.integration_time_us * 1e-6)
+        frames = np.broadcast_to(signal + self.dark_level, (len(indices), self.pixel_count))
+        if self.noise:
+            sigma = np.sqrt(np.clip(signal, 0, None) / self.gain + self.read_noise ** 2) * (self.noise / np.sqrt(scans))
+            frames = frames + self.rng.standard_normal(frames.shape) * sigma
+        return np.clip(frames, None, self.maximum_intensity)
+
+
+class SimulatedOceanDirect:
+    """!
+    Drop-in replacement for the object returned by cdll.LoadLibrary(oceandirect_dll). Calls to
+    odapi functions the simulator does not implement set ERROR_NOT_SUPPORTED in the error code
+    holder (when the call has one) and return 0.
+
+    @param[in] devices       SimulatedSpectrometer objects, or None to create deviceCount of them.
+    @param[in] deviceCount   The number of devices to create.
+    @param[in] deviceOptions Keyword arguments of the created SimulatedSpectrometer objects.
+    """
+
+    #odapi function -> SimulatedSpectrometer attribute it reads or writes
+    GETTERS = {
+        "odapi_get_integration_time_micros":                   "integration_time_us",
+        "odapi_get_minimum_integration_time_micros":           "minimum_integration_us",
+        "odapi_get_maximum_integration_time_micros":           "maximum_integration_us",
+        "odapi_get_acquisition_delay_microseconds":            "acquisition_delay_us",
+        "odapi_get_scans_to_average":                          "scans_to_average",
+        "odapi_get_boxcar_width":                              "boxcar_width",
+        "odapi_get_maximum_intensity":                         "maximum_intensity",
+        "odapi_get_electric_dark_correction_usage":            "electric_dark_usage",
+        "odapi_get_nonlinearity_correct_usage":                "nonlinearity_usage",
+        "odapi_adv_get_trigger_mode":                          "trigger_mode",
+        "odapi_adv_get_data_buffer_enable":                    "buffer_enabled",
+        "odapi_adv_get_data_buffer_capacity":                  "buffer_capacity",
+        "odapi_adv_get_number_of_backtoback_scans":            "backtoback_scans",
+    }
+    SETTERS = {
+        "odapi_adv_set_acquisition_delay_microseconds":        "acquisition_delay_us",
+        "odapi_set_acquisition_delay_microseconds":            "acquisition_delay_us",
+        "odapi_set_scans_to_average":                          "scans_to_average",
+        "odapi_set_boxcar_width":                              "boxcar_width",
+        "odapi_adv_set_trigger_mode":                          "trigger_mode",
+        "odapi_adv_set_data_buffer_enable":                    "buffer_enabled",
+        "odapi_adv_set_data_buffer_capacity":                  "buffer_capacity",
+        "odapi_adv_set_number_of_backtoback_scans":            "backtoback_scans",
+    }
+    FIXED = {
+        "odapi_get_integration_time_increment_micros":         1,
+        "odapi_get_minimum_averaging_integration_time_micros": 10,
+        "odapi_get_acquisition_delay_increment_microseconds":  1,
+        "odapi_get_acquisition_delay_maximum_microseconds":    30000000,
+        "odapi_get_acquisition_delay_minimum_microseconds":    0,
+        "odapi_adv_get_data_buffer_capacity_minimum":          1,
+        "odapi_adv_get_data_buffer_capacity_maximum":          500000,
+        "odapi_adv_get_device_idle_state":                     1,
+        "odapi_adv_tec_get_temperature_degrees_C":             25.0,
+        "odapi_get_electric_dark_pixel_count":                 0,
+    }
+
+    def __init__(self, devices: list = None, deviceCount: int = 1, **deviceOptions):
+        if devices is None:
+            seed = deviceOptions.pop("seed", None)
+            devices = [SimulatedSpectrometer(serialNumber="SIM%05d" % index,
+                                             seed=None if seed is None else seed + index, **deviceOptions)
+                       for index in range(deviceCount)]
+        self.devices = {device_id: device for device_id, device in enumerate(devices, 1)}
+        self.probed  = False
+
+    @staticmethod
+    def from_environment() -> 'SimulatedOceanDirect':
+        """! Create the simulator configured by the OCEANDIRECT_SIM_* environment variables. """
+        options = {}
+        env = os.environ
+        if "OCEANDIRECT_SIM_PIXELS" in env:
+            options["pixelCount"] = int(env["OCEANDIRECT_SIM_PIXELS"])
+        if env.get("OCEANDIRECT_SIM_REPLAY"):
+            options["replay"] = env["OCEANDIRECT_SIM_REPLAY"]
+        if "OCEANDIRECT_SIM_NOISE" in env:
+            options["noise"] = float(env["OCEANDIRECT_SIM_NOISE"])
+        if env.get("OCEANDIRECT_SIM_FRAME_RATE"):
+            options["frameRate"] = float(env["OCEANDIRECT_SIM_FRAME_RATE"])
+        if "OCEANDIRECT_SIM_REALTIME" in env:
+            options["realtime"] = env["OCEANDIRECT_SIM_REALTIME"].strip().lower() not in ("0", "false", "no", "")
+        if "OCEANDIRECT_SIM_SEED" in env:
+            options["seed"] = int(env["OCEANDIRECT_SIM_SEED"])
+        return SimulatedOceanDirect(deviceCount=int(env.get("OCEANDIRECT_SIM_DEVICES", "1")), **options)
+
+    def _device(self, device_id, err_cp) -> SimulatedSpectrometer:
+        #OceanDirectAPI.open_device hands out cached (possibly closed) Spectrometer objects, so like
+        #the hardware a closed device keeps answering requests
+        device = self.devices.get(_value(device_id))
+        _set_error(err_cp, ERROR_NO_DEVICE if device is None else 0)
+        return device
+
+    def __getattr__(self, name: str):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        function = self._resolve(name)
+        setattr(self, name, function)
+        return function
+
+    def _resolve(self, name: str):
+        if name in self.GETTERS:
+            return self._getter(self.GETTERS[name])
+        if name in self.SETTERS:
+            return self._setter(self.SETTERS[name])
+        if name in self.FIXED:
+            value = self.FIXED[name]
+
+            def fixed(device_id, err_cp, *args):
+                return value if self._device(device_id, err_cp) is not None else 0
+            return fixed
+
+        def unsupported(*args):
+            if len(args) >= 2 and hasattr(args[1], "__setitem__"):
+                _set_error(args[1], ERROR_NOT_SUPPORTED)
+            return 0
+        return unsupported
+
+    def _getter(self, attribute: str):
+        def getter(device_id, err_cp):
+            device = self._device(device_id, err_cp)
+            return getattr(device, attribute) if device is not None else 0
+        return getter
+
+    def _setter(self, attribute: str):
+        def setter(device_id, err_cp, value):
+            device = self._device(device_id, err_cp)
+            if device is not None:
+                value = int(_value(value))
+                if value < 0:
+                    _set_error(err_cp, ERROR_INVALID_ARGUMENT)
+                else:
+                    with device.lock:
+                        setattr(device, attribute, value)
+        return setter
+
+    #library and device discovery
+
+    def odapi_initialize(self) -> None:
+        pass
+
+    def odapi_shutdown(self) -> None:
+        for device in self.devices.values():
+            device.is_open = False
+
+    def odapi_get_api_version_numbers(self, major, minor, point) -> None:
+        for holder, number in ((major, 2), (minor, 4), (point, 0)):
+            getattr(holder, "_obj", holder).value = number
+
+    def odapi_get_error_string_length(self, errno) -> int:
+        return len(ERROR_MESSAGES.get(_value(errno), "Unknown error")) + 1
+
+    def odapi_get_error_string(self, errno, buffer, length) -> int:
+        return _write_string(buffer, ERROR_MESSAGES.get(_value(errno), "Unknown error"), length)
+
+    def odapi_probe_devices(self) -> int:
+        self.probed = True
+        return len(self.devices)
+
+    def odapi_detect_network_devices(self) -> int:
+        return 0
+
+    def odapi_get_number_of_device_ids(self) -> int:
+        return len(self.devices) if self.probed else 0
+
+    def odapi_get_device_ids(self, ids_cp, err_cp) -> int:
+        _set_error(err_cp, 0)
+        ids = list(self.devices)[:len(ids_cp)] if self.probed else []
+        for index, device_id in enumerate(ids):
+            ids_cp[index] = device_id
+        return len(ids)
+
+    def odapi_open_device(self, device_id, err_cp) -> None:
+        device = self._device(device_id, err_cp)
+        if device is not None:
+            device.is_open = True
+            device.reset_clock()
+
+    def odapi_close_device(self, device_id, err_cp) -> None:
+        device = self._device(device_id, err_cp)
+        if device is not None:
+            device.is_open = False
+
+    #device information
+
+    def odapi_get_serial_number(self, device_id, err_cp, buffer, length) -> int:
+        device = self._device(device_id, err_cp)
+        return _write_string(buffer, device.serial_number, length) if device is not None else 0
+
+    def odapi_get_device_type(self, device_id, err_cp, buffer, length) -> int:
+        device = self._device(device_id, err_cp)
+        return _write_string(buffer, "Simulator", length) if device is not None else 0
+
+    def odapi_get_device_name(self, device_id, err_cp, buffer, length) -> int:
+        device = self._device(device_id, err_cp)
+        return _write_string(buffer, "SimulatedSpectrometer", length) if device is not None else 0
+
+    def odapi_adv_get_revision_firmware(self, device_id, err_cp, buffer, length) -> int:
+        device = self._device(device_id, err_cp)
+        return _write_string(buffer, "sim-1.0", length) if device is not None else 0
+
+    def odapi_adv_get_revision_fpga(self, device_id, err_cp, buffer, length) -> int:
+        device = self._device(device_id, err_cp)
+        return _write_string(buffer, "sim-1.0", length) if device is not None else 0
+
+    #acquisition
+
+    def odapi_get_formatted_spectrum_length(self, device_id, err_cp) -> int:
+        device = self._device(device_id, err_cp)
+        return device.pixel_count if device is not None else 0
+
+    def odapi_get_formatted_spectrum(self, device_id, err_cp, buffer, length) -> int:
+        device = self._device(device_id, err_cp)
+        if device is None:
+            return 0
+        with device.lock:
+            frames, timestamps = device.acquire(1, wait=True)
+        return _write_array(buffer, frames[0], length) if len(frames) else 0
+
+    def odapi_get_wavelengths(self, device_id, err_cp, buffer, length) -> int:
+        device = self._device(device_id, err_cp)
+        return _write_array(buffer, device.wavelengths, length) if device is not None else 0
+
+    def odapi_get_wavelength_coeffs(self, device_id, err_cp, buffer, length) -> int:
+        device = self._device(device_id, err_cp)
+        return _write_array(buffer, np.asarray(device.wavelength_coeffs, dtype=np.float64), length) if device is not None else 0
+
+    def odapi_set_integration_time_micros(self, device_id, err_cp, value) -> None:
+        device = self._device(device_id, err_cp)
+        if device is not None:
+            value = int(_value(value))
+            if not device.minimum_integration_us <= value <= device.maximum_integration_us:
+                _set_error(err_cp, ERROR_INVALID_ARGUMENT)
+            else:
+                with device.lock:
+                    device.integration_time_us = value
+
+    def odapi_apply_electric_dark_correction_usage(self, device_id, err_cp, flag) -> None:
+        device = self._device(device_id, err_cp)
+        if device is not None:
+            device.electric_dark_usage = int(_value(flag))
+
+    def odapi_apply_nonlinearity_correct_usage(self, device_id, err_cp, flag) -> None:
+        device = self._device(device_id, err_cp)
+        if device is not None:
+            device.nonlinearity_usage = int(_value(flag))
+
+    def odapi_adv_get_nonlinearity_coeffs(self, device_id, err_cp, buffer, length) -> int:
+        device = self._device(device_id, err_cp)
+        return _write_array(buffer, np.asarray(device.nonlinearity_coeffs, dtype=np.float64), length) if device is not None else 0
+
+    def odapi_adv_get_nonlinearity_coeffs_count1(self, device_id, err_cp) -> int:
+        device = self._device(device_id, err_cp)
+        return len(device.nonlinearity_coeffs) if device is not None else 0
+
+    def odapi_adv_get_nonlinearity_coeffs1(self, device_id, err_cp, index) -> float:
+        device = self._device(device_id, err_cp)
+        index = int(_value(index))
+        if device is None:
+            return 0.0
+        if not 0 <= index < len(device.nonlinearity_coeffs):
+            _set_error(err_cp, ERROR_INVALID_ARGUMENT)
+            return 0.0
+        return device.nonlinearity_coeffs[index]
+
+    #data buffer and back-to-back scans
+
+    def odapi_adv_clear_data_buffer(self, device_id, err_cp) -> None:
+        device = self._device(device_id, err_cp)
+        if device is not None:
+            with device.lock:
+                device.reset_clock()
+
+    def odapi_adv_get_data_buffer_number_of_elements(self, device_id, err_cp) -> int:
+        device = self._device(device_id, err_cp)
+        return device.pending_frames() if device is not None else 0
+
+    def odapi_adv_abort_acquisition(self, device_id, err_cp) -> None:
+        self._device(device_id, err_cp)
+
+    def odapi_adv_acquire_spectra_to_buffer(self, device_id, err_cp) -> None:
+        self._device(device_id, err_cp)
+
+    def odapi_get_raw_spectrum_with_metadata(self, device_id, err_cp, row_pointers, buffer_size, pixel_count,
+                                             timestamps, timestamp_count) -> int:
+        device = self._device(device_id, err_cp)
+        if device is None:
+            return 0
+        count = min(int(_value(buffer_size)), int(_value(timestamp_count)))
+        if int(_value(pixel_count)) < device.pixel_count or count < 1:
+            _set_error(err_cp, ERROR_INVALID_ARGUMENT)
+            return 0
+        with device.lock:
+            #without the data buffer the device returns one spectrum per request
+            frames, stamps = device.acquire(count if device.buffer_enabled else 1, wait=not device.buffer_enabled)
+        for row, frame in enumerate(frames):
+            _write_array(row_pointers[row], frame, device.pixel_count)
+        _write_array(timestamps, stamps, len(stamps))
+        return len(frames)
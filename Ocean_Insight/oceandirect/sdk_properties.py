@@ -29,5 +29,11 @@ else:
 module_path=os.path.dirname(__file__)
 oceandirect_dll = module_path + os.path.normpath("/lib/"+oceandirect_libname)
 
+#"native" loads oceandirect_dll, "simulator" uses od_simulator instead (no spectrometer or library needed).
+oceandirect_backend = os.environ.get("OCEANDIRECT_BACKEND", "native").strip().lower()
+
+#"1" wraps the library in od_instrumentation.InstrumentedLibrary to record per-call latency and errors.
+oceandirect_instrument = os.environ.get("OCEANDIRECT_INSTRUMENT", "0").strip().lower() in ("1", "true", "yes")
+
 #oceandirect_dll = os.path.normpath(program_data+"/lib/"+oceandirect_libname)
 #print("oceandirect_dll: ", oceandirect_dll)
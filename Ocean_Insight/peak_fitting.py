@@ -0,0 +1,177 @@
+
+import numpy as np
+from collections import namedtuple
+
+# Batched Gaussian peak fitting and FWHM measurement for transmission curves
+#
+# Replaces the per-file curve_fit / calculate_fwhm loop of Filter_AOI_Testing.ipynb: every
+# curve of a (n_curves, n_pixels) stack is windowed around its peak, started from moment
+# estimates and fitted together by one vectorized Levenberg-Marquardt with the analytic
+# Jacobian of gaussian().
+
+FWHM_PER_SIGMA = 2 * np.sqrt(2 * np.log(2))
+
+PeakFits = namedtuple("PeakFits", [
+    "amplitude", "centroid", "sigma", "fwhm",
+    "amplitude_uncertainty", "centroid_uncertainty", "sigma_uncertainty", "fwhm_uncertainty",
+    "crlb_centroid_uncertainty", "half_max_fwhm", "covariance", "converged"])
+PeakFits.__doc__ = """Per-curve fit results, each an (n_curves,) array (covariance is (n_curves, 3, 3) for
+amplitude, centroid, sigma). Uncertainties are the square roots of the covariance diagonal, scaled
+by the residual variance like curve_fit. crlb_centroid_uncertainty is the notebook's Cramer-Rao
+bound sigma / (sqrt(N) * SNR); half_max_fwhm is measured on the data, without the Gaussian model."""
+
+
+def gaussian(x, amplitude, centroid, sigma):
+    return amplitude * np.exp(-(x - centroid)**2 / (2 * sigma**2))
+
+
+def _as_rows(wavelengths, intensities):
+    intensities = np.atleast_2d(np.asarray(intensities, dtype=np.float64))
+    wavelengths = np.broadcast_to(np.asarray(wavelengths, dtype=np.float64), intensities.shape)
+    return wavelengths, intensities
+
+
+def peak_windows(wavelengths, intensities, halfWidth: int = 20, trim: int = 20):
+    """
+    Cuts a 2 * halfWidth pixel window around the maximum of every curve, ignoring trim pixels at
+    each end of the detector like the notebook. Windows near an edge are shifted inwards so all
+    have the same width. wavelengths is one grid or one grid per curve; returns (x, y) stacks.
+    """
+    wavelengths, intensities = _as_rows(wavelengths, intensities)
+    n_pixels = intensities.shape[1]
+    width = 2 * halfWidth
+    if n_pixels - 2 * trim < width:
+        raise ValueError("%d pixels are too few for %d pixel windows after trimming %d." % (n_pixels, width, trim))
+    peak = trim + np.argmax(intensities[:, trim:n_pixels - trim], axis=1)
+    start = np.clip(peak - halfWidth, trim, n_pixels - trim - width)
+    index = start[:, np.newaxis] + np.arange(width)
+    return (np.take_along_axis(wavelengths, index, axis=1), np.take_along_axis(intensities, index, axis=1))
+
+
+def moment_guesses(x, y) -> np.ndarray:
+    """(n_curves, 3) starting values: peak height, and the centroid and width of the positive part of each curve."""
+    x, y = _as_rows(x, y)
+    weights = np.clip(y, 0, None)
+    total = weights.sum(axis=1)
+    total[total == 0] = 1
+    centroid = (weights * x).sum(axis=1) / total
+    sigma = np.sqrt((weights * (x - centroid[:, np.newaxis])**2).sum(axis=1) / total)
+    fallback = np.std(x, axis=1) # flat or negative curves
+    sigma = np.where(sigma > 0, sigma, fallback)
+    return np.column_stack([y.max(axis=1), centroid, sigma])
+
+
+def _model_and_jacobian(x, params):
+    amplitude, centroid, sigma = (params[:, i, np.newaxis] for i in range(3))
+    offset = x - centroid
+    shape = np.exp(-offset**2 / (2 * sigma**2))
+    model = amplitude * shape
+    jacobian = np.stack([shape, model * offset / sigma**2, model * offset**2 / sigma**3], axis=2)
+    return model, jacobian
+
+
+def fit_gaussians(x, y, p0=None, maxIterations: int = 100, tolerance: float = 1e-10):
+    """
+    Least-squares fit of gaussian() to every row of y (x one grid or one per row), all rows at
+    once. p0 defaults to moment_guesses. Returns (params (n, 3), covariance (n, 3, 3),
+    residuals (n, m), converged (n,)); the covariance is inv(J^T J) * residual variance, as
+    curve_fit reports it.
+    """
+    x, y = _as_rows(x, y)
+    n_curves, n_points = y.shape
+    params = moment_guesses(x, y) if p0 is None else np.array(np.broadcast_to(p0, (n_curves, 3)), dtype=np.float64)
+    damping = np.full(n_curves, 1e-3)
+    converged = np.zeros(n_curves, dtype=bool)
+
+    model, jacobian = _model_and_jacobian(x, params)
+    residuals = y - model
+    cost = (residuals**2).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(maxIterations):
+            active = ~converged
+            if not active.any():
+                break
+            jtj = np.einsum('nmi,nmj->nij', jacobian[active], jacobian[active])
+            jtr = np.einsum('nmi,nm->ni', jacobian[active], residuals[active])
+            diagonal = np.einsum('nii->ni', jtj)
+            damped = jtj + (damping[active, np.newaxis] * diagonal)[:, :, np.newaxis] * np.eye(3)
+            try:
+                step = np.linalg.solve(damped, jtr[:, :, np.newaxis])[:, :, 0]
+            except np.linalg.LinAlgError:
+                step = np.einsum('nij,nj->ni', np.linalg.pinv(damped), jtr)
+
+            trial = params[active] + step
+            trial_model, trial_jacobian = _model_and_jacobian(x[active], trial)
+            trial_residuals = y[active] - trial_model
+            trial_cost = (trial_residuals**2).sum(axis=1)
+            better = np.isfinite(trial_cost) & (trial_cost <= cost[active]) & (trial[:, 2] != 0)
+
+            rows = np.flatnonzero(active)
+            accepted = rows[better]
+            improvement = cost[accepted] - trial_cost[better]
+            params[accepted] = trial[better]
+            model[accepted] = trial_model[better]
+            jacobian[accepted] = trial_jacobian[better]
+            residuals[accepted] = trial_residuals[better]
+            cost[accepted] = trial_cost[better]
+            damping[accepted] = np.maximum(damping[accepted] / 10, 1e-12)
+            damping[rows[~better]] *= 10
+
+            small_step = np.all(np.abs(step) <= tolerance * (np.abs(params[active]) + tolerance), axis=1)
+            done = np.zeros(len(rows), dtype=bool)
+            done[better] = improvement <= tolerance * (cost[accepted] + tolerance)
+            converged[rows[done | small_step | (damping[rows] > 1e12)]] = True
+
+        params[:, 2] = np.abs(params[:, 2])
+        jtj = np.einsum('nmi,nmj->nij', jacobian, jacobian)
+        variance = cost / max(n_points - 3, 1)
+        covariance = np.linalg.pinv(jtj) * variance[:, np.newaxis, np.newaxis]
+    return params, covariance, residuals, converged
+
+
+def half_max_fwhm(wavelengths, intensities) -> np.ndarray:
+    """
+    Full width at half maximum of every curve: the half-maximum crossings nearest to each side
+    of the maximum, linearly interpolated between pixels (so noise far from the peak does not
+    count). NaN where the curve does not fall below half maximum on both sides.
+    """
+    wavelengths, intensities = _as_rows(wavelengths, intensities)
+    n_curves, n_pixels = intensities.shape
+    rows = np.arange(n_curves)
+    pixel = np.arange(n_pixels)
+    peak = np.argmax(intensities, axis=1)
+    half = intensities[rows, peak] / 2
+    below = intensities < half[:, np.newaxis]
+    left = np.where(below & (pixel < peak[:, np.newaxis]), pixel, -1).max(axis=1)
+    right = np.where(below & (pixel > peak[:, np.newaxis]), pixel, n_pixels).min(axis=1)
+    valid = (left >= 0) & (right < n_pixels) & (half > 0)
+    left, right = np.clip(left, 0, n_pixels - 2), np.clip(right, 1, n_pixels - 1)
+
+    def crossing(i0, i1):
+        x0, x1 = wavelengths[rows, i0], wavelengths[rows, i1]
+        y0, y1 = intensities[rows, i0], intensities[rows, i1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return x0 + (half - y0) * (x1 - x0) / (y1 - y0)
+
+    return np.where(valid, crossing(right - 1, right) - crossing(left, left + 1), np.nan)
+
+
+def fit_peaks(wavelengths, intensities, halfWidth: int = 20, trim: int = 20) -> PeakFits:
+    """
+    Fits the peak of every curve of a (n_curves, n_pixels) stack (e.g. normalized throughputs),
+    with the notebook's windowing: trim pixels dropped at each end, a 2 * halfWidth pixel
+    window around the maximum.
+    """
+    wavelengths, intensities = _as_rows(wavelengths, intensities)
+    x, y = peak_windows(wavelengths, intensities, halfWidth, trim)
+    params, covariance, residuals, converged = fit_gaussians(x, y)
+    uncertainty = np.sqrt(np.clip(np.einsum('nii->ni', covariance), 0, None))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        snr = y.mean(axis=1) / residuals.std(axis=1)
+        crlb = params[:, 2] / (np.sqrt(y.shape[1]) * snr)
+    n_pixels = intensities.shape[1]
+    return PeakFits(params[:, 0], params[:, 1], params[:, 2], FWHM_PER_SIGMA * params[:, 2],
+                    uncertainty[:, 0], uncertainty[:, 1], uncertainty[:, 2], FWHM_PER_SIGMA * uncertainty[:, 2],
+                    crlb, half_max_fwhm(wavelengths[:, trim:n_pixels - trim], intensities[:, trim:n_pixels - trim]),
+                    covariance, converged)
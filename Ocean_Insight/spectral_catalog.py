@@ -0,0 +1,220 @@
+
+import os, re, glob, json, time, sqlite3, threading
+from collections import namedtuple
+from spectral_library import DEFAULT_ROOT
+from spectrum_store import SpectrumStore, INTENSITY_FILE
+
+# SQLite index of every capture, so runs are selected by query instead of globbing and parsing names
+
+DEFAULT_DB = os.path.join(DEFAULT_ROOT, 'spectral_catalog.sqlite')
+
+FIELDS = ["id", "path", "kind", "serial_number", "integration_time_us", "aoi_deg", "filter_temperature_c",
+          "detector_temperature_c", "frame_count", "pixel_count", "file_format", "data_offset", "frame_stride",
+          "created", "metadata"]
+Capture = namedtuple("Capture", FIELDS)
+Capture.__doc__ = """One catalogued capture. data_offset is the byte offset of the first data row (CSV) or
+frame (binary store intensity file), frame_stride the bytes per frame for binary stores.
+filter_temperature_c is the filter (heater) temperature of the run, detector_temperature_c the
+spectrometer's own temperature read back when the capture was taken."""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    kind TEXT,
+    serial_number TEXT,
+    integration_time_us INTEGER,
+    aoi_deg REAL,
+    filter_temperature_c REAL,
+    detector_temperature_c REAL,
+    frame_count INTEGER,
+    pixel_count INTEGER,
+    file_format TEXT,
+    data_offset INTEGER,
+    frame_stride INTEGER,
+    created REAL,
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS captures_kind_time ON captures (kind, integration_time_us);
+CREATE INDEX IF NOT EXISTS captures_aoi ON captures (aoi_deg);
+CREATE INDEX IF NOT EXISTS captures_temperature ON captures (filter_temperature_c);
+CREATE INDEX IF NOT EXISTS captures_serial ON captures (serial_number);
+"""
+
+# Legacy file names and what they encode. Checked in order, first match wins.
+LEGACY_NAMES = [
+    (re.compile(r'^Dark_(\d+)\.csv$'), "dark", "integration_time_us"),
+    (re.compile(r'^Spectral_Intensity_(\d+)\.csv$'), "gain", "integration_time_us"),
+    (re.compile(r'^Filter_Throughput_(-?\d+(?:\.\d+)?)C\.csv$'), "temperature", "filter_temperature_c"),
+    (re.compile(r'^Filter_Throughput_(-?\d+(?:\.\d+)?)\.csv$'), "aoi", "aoi_deg"),
+    (re.compile(r'^Base_Throughput(?:_(\w+))?\.csv$'), "base", None),
+]
+
+
+def parse_legacy_name(path: str) -> dict:
+    """
+    Catalog fields encoded in a legacy file name, replacing ad-hoc helpers like extract_angle:
+        Dark_30000.csv -> dark, 30000 us          Spectral_Intensity_5000.csv -> gain, 5000 us
+        Filter_Throughput_23C.csv -> 23 C         Filter_Throughput_15.csv -> 15 deg AOI
+        Base_Throughput[_label].csv -> base
+    Returns an empty dict for unknown names.
+    """
+    name = os.path.basename(path)
+    for pattern, kind, field in LEGACY_NAMES:
+        match = pattern.match(name)
+        if match is None:
+            continue
+        fields = {"kind": kind}
+        if field == "integration_time_us":
+            fields[field] = int(match.group(1))
+        elif field is not None:
+            fields[field] = float(match.group(1))
+        elif match.group(1):
+            fields["metadata"] = {"label": match.group(1)}
+        return fields
+    return {}
+
+
+def inspect_csv(path: str) -> dict:
+    """Frame count, pixel count and data offset of a writeSpectraToCSV file, without parsing the values."""
+    with open(path, 'rb') as f:
+        header = f.readline()
+        rows = 0
+        last = b'\n'
+        for block in iter(lambda: f.read(1 << 20), b''):
+            rows += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        rows += 1 # no newline after the last row
+    return {"frame_count": header.count(b','), "pixel_count": rows, "data_offset": len(header), "file_format": "csv"}
+
+
+class SpectralCatalog:
+    """
+    Persistent SQLite catalog of captures: serial number, integration time, AOI, filter
+    temperature, frame and pixel counts, file location and byte offsets. Paths inside root are
+    stored relative to it. The database is created on first use.
+
+    Usage:
+        catalog = SpectralCatalog()
+        catalog.backfill()                                   # index existing Spectral_Files once
+        darks = catalog.query(kind="dark", integration_time_us=30000)
+        sweep = catalog.query(kind="aoi", aoi_range=(0, 25))
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB, root: str = DEFAULT_ROOT):
+        self.db_path = db_path
+        self.root = os.path.abspath(root)
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._connection.executescript(SCHEMA)
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(captures)")}
+            if "detector_temperature_c" not in columns: # catalogs created before the column existed
+                with self._connection:
+                    self._connection.execute("ALTER TABLE captures ADD COLUMN detector_temperature_c REAL")
+        return self._connection
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def relative_path(self, path: str) -> str:
+        path = os.path.abspath(path)
+        relative = os.path.relpath(path, self.root)
+        return path if relative.startswith(os.pardir) else relative.replace(os.sep, '/')
+
+    def absolute_path(self, capture: Capture) -> str:
+        return capture.path if os.path.isabs(capture.path) else os.path.join(self.root, capture.path)
+
+    def add(self, path: str, **fields) -> int:
+        """Adds or replaces the entry for path. fields are catalog columns (see FIELDS); returns the id."""
+        unknown = set(fields) - set(FIELDS[2:])
+        if unknown:
+            raise ValueError("Unknown catalog fields: %s" % ", ".join(sorted(unknown)))
+        fields.setdefault("created", time.time())
+        if isinstance(fields.get("metadata"), dict):
+            fields["metadata"] = json.dumps(fields["metadata"])
+        columns = ["path"] + list(fields)
+        sql = "INSERT OR REPLACE INTO captures (%s) VALUES (%s)" % (", ".join(columns), ", ".join("?" * len(columns)))
+        with self._lock, self.connection:
+            cursor = self.connection.execute(sql, [self.relative_path(path)] + list(fields.values()))
+        return cursor.lastrowid
+
+    def add_csv(self, path: str, **fields) -> int:
+        """Catalogs a writeSpectraToCSV file; the counts come from the file, the rest from its name
+        (parse_legacy_name) unless given explicitly."""
+        record = {**parse_legacy_name(path), **inspect_csv(path), **{k: v for k, v in fields.items() if v is not None}}
+        if "created" not in fields:
+            record["created"] = os.path.getmtime(path)
+        return self.add(path, **record)
+
+    def add_store(self, path: str, **fields) -> int:
+        """Catalogs a spectrum_store directory, taking the acquisition metadata from the store."""
+        store = SpectrumStore(path)
+        metadata = store.metadata
+        record = {"kind": metadata.get("kind"), "serial_number": metadata.get("serial_number"),
+                  "integration_time_us": metadata.get("integration_time_us"), "aoi_deg": metadata.get("aoi_deg"),
+                  "filter_temperature_c": metadata.get("filter_temperature_c"),
+                  "detector_temperature_c": metadata.get("detector_temperature_c"), "frame_count": len(store),
+                  "pixel_count": store.pixel_count, "file_format": "store", "data_offset": 0,
+                  "frame_stride": store.pixel_count * store.dtype.itemsize,
+                  "created": os.path.getmtime(os.path.join(path, INTENSITY_FILE))}
+        record = {k: v for k, v in record.items() if v is not None}
+        record.update({k: v for k, v in fields.items() if v is not None})
+        return self.add(path, **record)
+
+    def backfill(self, pattern: str = '**/*.csv') -> int:
+        """Catalogs every CSV under root matching pattern. Returns the number of files added."""
+        paths = sorted(glob.glob(os.path.join(self.root, pattern), recursive=True))
+        for path in paths:
+            self.add_csv(path)
+        return len(paths)
+
+    def remove(self, path: str) -> None:
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM captures WHERE path = ?", [self.relative_path(path)])
+
+    def query(self, kind: str = None, serial_number: str = None, integration_time_us: int = None,
+              aoi_range: tuple = None, temperature_range: tuple = None, file_format: str = None) -> list[Capture]:
+        """
+        Captures matching every given condition, ordered by integration time, AOI, temperature
+        and path. Ranges are inclusive (min, max) tuples; either bound may be None.
+        """
+        conditions, values = [], []
+        for column, value in (("kind", kind), ("serial_number", serial_number),
+                              ("integration_time_us", integration_time_us), ("file_format", file_format)):
+            if value is not None:
+                conditions.append("%s = ?" % column)
+                values.append(value)
+        for column, bounds in (("aoi_deg", aoi_range), ("filter_temperature_c", temperature_range)):
+            if bounds is not None:
+                if bounds[0] is not None:
+                    conditions.append("%s >= ?" % column)
+                    values.append(bounds[0])
+                if bounds[1] is not None:
+                    conditions.append("%s <= ?" % column)
+                    values.append(bounds[1])
+        sql = "SELECT %s FROM captures" % ", ".join(FIELDS)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY integration_time_us, aoi_deg, filter_temperature_c, path"
+        with self._lock:
+            rows = self.connection.execute(sql, values).fetchall()
+        return [Capture(*row) for row in rows]
+
+    def paths(self, **conditions) -> list[str]:
+        """Absolute paths of the captures matching query(**conditions)."""
+        return [self.absolute_path(capture) for capture in self.query(**conditions)]
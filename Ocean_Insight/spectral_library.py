@@ -0,0 +1,171 @@
+
+import os, glob, json, hashlib
+import numpy as np
+
+# Cached, memory-mapped access to the Spectral_Files CSV corpus
+#
+# Every CSV written by writeSpectraToCSV ('Wavelength,Spectrum_1,...', one row per pixel) is
+# parsed once and saved as a (1 + n_spectra, n_pixels) float64 .npy sidecar in a cache
+# directory, next to a small .json stamp holding the CSV size, mtime and SHA-1. Later loads
+# memory-map the sidecar instead of parsing text. A sidecar is rebuilt when the CSV size
+# changes, or when its mtime changes and the content hash no longer matches.
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Spectral_Files')
+CACHE_DIR_NAME = '.npy_cache'
+
+
+def file_sha1(path: str) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def parse_spectra_csv(path: str):
+    """Parses a writeSpectraToCSV file into (columns, (1 + n_spectra, n_pixels) array)."""
+    with open(path) as f:
+        columns = f.readline().strip().split(',')
+        table = np.loadtxt(f, delimiter=',', dtype=np.float64, ndmin=2)
+    return columns, np.ascontiguousarray(table.T)
+
+
+class SpectralFile:
+    """
+    One CSV of the corpus. data is a read-only (1 + n_spectra, n_pixels) memory map;
+    wavelengths and spectra are zero-copy views of it, spectra being (n_spectra, n_pixels)
+    like every other frame stack in this package (so spectra.T is the CSV's column layout).
+    """
+
+    def __init__(self, path: str, columns: list, data: np.ndarray):
+        self.path = path
+        self.columns = columns
+        self.data = data
+        self.wavelengths = data[0]
+        self.spectra = data[1:]
+
+    def __len__(self) -> int:
+        return len(self.spectra)
+
+    def median(self) -> np.ndarray:
+        """Per-pixel median over the spectra, the same as df.iloc[:, 1:].median(axis=1)."""
+        return np.median(self.spectra, axis=0)
+
+    def mean(self) -> np.ndarray:
+        return self.spectra.mean(axis=0)
+
+    def __repr__(self):
+        return "SpectralFile(%r, %d spectra x %d pixels)" % (self.path, len(self.spectra), self.data.shape[1])
+
+
+class SpectralLibrary:
+    """
+    Reader for the Spectral_Files tree (or any directory of writeSpectraToCSV files).
+
+    Usage:
+        library = SpectralLibrary()
+        dark = library.load('Darks/Dark_30000.csv').median()
+        for f in library.load_many('AOI_Spectra/Filter_Throughput_*.csv'):
+            ...
+    """
+
+    def __init__(self, root: str = DEFAULT_ROOT, cache_dir: str = None):
+        self.root = os.path.abspath(root)
+        self.cache_dir = os.path.abspath(cache_dir) if cache_dir is not None else os.path.join(self.root, CACHE_DIR_NAME)
+
+    def resolve(self, path: str) -> str:
+        """Absolute path of a file given relative to the library root (or already absolute)."""
+        return path if os.path.isabs(path) else os.path.join(self.root, path)
+
+    def sidecar_path(self, path: str) -> str:
+        """Where the .npy sidecar of a CSV lives: mirrored under cache_dir for files inside the root,
+        in a .npy_cache directory next to the file otherwise."""
+        path = os.path.abspath(self.resolve(path))
+        relative = os.path.relpath(path, self.root)
+        if relative.startswith(os.pardir):
+            return os.path.join(os.path.dirname(path), CACHE_DIR_NAME, os.path.basename(path) + '.npy')
+        return os.path.join(self.cache_dir, relative + '.npy')
+
+    def glob(self, pattern: str) -> list[str]:
+        """CSV paths matching a pattern relative to the root (e.g. 'Darks/*.csv'), sorted."""
+        return sorted(glob.glob(self.resolve(pattern), recursive=True))
+
+    def is_fresh(self, path: str) -> bool:
+        """True if the sidecar of path exists and still matches the CSV."""
+        path = self.resolve(path)
+        stamp = self._read_stamp(self.sidecar_path(path))
+        return stamp is not None and self._check_stamp(path, stamp)
+
+    def load(self, path: str) -> SpectralFile:
+        """Loads a CSV through its sidecar, converting it first if the sidecar is missing or stale."""
+        path = self.resolve(path)
+        sidecar = self.sidecar_path(path)
+        stamp = self._read_stamp(sidecar)
+        if stamp is None or not self._check_stamp(path, stamp) or not os.path.exists(sidecar):
+            stamp = self.convert(path)
+        return SpectralFile(path, stamp["columns"], np.load(sidecar, mmap_mode='r'))
+
+    def load_many(self, pattern) -> list[SpectralFile]:
+        """Loads every file matching a glob pattern, or every path of a list."""
+        paths = self.glob(pattern) if isinstance(pattern, str) else [self.resolve(p) for p in pattern]
+        return [self.load(p) for p in paths]
+
+    def median_stack(self, paths):
+        """Wavelength grid and (n_files, n_pixels) stack of the median spectrum of every file (glob
+        pattern or list of paths). All files must share one wavelength grid."""
+        files = self.load_many(paths)
+        if not files:
+            raise ValueError("No spectra to load.")
+        wavelengths = np.asarray(files[0].wavelengths)
+        for f in files[1:]:
+            if not np.array_equal(f.wavelengths, wavelengths):
+                raise ValueError("%s was taken on a different wavelength grid than %s." % (f.path, files[0].path))
+        return wavelengths, np.stack([f.median() for f in files])
+
+    def convert(self, path: str) -> dict:
+        """Parses the CSV and (re)writes its sidecar and stamp. Returns the stamp."""
+        path = self.resolve(path)
+        sidecar = self.sidecar_path(path)
+        os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+        stat = os.stat(path)
+        columns, data = parse_spectra_csv(path)
+
+        temp_path = sidecar + '.tmp.npy'
+        np.save(temp_path, data)
+        os.replace(temp_path, sidecar)
+        stamp = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": file_sha1(path), "columns": columns}
+        self._write_stamp(sidecar, stamp)
+        return stamp
+
+    def clear_cache(self) -> None:
+        """Deletes every sidecar under cache_dir."""
+        for sidecar in glob.glob(os.path.join(self.cache_dir, '**', '*.npy*'), recursive=True):
+            os.remove(sidecar)
+
+    def _check_stamp(self, path: str, stamp: dict) -> bool:
+        stat = os.stat(path)
+        if stat.st_size != stamp["size"]:
+            return False
+        if stat.st_mtime_ns == stamp["mtime_ns"]:
+            return True
+        # touched or copied: only the content decides, and a match refreshes the stamp
+        if file_sha1(path) != stamp["sha1"]:
+            return False
+        stamp["mtime_ns"] = stat.st_mtime_ns
+        self._write_stamp(self.sidecar_path(path), stamp)
+        return True
+
+    @staticmethod
+    def _read_stamp(sidecar: str):
+        try:
+            with open(sidecar + '.json') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_stamp(sidecar: str, stamp: dict) -> None:
+        temp_path = sidecar + '.json.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(stamp, f)
+        os.replace(temp_path, sidecar + '.json')
@@ -0,0 +1,133 @@
+
+import functools
+import numpy as np
+
+# Vectorized corrections that work on a single spectrum or on a whole (n_frames, n_pixels) stack
+
+CHUNK_BYTES = 1 << 18 # rows are processed in blocks of about this size so the temporaries stay in cache
+
+
+def trim_coeffs(coeffs, dtype=np.float64) -> np.ndarray:
+    """Returns the coefficients as an array without trailing zeros, which add nothing to the polynomial."""
+    coeffs = np.asarray(coeffs, dtype=dtype).ravel()
+    nonzero = np.flatnonzero(coeffs)
+    return coeffs[:nonzero[-1] + 1] if len(nonzero) else coeffs[:0]
+
+
+def nonlinearity_correct(raw, nonlinearity_coeffs, out: np.ndarray = None, dtype=np.float64, chunkRows: int = None) -> np.ndarray:
+    """
+    Nonlinearity correction for one spectrum or a (n_frames, n_pixels) stack of spectra:
+        corrected = raw + c[0]*raw + c[1]*raw**2 + c[2]*raw**3 + ...
+    evaluated in Horner form as raw * (1 + c[0] + raw*(c[1] + raw*(c[2] + ...))), so every
+    coefficient costs one multiply-add and no powers are formed.
+
+    raw      : 1-D spectrum or 2-D (n_frames, n_pixels) array, any numeric dtype.
+    out      : optional preallocated output with the same shape as raw. It may be raw itself
+               for an in-place correction. Its dtype sets the working precision.
+    dtype    : working precision when out is not given, np.float64 (default) or np.float32.
+    chunkRows: rows processed per block; by default sized from CHUNK_BYTES.
+    Returns out.
+    """
+    raw = np.asarray(raw)
+    if raw.ndim not in (1, 2):
+        raise ValueError("raw must be a spectrum or a (n_frames, n_pixels) array")
+    if out is None:
+        out = np.empty(raw.shape, dtype=dtype)
+    elif out.shape != raw.shape:
+        raise ValueError("out has shape %s, expected %s" % (out.shape, raw.shape))
+    dtype = out.dtype
+
+    raw2 = raw[np.newaxis] if raw.ndim == 1 else raw
+    out2 = out[np.newaxis] if out.ndim == 1 else out
+    n_frames, n_pixels = raw2.shape
+    coeffs = trim_coeffs(nonlinearity_coeffs, dtype)
+
+    if len(coeffs) == 0:
+        out2[...] = raw2
+        return out
+    if chunkRows is None:
+        chunkRows = max(1, CHUNK_BYTES // max(1, n_pixels * dtype.itemsize))
+    chunkRows = min(chunkRows, n_frames)
+
+    x_buffer = np.empty((chunkRows, n_pixels), dtype=dtype)
+    acc_buffer = np.empty((chunkRows, n_pixels), dtype=dtype)
+    for start in range(0, n_frames, chunkRows):
+        stop = min(start + chunkRows, n_frames)
+        x = x_buffer[:stop - start]
+        acc = acc_buffer[:stop - start]
+        x[...] = raw2[start:stop] # copy first, so out may alias raw
+
+        acc.fill(coeffs[-1])
+        for c in coeffs[-2::-1]:
+            np.multiply(acc, x, out=acc)
+            acc += c
+        np.multiply(acc, x, out=acc)
+        np.add(x, acc, out=out2[start:stop])
+    return out
+
+
+class NonlinearityLUT:
+    """
+    Lookup table of the nonlinearity corrected value for every integer count from 0 to maxCount
+    (get_max_intensity() of the detector, e.g. 65535), so a raw frame is corrected with a single
+    gather table[raw] instead of the polynomial. The table is 8*(maxCount+1) bytes (512 KB for
+    16-bit counts) and is built once per calibration; use NonlinearityLUT.for_calibration to
+    share it.
+
+    Values that are not integer counts in range (averaged or boxcar smoothed spectra, negative
+    dark-subtracted values, saturation above maxCount) fall back to the polynomial, so the result
+    always equals nonlinearity_correct. See benchmarks/nonlinearity_lut.py for when it is faster.
+    """
+
+    def __init__(self, nonlinearity_coeffs, maxCount: int, dtype=np.float64):
+        self.nonlinearity_coeffs = tuple(float(c) for c in nonlinearity_coeffs)
+        self.max_count = int(maxCount)
+        self.table = nonlinearity_correct(np.arange(self.max_count + 1, dtype=np.float64), self.nonlinearity_coeffs, dtype=dtype)
+        self.table.setflags(write=False)
+
+    @staticmethod
+    def for_calibration(nonlinearity_coeffs, maxCount: int, dtype=np.float64) -> "NonlinearityLUT":
+        """Returns the cached table for these coefficients, building it on first use."""
+        return _cached_lut(tuple(float(c) for c in nonlinearity_coeffs), int(maxCount), np.dtype(dtype))
+
+    def correct(self, raw, out: np.ndarray = None) -> np.ndarray:
+        """
+        Corrects one spectrum or a (n_frames, n_pixels) stack, like nonlinearity_correct.
+        Integer arrays (e.g. uint16) skip the integrality check, float arrays of whole counts
+        (what get_formatted_spectrum returns) are checked element by element.
+        """
+        raw = np.asarray(raw)
+        if out is None:
+            out = np.empty(raw.shape, dtype=self.table.dtype)
+        elif out.shape != raw.shape:
+            raise ValueError("out has shape %s, expected %s" % (out.shape, raw.shape))
+
+        if raw.dtype.kind in "ui":
+            if raw.size == 0 or (raw.min() >= 0 and raw.max() <= self.max_count):
+                return self._gather(raw, out)
+            index = raw.astype(np.intp)
+            valid = (index >= 0) & (index <= self.max_count)
+        else:
+            with np.errstate(invalid="ignore"): # NaN/inf are caught by the comparison below
+                index = raw.astype(np.intp)
+                valid = (index == raw) & (raw >= 0) & (raw <= self.max_count)
+            if valid.all():
+                return self._gather(index, out)
+
+        out[valid] = self.table[index[valid]]
+        invalid = ~valid
+        out[invalid] = nonlinearity_correct(raw[invalid], self.nonlinearity_coeffs, dtype=self.table.dtype)
+        return out
+
+    def _gather(self, index: np.ndarray, out: np.ndarray) -> np.ndarray:
+        if out.dtype == self.table.dtype and out.flags.c_contiguous:
+            # indices are already range checked; mode="clip" lets take write straight into out
+            np.take(self.table, index, out=out, mode="clip")
+        else:
+            out[...] = self.table[index]
+        return out
+
+
+@functools.lru_cache(maxsize=8)
+def _cached_lut(nonlinearity_coeffs: tuple, maxCount: int, dtype: np.dtype) -> NonlinearityLUT:
+    return NonlinearityLUT(nonlinearity_coeffs, maxCount, dtype)
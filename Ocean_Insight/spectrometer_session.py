@@ -0,0 +1,100 @@
+
+from oceandirect.OceanDirectAPI import OceanDirectAPI, OceanDirectError, Spectrometer
+from Read_Spectrum import acquire_spectra, collect_spectra, capture_fields, detector_temperature
+from calibration_cache import Calibration, CalibrationCache
+
+# Keeps spectrometers open across many captures so discovery and open happen once per session
+
+
+class SpectrometerSession:
+    """
+    Discovers the USB spectrometers once, opens them and keeps them open until the session
+    is closed. Serial number -> device id is cached, and the calibration coefficients come from
+    a CalibrationCache (which can be shared and kept on disk), so back to back captures
+    (e.g. an exposure sweep) only pay for the exposures.
+
+    Usage:
+        with SpectrometerSession() as session:
+            for t in exposure_times:
+                session.read_spectra(serial, t, 5, f'Spectral_Intensity_{t}.csv')
+    """
+
+    def __init__(self, odapi: OceanDirectAPI = None, shutdownOnClose: bool = False,
+                 calibrationCache: CalibrationCache = None):
+        self.odapi = odapi if odapi is not None else OceanDirectAPI()
+        self.shutdown_on_close = shutdownOnClose
+        self.calibration_cache = calibrationCache if calibrationCache is not None else CalibrationCache()
+        self.devices = {}    # serial number -> open Spectrometer
+        self.device_ids = {} # serial number -> device id
+        self.is_open = False
+
+    def open(self) -> "SpectrometerSession":
+        """Finds every USB device, opens it and records its serial number."""
+        if self.is_open:
+            return self
+        device_count = self.odapi.find_usb_devices()
+        if device_count > 0:
+            for devId in self.odapi.get_device_ids():
+                device = self.odapi.open_device(devId)
+                serialNumber = device.get_serial_number()
+                self.devices[serialNumber] = device
+                self.device_ids[serialNumber] = devId
+        self.is_open = True
+        return self
+
+    def close(self) -> None:
+        """Closes every device opened by the session."""
+        for serialNumber, devId in self.device_ids.items():
+            try:
+                self.odapi.close_device(devId)
+            except OceanDirectError as err:
+                [errorCode, errorMsg] = err.get_error_details()
+                print("SpectrometerSession.close(): %s / %d = %s" % (serialNumber, errorCode, errorMsg))
+        self.devices.clear()
+        self.device_ids.clear()
+        self.is_open = False
+        if self.shutdown_on_close:
+            self.odapi.shutdown()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def serial_numbers(self) -> list[str]:
+        return list(self.devices)
+
+    def device(self, serialNumber: str = None) -> Spectrometer:
+        """Returns the open device with this serial number, or the first device if None."""
+        if not self.is_open:
+            self.open()
+        if serialNumber is None:
+            if not self.devices:
+                raise ValueError("No spectrometer found.")
+            return next(iter(self.devices.values()))
+        if serialNumber not in self.devices:
+            raise ValueError("No spectrometer with serial number %s in this session." % serialNumber)
+        return self.devices[serialNumber]
+
+    def calibration(self, serialNumber: str = None) -> Calibration:
+        """Returns the device calibration, read from the device only on a calibration cache miss."""
+        return self.calibration_cache.get(self.device(serialNumber))
+
+    def iter_spectra(self, serialNumber: str, integrationTimeUs: int, spectraToRead: int = None,
+                     cadenceUs: int = None, triggerMode: int = None, acquisitionDelayUs: int = None):
+        """Same frames as Read_Spectrum.iter_spectra, on the already open device."""
+        device = self.device(serialNumber)
+        calibration = self.calibration(serialNumber)
+        return acquire_spectra(device, calibration.wavelength_coeffs, calibration.nonlinearity_coeffs,
+                               integrationTimeUs, spectraToRead, cadenceUs, triggerMode, acquisitionDelayUs)
+
+    def read_spectra(self, serialNumber: str, integrationTimeUs: int, spectraToRead: int, csv_file_name: str,
+                     cadenceUs: int = None, triggerMode: int = None, acquisitionDelayUs: int = None,
+                     kind: str = None, aoi: float = None, temperature: float = None):
+        """Same as Read_Spectrum.read_spectra without rediscovering and reopening the device."""
+        fields = capture_fields(serialNumber, integrationTimeUs, kind, aoi, temperature,
+                                detector_temperature(self.device(serialNumber)))
+        frames = self.iter_spectra(serialNumber, integrationTimeUs, spectraToRead, cadenceUs, triggerMode, acquisitionDelayUs)
+        return collect_spectra(frames, csv_file_name, fields)
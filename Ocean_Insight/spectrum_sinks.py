@@ -0,0 +1,99 @@
+
+import os, csv
+import numpy as np
+
+# Sinks that persist spectra frame by frame as they arrive from Read_Spectrum.iter_spectra
+#
+# A sink has write(timestamp, wavelengths, spectrum) and close(), and is a context manager.
+# Sinks open lazily on the first frame, so the wavelength grid does not have to be known up front.
+
+class SpectrumSink:
+    """Base class for incremental spectrum writers."""
+
+    def write(self, timestamp: float, wavelengths, spectrum) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CSVFrameSink(SpectrumSink):
+    """
+    Appends one CSV row per frame: Timestamp, then one column per wavelength.
+    The header row is 'Timestamp,<wavelength_1>,<wavelength_2>,...'. Rows are flushed to disk
+    every flush_every frames (and on close), so a crash loses at most that many frames; pass
+    flush_every=1 to fsync every frame when that matters more than throughput.
+    Use writeSpectraToCSV for the one-column-per-spectrum layout used by the notebooks.
+    """
+
+    def __init__(self, output_file_name: str, flush_every: int = 100, append: bool = False):
+        self.output_file = os.path.join(os.getcwd(), output_file_name)
+        self.flush_every = flush_every
+        self.append = append
+        self.frame_count = 0
+        self._file = None
+        self._writer = None
+
+    def _open(self, wavelengths) -> None:
+        resume = self.append and os.path.exists(self.output_file) and os.path.getsize(self.output_file) > 0
+        self._file = open(self.output_file, 'a' if resume else 'w', newline='')
+        self._writer = csv.writer(self._file)
+        if not resume:
+            self._writer.writerow(['Timestamp'] + list(np.asarray(wavelengths).tolist()))
+
+    def write(self, timestamp: float, wavelengths, spectrum) -> None:
+        if self._file is None:
+            self._open(wavelengths)
+        self._writer.writerow([timestamp] + np.asarray(spectrum).tolist())
+        self.frame_count += 1
+        if self.frame_count % self.flush_every == 0:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+
+class CallbackSink(SpectrumSink):
+    """Hands every frame to callback(timestamp, wavelengths, spectrum), e.g. for live plotting."""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def write(self, timestamp: float, wavelengths, spectrum) -> None:
+        self.callback(timestamp, wavelengths, spectrum)
+
+
+def write_frames(frames, *sinks) -> int:
+    """
+    Drains an iterator of (timestamp, wavelengths, spectrum) frames, such as iter_spectra(...),
+    into every sink as the frames arrive. The sinks are closed at the end, also on error.
+    Returns the number of frames written.
+    """
+    count = 0
+    try:
+        for timestamp, wavelengths, spectrum in frames:
+            for sink in sinks:
+                sink.write(timestamp, wavelengths, spectrum)
+            count += 1
+    finally:
+        for sink in sinks:
+            sink.close()
+    return count
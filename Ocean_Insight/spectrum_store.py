@@ -0,0 +1,177 @@
+
+import os, json
+import numpy as np
+from spectrum_sinks import SpectrumSink
+
+# Appendable binary store for spectral runs, read back lazily through memory maps
+#
+# A store is a directory:
+#     wavelengths.npy    the wavelength grid, n_pixels float64
+#     intensity.bin      raw C-order (n_frames, n_pixels) array, dtype given in metadata.json
+#     timestamps.bin     raw n_frames float64 timestamps (seconds)
+#     metadata.json      dtype, pixel count, frame count and acquisition metadata
+#                        (serial number, integration time, coefficients, temperature, ...)
+# Frames are appended to the raw files as they arrive, so a crashed run keeps every frame
+# written before the crash; the reader trusts the file sizes rather than the saved frame count.
+
+WAVELENGTHS_FILE = "wavelengths.npy"
+INTENSITY_FILE = "intensity.bin"
+TIMESTAMPS_FILE = "timestamps.bin"
+METADATA_FILE = "metadata.json"
+
+
+def _to_json(value):
+    """Makes numpy values (and WavelengthGrid coefficients etc.) JSON serialisable."""
+    if isinstance(value, dict):
+        return {k: _to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class SpectrumStoreWriter(SpectrumSink):
+    """
+    Writes a spectrum store frame by frame or in blocks. Also a spectrum sink, so it can be
+    fed straight from iter_spectra:
+        write_frames(iter_spectra(serial, 30000, 10000), SpectrumStoreWriter('run_30ms', metadata={...}))
+    The wavelength grid is taken from the first frame unless given up front. With append=True
+    an existing store is extended instead of replaced.
+    """
+
+    def __init__(self, path: str, wavelengths=None, metadata: dict = None, dtype=np.float64,
+                 append: bool = False, flush_every: int = 100):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.metadata = dict(metadata or {})
+        self.append = append
+        self.flush_every = flush_every
+        self.pixel_count = None
+        self.frame_count = 0
+        self._intensity = None
+        self._timestamps = None
+        if wavelengths is not None:
+            self._open(wavelengths)
+
+    def _open(self, wavelengths) -> None:
+        wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        os.makedirs(self.path, exist_ok=True)
+        metadata_file = os.path.join(self.path, METADATA_FILE)
+        mode = 'wb'
+        if self.append and os.path.exists(metadata_file):
+            existing = SpectrumStore(self.path)
+            if existing.pixel_count != len(wavelengths) or existing.dtype != self.dtype:
+                raise ValueError("Cannot append %d pixel %s frames to %s, which holds %d pixel %s frames." %
+                                 (len(wavelengths), self.dtype, self.path, existing.pixel_count, existing.dtype))
+            self.frame_count = len(existing)
+            self.metadata = {**existing.metadata, **self.metadata}
+            # drop a partially written trailing frame left by a crash before appending
+            os.truncate(os.path.join(self.path, INTENSITY_FILE), self.frame_count * existing.pixel_count * self.dtype.itemsize)
+            os.truncate(os.path.join(self.path, TIMESTAMPS_FILE), self.frame_count * 8)
+            mode = 'ab'
+        else:
+            np.save(os.path.join(self.path, WAVELENGTHS_FILE), wavelengths)
+        self.pixel_count = len(wavelengths)
+        self._intensity = open(os.path.join(self.path, INTENSITY_FILE), mode)
+        self._timestamps = open(os.path.join(self.path, TIMESTAMPS_FILE), mode)
+        self._write_metadata()
+
+    def _write_metadata(self) -> None:
+        metadata = _to_json(self.metadata)
+        metadata.update({"dtype": self.dtype.str, "pixel_count": self.pixel_count, "frame_count": self.frame_count})
+        temp_path = os.path.join(self.path, METADATA_FILE + ".tmp")
+        with open(temp_path, 'w') as f:
+            json.dump(metadata, f, indent=1)
+        os.replace(temp_path, os.path.join(self.path, METADATA_FILE))
+
+    def update_metadata(self, **metadata) -> None:
+        """Adds acquisition metadata; it is saved on the next flush or close."""
+        self.metadata.update(metadata)
+
+    def write(self, timestamp: float, wavelengths, spectrum) -> None:
+        """Appends one frame (sink interface)."""
+        if self._intensity is None:
+            self._open(wavelengths)
+        self.append_frames(np.asarray(spectrum)[np.newaxis], [timestamp])
+
+    def append_frames(self, spectra, timestamps) -> None:
+        """Appends a (n_frames, n_pixels) block and its n_frames timestamps."""
+        if self._intensity is None:
+            raise ValueError("The wavelength grid is not known yet; pass wavelengths to the constructor.")
+        spectra = np.ascontiguousarray(spectra, dtype=self.dtype)
+        timestamps = np.ascontiguousarray(timestamps, dtype=np.float64)
+        if spectra.ndim != 2 or spectra.shape[1] != self.pixel_count or len(timestamps) != len(spectra):
+            raise ValueError("Expected (n, %d) spectra with n timestamps, got %s and %d timestamps." %
+                             (self.pixel_count, spectra.shape, len(timestamps)))
+        previous = self.frame_count
+        self._intensity.write(spectra.data)
+        self._timestamps.write(timestamps.data)
+        self.frame_count += len(spectra)
+        if self.frame_count // self.flush_every != previous // self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._intensity is not None:
+            for f in (self._intensity, self._timestamps):
+                f.flush()
+                os.fsync(f.fileno())
+            self._write_metadata()
+
+    def close(self) -> None:
+        if self._intensity is not None:
+            self.flush()
+            self._intensity.close()
+            self._timestamps.close()
+            self._intensity = None
+            self._timestamps = None
+
+
+class SpectrumStore:
+    """
+    Read side of a spectrum store. Nothing is loaded up front: intensity and timestamps are
+    read-only memory maps, so store[1000:2000], store.intensity[:, pixel] or a median over a
+    slice only touch the pages they need.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, METADATA_FILE)) as f:
+            self.metadata = json.load(f)
+        self.dtype = np.dtype(self.metadata["dtype"])
+        self.pixel_count = self.metadata["pixel_count"]
+        self.wavelengths = np.load(os.path.join(path, WAVELENGTHS_FILE), mmap_mode='r')
+
+        row_bytes = self.pixel_count * self.dtype.itemsize
+        intensity_file = os.path.join(path, INTENSITY_FILE)
+        timestamps_file = os.path.join(path, TIMESTAMPS_FILE)
+        self.frame_count = min(os.path.getsize(intensity_file) // row_bytes, os.path.getsize(timestamps_file) // 8)
+        if self.frame_count == 0:
+            self.intensity = np.empty((0, self.pixel_count), dtype=self.dtype)
+            self.timestamps = np.empty(0, dtype=np.float64)
+        else:
+            self.intensity = np.memmap(intensity_file, dtype=self.dtype, mode='r', shape=(self.frame_count, self.pixel_count))
+            self.timestamps = np.memmap(timestamps_file, dtype=np.float64, mode='r', shape=(self.frame_count,))
+
+    def __len__(self) -> int:
+        return self.frame_count
+
+    def __getitem__(self, index):
+        return self.intensity[index]
+
+    def __repr__(self):
+        return "SpectrumStore(%r, %d frames x %d pixels)" % (self.path, self.frame_count, self.pixel_count)
+
+
+def write_store(path: str, wavelengths, spectra, timestamps=None, metadata: dict = None, dtype=np.float64) -> None:
+    """Writes a whole (n_frames, n_pixels) block to a new store in one go."""
+    spectra = np.asarray(spectra)
+    if timestamps is None:
+        timestamps = np.zeros(len(spectra))
+    writer = SpectrumStoreWriter(path, wavelengths, metadata, dtype)
+    try:
+        writer.append_frames(spectra, timestamps)
+    finally:
+        writer.close()
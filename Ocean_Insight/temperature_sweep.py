@@ -0,0 +1,127 @@
+
+import os
+import numpy as np
+from collections import namedtuple
+from spectral_library import SpectralLibrary
+from spectral_catalog import parse_legacy_name
+from peak_fitting import PeakFits, fit_peaks
+
+# Filter throughput vs filter temperature (Filter_Throughput_<T>C.csv runs)
+#
+# Every temperature point is loaded into one (n_temperatures, n_pixels) stack, dark subtracted
+# and divided by the base throughput taken in the same session, then all peaks are fitted in
+# one batch and the peak wavelength is fitted linearly in temperature (dlambda/dT).
+
+# Base throughput of each session of the 8/7/24 run, as used in Spectrometer_testing.ipynb:
+# the afternoon points (23-29 C) against the 3:50PM baseline, the morning ones against the 10:22AM one.
+DEFAULT_BASELINES = [((23, 29), 'Base_Throughput_350.csv'), ((31, 45), 'Base_Throughput.csv')]
+
+TuningFit = namedtuple("TuningFit", ["slope", "intercept", "slope_uncertainty", "intercept_uncertainty",
+                                     "covariance", "residuals"])
+TuningFit.__doc__ = "Linear fit of peak wavelength (nm) vs temperature (C); slope is dlambda/dT in nm/C."
+TemperatureAnalysis = namedtuple("TemperatureAnalysis", ["temperatures", "peaks", "peak_transmission", "tuning"])
+
+
+def fit_tuning(temperatures, peak_wavelengths, uncertainties=None) -> TuningFit:
+    """
+    Straight line fit of peak wavelength vs temperature, like the notebook's np.polyfit(..., 1, cov=True).
+    With uncertainties the fit is weighted by them and the covariance is taken at face value.
+    """
+    temperatures = np.asarray(temperatures, dtype=np.float64)
+    peak_wavelengths = np.asarray(peak_wavelengths, dtype=np.float64)
+    keep = np.isfinite(peak_wavelengths)
+    weights = None
+    if uncertainties is not None:
+        uncertainties = np.asarray(uncertainties, dtype=np.float64)
+        keep &= np.isfinite(uncertainties) & (uncertainties > 0)
+        weights = 1 / uncertainties[keep]
+    if keep.sum() < 4:
+        raise ValueError("At least 4 usable temperatures are needed for the slope and its uncertainty, got %d." % keep.sum())
+    coefficients, covariance = np.polyfit(temperatures[keep], peak_wavelengths[keep], 1, w=weights,
+                                          cov="unscaled" if weights is not None else True)
+    residuals = np.full(len(temperatures), np.nan)
+    residuals[keep] = peak_wavelengths[keep] - np.polyval(coefficients, temperatures[keep])
+    uncertainty = np.sqrt(np.diag(covariance))
+    return TuningFit(coefficients[0], coefficients[1], uncertainty[0], uncertainty[1], covariance, residuals)
+
+
+def matching_baseline(temperature: float, baselines) -> str:
+    """Base throughput file for a temperature: baselines is one path or a list of ((min, max), path)."""
+    if isinstance(baselines, str):
+        return baselines
+    for (low, high), path in baselines:
+        if low <= temperature <= high:
+            return path
+    return None
+
+
+class TemperatureSweep:
+    """
+    One filter's temperature sweep, dark subtracted and normalized by the matching base throughput.
+
+    Usage:
+        sweep = TemperatureSweep.from_directory()
+        result = sweep.analyze()
+        result.tuning.slope, result.peaks.centroid, result.peaks.fwhm, result.peak_transmission
+    """
+
+    def __init__(self, temperatures, wavelengths, spectra, baselines, dark=0.0):
+        order = np.argsort(temperatures)
+        self.temperatures = np.asarray(temperatures, dtype=np.float64)[order]
+        self.wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        self.spectra = np.asarray(spectra, dtype=np.float64)[order]
+        baselines = np.asarray(baselines, dtype=np.float64)
+        self.baselines = baselines[order] if baselines.ndim == 2 else baselines # one per point or shared
+        self.dark = np.asarray(dark, dtype=np.float64)
+
+    @staticmethod
+    def from_directory(directory: str = '.', baselines=DEFAULT_BASELINES, darkFile: str = 'Darks/Dark_30000.csv',
+                       library: SpectralLibrary = None) -> "TemperatureSweep":
+        """
+        Loads every Filter_Throughput_<T>C.csv of directory (relative to the library root or
+        absolute) that has a matching base throughput (see matching_baseline); baseline paths are
+        relative to directory. Points without one are skipped, as in the notebook.
+        """
+        library = library if library is not None else SpectralLibrary()
+        directory = library.resolve(directory)
+        temperatures, paths, base_paths = [], [], []
+        for path in library.glob(os.path.join(directory, 'Filter_Throughput_*C.csv')):
+            fields = parse_legacy_name(path)
+            if fields.get("kind") != "temperature":
+                continue
+            base = matching_baseline(fields["filter_temperature_c"], baselines)
+            if base is None:
+                continue
+            temperatures.append(fields["filter_temperature_c"])
+            paths.append(path)
+            base_paths.append(os.path.join(directory, base))
+        if not paths:
+            raise ValueError("No Filter_Throughput_<T>C.csv files with a base throughput in %s." % directory)
+
+        unique_bases = sorted(set(base_paths))
+        extra = unique_bases + ([darkFile] if darkFile is not None else [])
+        wavelengths, stack = library.median_stack(paths + extra)
+        base_stack = stack[len(paths):len(paths) + len(unique_bases)]
+        base_rows = base_stack[[unique_bases.index(p) for p in base_paths]]
+        dark = stack[-1] if darkFile is not None else 0.0
+        return TemperatureSweep(temperatures, wavelengths, stack[:len(paths)], base_rows, dark)
+
+    @property
+    def normalized(self) -> np.ndarray:
+        """(n_temperatures, n_pixels) throughput: (spectra - dark) / (baseline - dark)."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (self.spectra - self.dark) / (self.baselines - self.dark)
+
+    def fit_peaks(self, halfWidth: int = 20, trim: int = 20) -> PeakFits:
+        return fit_peaks(self.wavelengths, np.nan_to_num(self.normalized, nan=0.0, posinf=0.0, neginf=0.0),
+                         halfWidth, trim)
+
+    def analyze(self, halfWidth: int = 20, trim: int = 20, weighted: bool = False) -> TemperatureAnalysis:
+        """
+        Fits every peak and dlambda/dT. The peak transmission is the fitted Gaussian amplitude of
+        the normalized curve. weighted=True weights the tuning fit by the centroid uncertainties;
+        the default is the notebook's unweighted fit.
+        """
+        peaks = self.fit_peaks(halfWidth, trim)
+        tuning = fit_tuning(self.temperatures, peaks.centroid, peaks.centroid_uncertainty if weighted else None)
+        return TemperatureAnalysis(self.temperatures, peaks, peaks.amplitude, tuning)
@@ -0,0 +1,7 @@
+
+import os, sys
+
+# The modules import each other as top-level modules (see Read_Spectrum.py), and the tests run
+# against od_simulator so they need no spectrometer or OceanDirect library.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OCEANDIRECT_BACKEND", "simulator")
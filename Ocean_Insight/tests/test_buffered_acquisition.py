@@ -0,0 +1,51 @@
+
+import threading
+import pytest
+from oceandirect.OceanDirectAPI import Spectrometer
+from oceandirect.od_simulator import SimulatedOceanDirect
+from buffered_acquisition import BufferedAcquisition
+
+
+def simulated_device(**options) -> Spectrometer:
+    library = SimulatedOceanDirect(pixelCount=256, realtime=False, noise=0.0, **options)
+    library.odapi_probe_devices()
+    device = Spectrometer(1, library)
+    device.open_device()
+    return device
+
+
+def consume(acquisition: BufferedAcquisition, count: int, timeout: float = 10.0):
+    """Runs acquisition.frames(count) on a thread, so a hung reader fails the test instead of blocking it."""
+    outcome = {}
+
+    def run():
+        try:
+            outcome["frames"] = sum(1 for _ in acquisition.frames(count))
+        except BaseException as err:
+            outcome["error"] = err
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "frames() did not return after the reader stopped"
+    return outcome
+
+
+def test_reads_frames():
+    with BufferedAcquisition(simulated_device(), integrationTimeUs=1000) as acquisition:
+        outcome = consume(acquisition, 100)
+    assert outcome == {"frames": 100}
+    assert acquisition.failure is None
+
+
+def test_callback_error_stops_reader_and_is_raised():
+    def failing_callback(spectra, timestamps):
+        raise RuntimeError("callback failed")
+
+    acquisition = BufferedAcquisition(simulated_device(), integrationTimeUs=1000)
+    acquisition.add_callback(failing_callback)
+    with acquisition:
+        outcome = consume(acquisition, 100000)
+    assert isinstance(outcome.get("error"), RuntimeError)
+    assert isinstance(acquisition.failure, RuntimeError)
+    assert not acquisition.running
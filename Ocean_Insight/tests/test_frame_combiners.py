@@ -0,0 +1,71 @@
+
+import numpy as np
+import pytest
+from oceandirect.OceanDirectAPI import Spectrometer
+from oceandirect.od_simulator import SimulatedOceanDirect
+from frame_combiners import RunningMeanVariance, P2Median
+
+
+def simulated_frames(count: int) -> np.ndarray:
+    library = SimulatedOceanDirect(pixelCount=128, realtime=False, seed=0)
+    library.odapi_probe_devices()
+    device = Spectrometer(1, library)
+    device.open_device()
+    device.set_integration_time(10000)
+    return np.stack([device.get_formatted_spectrum(as_numpy=True) for _ in range(count)])
+
+
+def test_running_mean_variance_matches_numpy():
+    frames = simulated_frames(300)
+    combiner = RunningMeanVariance()
+    for frame in frames[:10]:        # Welford, one frame at a time
+        combiner.update(frame)
+    combiner.update(frames[10:150])  # Chan merge of a batch into the running state
+    combiner.update(frames[150:150]) # empty batches are ignored
+    for frame in frames[150:160]:
+        combiner.update(frame)
+    combiner.update(frames[160:])
+    assert combiner.count == 300
+    np.testing.assert_allclose(combiner.mean, frames.mean(axis=0), rtol=1e-12)
+    np.testing.assert_allclose(combiner.variance(), frames.var(axis=0), rtol=1e-9)
+    np.testing.assert_allclose(combiner.std(ddof=1), frames.std(axis=0, ddof=1), rtol=1e-9)
+
+
+def test_running_mean_variance_starts_from_batch():
+    frames = simulated_frames(50)
+    combiner = RunningMeanVariance()
+    combiner.update(frames[:20])
+    for frame in frames[20:]:
+        combiner.update(frame)
+    np.testing.assert_allclose(combiner.mean, frames.mean(axis=0), rtol=1e-12)
+    np.testing.assert_allclose(combiner.variance(ddof=1), frames.var(axis=0, ddof=1), rtol=1e-9)
+
+
+def test_no_frames_raise_value_error():
+    with pytest.raises(ValueError):
+        RunningMeanVariance().mean
+    with pytest.raises(ValueError):
+        RunningMeanVariance().variance()
+    with pytest.raises(ValueError):
+        P2Median().median
+
+
+def test_p2_median_exact_for_first_frames():
+    frames = simulated_frames(5)
+    estimator = P2Median()
+    for count in range(1, 6):
+        estimator.update(frames[count - 1])
+        np.testing.assert_allclose(estimator.median, np.median(frames[:count], axis=0), rtol=1e-12)
+
+
+def test_p2_estimates_close_to_numpy():
+    frames = simulated_frames(1000)
+    noise = frames.std(axis=0)
+    for quantile in (0.5, 0.9):
+        estimator = P2Median(quantile)
+        estimator.update(frames[:500])
+        for frame in frames[500:]:
+            estimator.update(frame)
+        error = np.abs(estimator.median - np.quantile(frames, quantile, axis=0))
+        assert np.all(error < 0.25 * noise)
+        assert np.mean(error) < 0.05 * np.mean(noise)
@@ -0,0 +1,94 @@
+
+import numpy as np
+import pytest
+from oceandirect.OceanDirectAPI import Spectrometer
+from oceandirect.od_simulator import SimulatedOceanDirect
+from spectral_processing import nonlinearity_correct, NonlinearityLUT
+
+NONLINEARITY_COEFFS = [0.98, 1.2e-6, -3.0e-11, 4.0e-16, -2.0e-21, 1.0e-26, -5.0e-32, 1.0e-37]
+
+
+def simulated_frames(count: int, integrationTimeUs: int = 50000) -> np.ndarray:
+    library = SimulatedOceanDirect(pixelCount=256, realtime=False, seed=0)
+    library.odapi_probe_devices()
+    device = Spectrometer(1, library)
+    device.open_device()
+    device.set_integration_time(integrationTimeUs)
+    return np.stack([device.get_formatted_spectrum(as_numpy=True) for _ in range(count)])
+
+
+def baseline_correct(raw_intensity, nonlinearity_coeffs):
+    """Read_Spectrum.correct_nonlinearity as it was before the Horner kernel."""
+    raw_intensity = np.array(raw_intensity, dtype=float)
+    corrected_intensity = raw_intensity.copy()
+    for i, coeff in enumerate(nonlinearity_coeffs):
+        corrected_intensity += coeff * raw_intensity**(i + 1)
+    return corrected_intensity
+
+
+def test_matches_baseline_formula():
+    raw = simulated_frames(20)
+    expected = baseline_correct(raw, NONLINEARITY_COEFFS)
+    np.testing.assert_allclose(nonlinearity_correct(raw, NONLINEARITY_COEFFS), expected, rtol=1e-12)
+    np.testing.assert_allclose(nonlinearity_correct(raw[0], NONLINEARITY_COEFFS), expected[0], rtol=1e-12)
+    # small chunks take the same path as the default one
+    np.testing.assert_allclose(nonlinearity_correct(raw, NONLINEARITY_COEFFS, chunkRows=3), expected, rtol=1e-12)
+
+
+def test_in_place():
+    raw = simulated_frames(20)
+    expected = baseline_correct(raw, NONLINEARITY_COEFFS)
+    result = nonlinearity_correct(raw, NONLINEARITY_COEFFS, out=raw, chunkRows=7)
+    assert result is raw
+    np.testing.assert_allclose(raw, expected, rtol=1e-12)
+
+
+def test_float32():
+    raw = simulated_frames(20)
+    expected = baseline_correct(raw, NONLINEARITY_COEFFS)
+    result = nonlinearity_correct(raw, NONLINEARITY_COEFFS, dtype=np.float32)
+    assert result.dtype == np.float32
+    np.testing.assert_allclose(result, expected, rtol=1e-5)
+
+    raw32 = raw.astype(np.float32)
+    assert nonlinearity_correct(raw32, NONLINEARITY_COEFFS, out=raw32) is raw32
+    np.testing.assert_allclose(raw32, expected, rtol=1e-5)
+
+
+def test_zero_coefficients_copy_raw():
+    raw = simulated_frames(2)
+    np.testing.assert_array_equal(nonlinearity_correct(raw, [0.0] * 8), raw)
+
+
+def test_rejects_mismatched_out():
+    raw = simulated_frames(2)
+    with pytest.raises(ValueError):
+        nonlinearity_correct(raw, NONLINEARITY_COEFFS, out=np.empty(raw.shape[1]))
+
+
+def test_lut_matches_polynomial_for_whole_counts():
+    raw = np.round(simulated_frames(20))
+    lut = NonlinearityLUT(NONLINEARITY_COEFFS, 65535)
+    expected = nonlinearity_correct(raw, NONLINEARITY_COEFFS)
+    np.testing.assert_array_equal(lut.correct(raw), expected)
+    np.testing.assert_array_equal(lut.correct(raw.astype(np.uint16)), expected)
+    out = np.empty_like(raw)
+    assert lut.correct(raw, out=out) is out
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_lut_falls_back_to_polynomial():
+    raw = np.round(simulated_frames(4))
+    raw[0, :3] = [-5.0, 70000.0, 1234.5]  # dark subtracted, above maxCount, averaged
+    raw[1] += 0.25                         # a whole frame of non-integer values
+    lut = NonlinearityLUT(NONLINEARITY_COEFFS, 65535)
+    np.testing.assert_allclose(lut.correct(raw), nonlinearity_correct(raw, NONLINEARITY_COEFFS), rtol=1e-15)
+
+    counts = raw.astype(np.int32)
+    np.testing.assert_allclose(lut.correct(counts), nonlinearity_correct(counts, NONLINEARITY_COEFFS), rtol=1e-15)
+
+
+def test_lut_cache_is_shared():
+    lut = NonlinearityLUT.for_calibration(NONLINEARITY_COEFFS, 65535)
+    assert NonlinearityLUT.for_calibration(list(NONLINEARITY_COEFFS), 65535) is lut
+    assert not lut.table.flags.writeable
@@ -0,0 +1,71 @@
+
+import os
+import numpy as np
+import pytest
+from oceandirect.OceanDirectAPI import Spectrometer
+from oceandirect.od_simulator import SimulatedOceanDirect
+from Read_Spectrum import acquire_spectra
+from spectrum_store import SpectrumStore, SpectrumStoreWriter, write_store, INTENSITY_FILE, TIMESTAMPS_FILE
+
+
+def simulated_frames(count: int) -> list:
+    library = SimulatedOceanDirect(pixelCount=128, realtime=False, seed=0)
+    library.odapi_probe_devices()
+    device = Spectrometer(1, library)
+    device.open_device()
+    wavelength_coeffs = device.Advanced.get_wavelength_coeffs()
+    nonlinearity_coeffs = device.Advanced.get_nonlinearity_coeffs()
+    return [(timestamp, wavelengths, spectrum.copy()) for timestamp, wavelengths, spectrum in
+            acquire_spectra(device, wavelength_coeffs, nonlinearity_coeffs, 10000, count)]
+
+
+def test_round_trip(tmp_path):
+    frames = simulated_frames(5)
+    path = str(tmp_path / "run")
+    with SpectrumStoreWriter(path, metadata={"serial_number": "SIM00000"}) as writer:
+        for frame in frames:
+            writer.write(*frame)
+
+    store = SpectrumStore(path)
+    assert len(store) == 5
+    assert store.metadata["serial_number"] == "SIM00000"
+    assert store.metadata["frame_count"] == 5
+    np.testing.assert_array_equal(store.wavelengths, frames[0][1])
+    np.testing.assert_array_equal(store.intensity, [spectrum for _, _, spectrum in frames])
+    np.testing.assert_array_equal(store.timestamps, [timestamp for timestamp, _, _ in frames])
+
+
+def test_append_drops_partial_frame(tmp_path):
+    frames = simulated_frames(7)
+    spectra = np.array([spectrum for _, _, spectrum in frames])
+    timestamps = np.array([timestamp for timestamp, _, _ in frames])
+    path = str(tmp_path / "run")
+    write_store(path, frames[0][1], spectra[:4], timestamps[:4], metadata={"kind": "base"})
+
+    # a crash in the middle of the fifth frame leaves half a row behind
+    with open(os.path.join(path, INTENSITY_FILE), "ab") as f:
+        f.write(spectra[4, :50].tobytes())
+    with open(os.path.join(path, TIMESTAMPS_FILE), "ab") as f:
+        f.write(timestamps[4:5].tobytes())
+    assert len(SpectrumStore(path)) == 4
+
+    with SpectrumStoreWriter(path, frames[0][1], metadata={"aoi_deg": 10.0}, append=True) as writer:
+        assert writer.frame_count == 4
+        writer.append_frames(spectra[4:], timestamps[4:])
+
+    store = SpectrumStore(path)
+    assert len(store) == 7
+    assert os.path.getsize(os.path.join(path, INTENSITY_FILE)) == spectra.nbytes
+    np.testing.assert_array_equal(store.intensity, spectra)
+    np.testing.assert_array_equal(store.timestamps, timestamps)
+    assert store.metadata["kind"] == "base" and store.metadata["aoi_deg"] == 10.0
+
+
+def test_append_rejects_other_layout(tmp_path):
+    frames = simulated_frames(2)
+    path = str(tmp_path / "run")
+    write_store(path, frames[0][1], [spectrum for _, _, spectrum in frames])
+    with pytest.raises(ValueError):
+        SpectrumStoreWriter(path, frames[0][1], dtype=np.float32, append=True)
+    with pytest.raises(ValueError):
+        SpectrumStoreWriter(path, frames[0][1][:64], append=True)
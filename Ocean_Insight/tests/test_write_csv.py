@@ -0,0 +1,63 @@
+
+import os, csv
+import numpy as np
+import pytest
+from oceandirect.OceanDirectAPI import Spectrometer
+from oceandirect.od_simulator import SimulatedOceanDirect
+from Read_Spectrum import acquire_spectra, writeSpectraToCSV
+
+
+def simulated_frames(count: int) -> tuple:
+    library = SimulatedOceanDirect(pixelCount=200, realtime=False, seed=0)
+    library.odapi_probe_devices()
+    device = Spectrometer(1, library)
+    device.open_device()
+    frames = [(wavelengths, spectrum.copy()) for _, wavelengths, spectrum in
+              acquire_spectra(device, device.Advanced.get_wavelength_coeffs(), [0.98, 1.2e-6], 10000, count)]
+    return frames[0][0], [spectrum for _, spectrum in frames]
+
+
+def baseline_writer(wavelengths, spectra, output_file_name) -> None:
+    """writeSpectraToCSV as it was before the block formatting."""
+    output_file = os.path.join(os.getcwd(), output_file_name)
+    with open(output_file, 'w', newline='') as csvfile:
+        csv_writer = csv.writer(csvfile)
+        header = ['Wavelength'] + [f'Spectrum_{i+1}' for i in range(len(spectra))]
+        csv_writer.writerow(header)
+        for i in range(len(wavelengths)):
+            row = [wavelengths[i]] + [spectrum[i] for spectrum in spectra]
+            csv_writer.writerow(row)
+
+
+def assert_same_bytes(tmp_path, wavelengths, spectra, **options):
+    baseline_writer(wavelengths, spectra, str(tmp_path / "baseline.csv"))
+    writeSpectraToCSV(wavelengths, spectra, str(tmp_path / "new.csv"), **options)
+    assert (tmp_path / "new.csv").read_bytes() == (tmp_path / "baseline.csv").read_bytes()
+
+
+def test_float64_frames(tmp_path):
+    wavelengths, spectra = simulated_frames(3)
+    assert_same_bytes(tmp_path, wavelengths, spectra)
+    assert_same_bytes(tmp_path, wavelengths, np.stack(spectra), chunkValues=7) # rows split across blocks
+    assert_same_bytes(tmp_path, wavelengths.tolist(), [spectrum.tolist() for spectrum in spectra])
+
+
+def test_float32_and_integer_frames(tmp_path):
+    wavelengths, spectra = simulated_frames(2)
+    assert_same_bytes(tmp_path, wavelengths.astype(np.float32), [spectrum.astype(np.float32) for spectrum in spectra])
+    assert_same_bytes(tmp_path, wavelengths, [spectra[0].astype(np.float32), spectra[1]])
+    assert_same_bytes(tmp_path, wavelengths, [np.round(spectrum).astype(np.int64) for spectrum in spectra])
+    assert_same_bytes(tmp_path, wavelengths, [np.round(spectrum).astype(np.uint16).tolist() for spectrum in spectra])
+
+
+def test_precision(tmp_path):
+    wavelengths, spectra = simulated_frames(2)
+    writeSpectraToCSV(wavelengths, spectra, str(tmp_path / "short.csv"), precision=6)
+    table = np.loadtxt(tmp_path / "short.csv", delimiter=",", skiprows=1)
+    np.testing.assert_allclose(table, np.column_stack([wavelengths] + spectra), rtol=1e-5)
+
+
+def test_short_spectrum(tmp_path):
+    wavelengths, spectra = simulated_frames(1)
+    with pytest.raises(ValueError):
+        writeSpectraToCSV(wavelengths, [spectra[0][:-1]], str(tmp_path / "short.csv"))
@@ -0,0 +1,111 @@
+
+import functools
+from collections import namedtuple
+from multiprocessing import shared_memory
+import numpy as np
+
+# Pixel -> wavelength grid, computed once per calibration and shared by every frame
+
+SharedGridHandle = namedtuple("SharedGridHandle", ["name", "wavelength_coeffs", "pixel_count"])
+SharedGridHandle.__doc__ = """Picklable reference to a WavelengthGrid placed in shared memory, see WavelengthGrid.to_shared_memory."""
+
+
+def evaluate_wavelengths(wavelength_coeffs, pixel_count: int) -> np.ndarray:
+    """Evaluates c[0] + c[1]*p + c[2]*p**2 + ... at every pixel p, for any number of coefficients.
+    The terms are summed in the same order (and with exact integer pixel powers where they fit)
+    as the original cubic in correct_spectrum, so four coefficients give bit-identical wavelengths."""
+    pixels = np.arange(pixel_count)
+    wavelengths = np.full(pixel_count, float(wavelength_coeffs[0]) if len(wavelength_coeffs) else 0.0)
+    for k, c in enumerate(wavelength_coeffs[1:], start=1):
+        if (pixel_count - 1) ** k < 2 ** 53:
+            power = pixels ** k
+        else:
+            power = pixels.astype(np.float64) ** k
+        wavelengths = wavelengths + c * power
+    return wavelengths
+
+
+class WavelengthGrid:
+    """
+    Immutable wavelength for every pixel of a spectrometer, evaluated once from the coefficients
+    returned by get_wavelength_coeffs (any number of them). Use WavelengthGrid.for_calibration to
+    get the shared cached instance rather than building a new one per frame.
+
+    It behaves like a read-only 1-D array: len(), indexing, iteration and np.asarray(grid) all work,
+    so it can be passed anywhere a list of wavelengths is expected (e.g. writeSpectraToCSV).
+    Pickling sends only the coefficients; to_shared_memory / from_shared_memory hand the evaluated
+    grid to worker processes without copying it.
+    """
+
+    __slots__ = ("wavelength_coeffs", "pixel_count", "wavelengths", "_shm")
+
+    def __init__(self, wavelength_coeffs, pixel_count: int, wavelengths: np.ndarray = None, _shm=None):
+        wavelength_coeffs = tuple(float(c) for c in wavelength_coeffs)
+        if wavelengths is None:
+            wavelengths = evaluate_wavelengths(wavelength_coeffs, pixel_count)
+        elif len(wavelengths) != pixel_count:
+            raise ValueError("expected %d wavelengths, got %d" % (pixel_count, len(wavelengths)))
+        wavelengths = wavelengths.view()
+        wavelengths.setflags(write=False)
+        object.__setattr__(self, "wavelength_coeffs", wavelength_coeffs)
+        object.__setattr__(self, "pixel_count", pixel_count)
+        object.__setattr__(self, "wavelengths", wavelengths)
+        object.__setattr__(self, "_shm", _shm)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("WavelengthGrid is immutable")
+
+    @staticmethod
+    def for_calibration(wavelength_coeffs, pixel_count: int) -> "WavelengthGrid":
+        """Returns the cached grid for these coefficients and pixel count, computing it on first use."""
+        return _cached_grid(tuple(float(c) for c in wavelength_coeffs), int(pixel_count))
+
+    def __len__(self) -> int:
+        return self.pixel_count
+
+    def __getitem__(self, index):
+        return self.wavelengths[index]
+
+    def __iter__(self):
+        return iter(self.wavelengths)
+
+    def __array__(self, dtype=None, copy=None):
+        if copy:
+            return np.array(self.wavelengths, dtype=dtype)
+        return self.wavelengths if dtype is None else self.wavelengths.astype(dtype, copy=False)
+
+    def __eq__(self, other):
+        if not isinstance(other, WavelengthGrid):
+            return NotImplemented
+        return self.wavelength_coeffs == other.wavelength_coeffs and self.pixel_count == other.pixel_count
+
+    def __hash__(self):
+        return hash((self.wavelength_coeffs, self.pixel_count))
+
+    def __repr__(self):
+        return "WavelengthGrid(%d pixels, %.3f-%.3f nm)" % (self.pixel_count, self.wavelengths[0], self.wavelengths[-1])
+
+    def __reduce__(self):
+        return (WavelengthGrid.for_calibration, (self.wavelength_coeffs, self.pixel_count))
+
+    def to_shared_memory(self):
+        """
+        Copies the grid into a new shared memory block. Returns (shm, handle): pass the handle to
+        worker processes and call from_shared_memory there. The creator owns the block and must
+        call shm.close() and shm.unlink() once the workers are done.
+        """
+        shm = shared_memory.SharedMemory(create=True, size=self.wavelengths.nbytes)
+        np.ndarray(self.wavelengths.shape, dtype=np.float64, buffer=shm.buf)[:] = self.wavelengths
+        return shm, SharedGridHandle(shm.name, self.wavelength_coeffs, self.pixel_count)
+
+    @staticmethod
+    def from_shared_memory(handle: SharedGridHandle) -> "WavelengthGrid":
+        """Attaches to a grid created by to_shared_memory. The returned grid views the shared block."""
+        shm = shared_memory.SharedMemory(name=handle.name)
+        wavelengths = np.ndarray((handle.pixel_count,), dtype=np.float64, buffer=shm.buf)
+        return WavelengthGrid(handle.wavelength_coeffs, handle.pixel_count, wavelengths, _shm=shm)
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_grid(wavelength_coeffs: tuple, pixel_count: int) -> WavelengthGrid:
+    return WavelengthGrid(wavelength_coeffs, pixel_count)